@@ -0,0 +1,87 @@
+"""
+Microbenchmark das operações de captura sobre frames sintéticos
+Compressão (encode_image por método e tipo de conteúdo), redimensionamento,
+conversão BGRA -> RGB, classificação de conteúdo e detecção de mudanças
+(tiles alterados e rolagem)
+"""
+
+import sys
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.screen_capture import FrameProcessor, FrameResizer, encode_image, bgra_to_rgb
+
+WIDTH, HEIGHT = 1920, 1080
+QUALITY = 80
+SCALES = [0.5, 0.75]
+
+
+def photographic_frame(width: int = WIDTH, height: int = HEIGHT) -> np.ndarray:
+    """Gradientes suaves + ruído (foto/vídeo)"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // width).astype(np.uint8)
+    frame[..., 1] = (y * 255 // height).astype(np.uint8)
+    frame[..., 2] = ((x + y) % 256).astype(np.uint8)
+    return frame + rng.integers(0, 24, frame.shape, dtype=np.uint8)
+
+
+def synthetic_frame(width: int = WIDTH, height: int = HEIGHT) -> np.ndarray:
+    """Fundo plano com "linhas de texto" (UI, editor)"""
+    frame = np.full((height, width, 3), 245, dtype=np.uint8)
+    for top in range(40, height - 20, 24):
+        frame[top:top + 12, 60:width - 400:7] = (30, 30, 30)
+    frame[:32] = (40, 90, 160)
+    return frame
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """Casos de captura (nome -> função sem argumentos)"""
+    photo = photographic_frame()
+    ui = synthetic_frame()
+    result = {}
+
+    for content, frame in (("photo", photo), ("ui", ui)):
+        for method in ("jpeg", "png", "adaptive"):
+            result[f"capture.encode_{method}[{content} 1080p]"] = (
+                lambda frame=frame, method=method: encode_image(frame, method, QUALITY)
+            )
+        result[f"capture.classify_content[{content} 1080p]"] = lambda frame=frame: FrameProcessor.classify_content(frame)
+
+    resizer = FrameResizer()
+    for scale in SCALES:
+        width, height = int(WIDTH * scale), int(HEIGHT * scale)
+        result[f"capture.resize[1080p x{scale}]"] = lambda width=width, height=height: resizer.resize(photo, width, height)
+
+    bgra = np.dstack([photo[..., ::-1], np.full((HEIGHT, WIDTH), 255, dtype=np.uint8)])
+    rgb_buffer = np.empty_like(photo)
+    result["capture.bgra_to_rgb[1080p]"] = lambda: bgra_to_rgb(bgra, rgb_buffer)
+
+    # Detecção de mudanças: tela parada, um trecho alterado e rolagem de 48 linhas
+    edited = ui.copy()
+    edited[500:560, 300:900] = 0
+    scrolled = np.empty_like(ui)
+    scrolled[:-48] = ui[48:]
+    scrolled[-48:] = 200
+    result["change.changed_tiles[idêntico]"] = lambda: FrameProcessor.changed_tiles(ui, ui)
+    result["change.changed_tiles[trecho]"] = lambda: FrameProcessor.changed_tiles(ui, edited)
+    result["change.changed_tiles[rolagem]"] = lambda: FrameProcessor.changed_tiles(ui, scrolled)
+    result["change.detect_moves[rolagem]"] = lambda: FrameProcessor.detect_moves(ui, scrolled)
+    result["change.detect_changes[trecho]"] = lambda: FrameProcessor.detect_changes(ui, edited)
+    return result
+
+
+def main():
+    from benchmarks.harness import run_cases
+    print("Captura e detecção de mudanças (tempo por operação):")
+    run_cases(cases())
+
+
+if __name__ == "__main__":
+    main()
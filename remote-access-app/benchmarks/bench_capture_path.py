@@ -0,0 +1,80 @@
+"""
+Benchmark do caminho captura -> codificador
+Mede memória alocada por frame (tracemalloc) no caminho antigo
+(np.array + fatia BGR + Image.fromarray) e no caminho com buffer reutilizável
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.screen_capture import bgra_view, bgra_to_rgb
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+ITERATIONS = 10
+
+
+def synthetic_raw(width: int, height: int) -> bytearray:
+    """Gera um buffer BGRA sintético, no mesmo formato de ScreenShot.raw"""
+    rng = np.random.default_rng(0)
+    return bytearray(rng.integers(0, 256, width * height * 4, dtype=np.uint8).tobytes())
+
+
+def legacy_path(raw: bytearray, width: int, height: int) -> Image.Image:
+    """Caminho anterior: cópia completa, view não contígua e cópia no fromarray"""
+    frame = np.array(np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4))
+    frame = frame[:, :, :3]
+    return Image.fromarray(frame, "RGB")
+
+
+class NewPath:
+    """Caminho atual: view sem cópia + conversão para buffer RGB reutilizável"""
+
+    def __init__(self):
+        self.rgb = None
+
+    def __call__(self, raw: bytearray, width: int, height: int) -> Image.Image:
+        self.rgb = bgra_to_rgb(bgra_view(raw, width, height), self.rgb)
+        return Image.fromarray(self.rgb, "RGB")
+
+
+def measure(func, raw: bytearray, width: int, height: int):
+    """Retorna (pico de memória alocada por frame em MB, tempo médio em ms)"""
+    func(raw, width, height)  # Aquecimento (aloca buffers reutilizáveis)
+
+    peaks = []
+    elapsed = 0.0
+    tracemalloc.start()
+    for _ in range(ITERATIONS):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        img = func(raw, width, height)
+        img.save(io.BytesIO(), format="JPEG", quality=80)
+        elapsed += time.perf_counter() - start
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        del img
+    tracemalloc.stop()
+
+    return max(peaks) / 1e6, elapsed * 1000 / ITERATIONS
+
+
+def main():
+    print(f"{'resolução':<8} {'caminho':<8} {'pico MB/frame':>14} {'ms/frame':>9}")
+    for name, (width, height) in RESOLUTIONS.items():
+        raw = synthetic_raw(width, height)
+        for label, func in (("legado", legacy_path), ("novo", NewPath())):
+            peak, ms = measure(func, raw, width, height)
+            print(f"{name:<8} {label:<8} {peak:>14.1f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
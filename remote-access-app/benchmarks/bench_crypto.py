@@ -0,0 +1,42 @@
+"""
+Microbenchmark da criptografia
+CryptoManager.encrypt/decrypt por tamanho de texto (a derivação de chave
+entra em cada chamada, como no uso real) e hash/verificação de senha
+"""
+
+import sys
+from pathlib import Path
+from typing import Callable, Dict
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.encryption import CryptoManager
+
+SIZES = {"64B": 64, "4KB": 4 * 1024, "64KB": 64 * 1024}
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """Casos de criptografia (nome -> função sem argumentos)"""
+    crypto = CryptoManager("sua-chave-secreta-super-segura-32-chars!!")
+    result = {}
+    for label, size in SIZES.items():
+        plaintext = "x" * size
+        encrypted = crypto.encrypt(plaintext, "session")
+        result[f"crypto.encrypt[{label}]"] = lambda plaintext=plaintext: crypto.encrypt(plaintext, "session")
+        result[f"crypto.decrypt[{label}]"] = lambda encrypted=encrypted: crypto.decrypt(encrypted)
+
+    password_hash = CryptoManager.hash_password("admin123")
+    result["crypto.hash_password"] = lambda: CryptoManager.hash_password("admin123")
+    result["crypto.verify_password"] = lambda: CryptoManager.verify_password("admin123", password_hash)
+    return result
+
+
+def main():
+    from benchmarks.harness import run_cases
+    print("Criptografia (tempo por operação):")
+    run_cases(cases())
+
+
+if __name__ == "__main__":
+    main()
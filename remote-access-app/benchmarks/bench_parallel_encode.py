@@ -0,0 +1,76 @@
+"""
+Benchmark da codificação paralela
+Mede frames por segundo codificando keyframes sintéticos em faixas com
+ParallelTileEncoder, para 1..N workers (1 = codificação no próprio processo)
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.screen_capture import encode_image
+from shared.parallel_encoder import ParallelTileEncoder
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+ITERATIONS = 10
+QUALITY = 80
+
+
+def synthetic_frame(width: int, height: int) -> np.ndarray:
+    """Gera um frame RGB sintético fotográfico (gradientes suaves + ruído)"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // width).astype(np.uint8)
+    frame[..., 1] = (y * 255 // height).astype(np.uint8)
+    frame[..., 2] = ((x + y) % 256).astype(np.uint8)
+    noise = rng.integers(0, 24, frame.shape, dtype=np.uint8)
+    return frame + noise
+
+
+def measure_serial(frame: np.ndarray) -> float:
+    """Retorna FPS codificando o frame inteiro no próprio processo"""
+    encode_image(frame, "jpeg", QUALITY)  # Aquecimento
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        encode_image(frame, "jpeg", QUALITY)
+    return ITERATIONS / (time.perf_counter() - start)
+
+
+def measure_parallel(frame: np.ndarray, workers: int) -> float:
+    """Retorna FPS codificando o frame em faixas com o pool de processos"""
+    height, width = frame.shape[:2]
+    encoder = ParallelTileEncoder(workers=workers, min_pixels=0)
+    bands = encoder.bands(width, height, workers)
+    try:
+        encoder.encode(frame, bands, "jpeg", QUALITY)  # Aquecimento (sobe os processos)
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            encoder.encode(frame, bands, "jpeg", QUALITY)
+        return ITERATIONS / (time.perf_counter() - start)
+    finally:
+        encoder.close()
+
+
+def main():
+    max_workers = os.cpu_count() or 1
+    worker_counts = [n for n in (2, 4, 8) if n <= max_workers]
+
+    print(f"{'resolução':<8} {'workers':>7} {'FPS':>8} {'ganho':>7}")
+    for name, (width, height) in RESOLUTIONS.items():
+        frame = synthetic_frame(width, height)
+        serial = measure_serial(frame)
+        print(f"{name:<8} {1:>7} {serial:>8.1f} {1.0:>6.1f}x")
+        for workers in worker_counts:
+            fps = measure_parallel(frame, workers)
+            print(f"{name:<8} {workers:>7} {fps:>8.1f} {fps / serial:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
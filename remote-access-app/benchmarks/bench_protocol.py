@@ -0,0 +1,78 @@
+"""
+Microbenchmark do protocolo
+serialize_message/deserialize_message por tipo e tamanho de mensagem, e a
+ida e volta com a compressão de stream (contextos de envio e recepção em
+ordem, como numa conexão)
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.protocol import ProtocolHandler, Message
+from shared.stream_compression import StreamCompressor, available_methods
+
+SESSION = "a" * 43  # Tamanho de um token de sessão real
+IMAGE_SIZES = {"4KB": 4 * 1024, "64KB": 64 * 1024, "512KB": 512 * 1024}
+DELTA_TILES = 32
+TILE_BYTES = 2 * 1024
+
+
+def sample_messages() -> Dict[str, Message]:
+    """Mensagens representativas de cada tipo, nos tamanhos usuais"""
+    messages = {
+        "ping": ProtocolHandler.create_ping(SESSION, sent_at=1_700_000_000_000_000),
+        "mouse_evt": ProtocolHandler.create_mouse_event(SESSION, 960, 540, "move"),
+        "key_evt": ProtocolHandler.create_keyboard_event(SESSION, "a", "press"),
+        "auth_req": ProtocolHandler.create_auth_request("admin", "x" * 64, "PC-Teste"),
+        "cursor_pos": ProtocolHandler.create_cursor_position(SESSION, 1, 100, 200, shape_id=3),
+    }
+    # Conteúdo aleatório: o base64 do JPEG real também é incompressível
+    for label, size in IMAGE_SIZES.items():
+        messages[f"screen_cap keyframe {label}"] = ProtocolHandler.create_screen_capture(
+            SESSION, os.urandom(size), "jpeg", 1920, 1080, seq=1, keyframe=True
+        )
+    tiles = [
+        {"x": (i % 30) * 64, "y": (i // 30) * 64, "w": 64, "h": 64,
+         "compression": "png", "data": os.urandom(TILE_BYTES), "slot": i}
+        for i in range(DELTA_TILES)
+    ]
+    messages[f"screen_cap delta {DELTA_TILES} tiles"] = ProtocolHandler.create_screen_capture(
+        SESSION, None, "jpeg", 1920, 1080, seq=2, keyframe=False, tiles=tiles,
+        copy_rects=[{"src_x": 0, "src_y": 32, "dst_x": 0, "dst_y": 0, "w": 1920, "h": 1000}]
+    )
+    return messages
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """Casos do protocolo (nome -> função sem argumentos)"""
+    result = {}
+    for label, msg in sample_messages().items():
+        packet = ProtocolHandler.serialize_message(msg)
+        result[f"protocol.serialize[{label}]"] = lambda msg=msg: ProtocolHandler.serialize_message(msg)
+        result[f"protocol.deserialize[{label}]"] = lambda packet=packet: ProtocolHandler.deserialize_message(packet)
+
+    for method in available_methods():
+        for label in ("mouse_evt", f"screen_cap delta {DELTA_TILES} tiles", "screen_cap keyframe 64KB"):
+            msg = sample_messages()[label]
+            sender, receiver = StreamCompressor(method), StreamCompressor(method)
+
+            def round_trip(msg=msg, sender=sender, receiver=receiver):
+                return ProtocolHandler.deserialize_message(ProtocolHandler.serialize_message(msg, sender), receiver)
+
+            result[f"protocol.round_trip_{method}[{label}]"] = round_trip
+    return result
+
+
+def main():
+    from benchmarks.harness import run_cases
+    print("Protocolo (tempo por operação):")
+    run_cases(cases())
+
+
+if __name__ == "__main__":
+    main()
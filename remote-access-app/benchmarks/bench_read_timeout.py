@@ -0,0 +1,51 @@
+"""
+Benchmark do custo de timeout por leitura no loop asyncio
+Compara reader.read() envolto em asyncio.wait_for (timer + task por leitura,
+caminho anterior do broker) com leitura direta + carimbo de last_seen
+(caminho atual, com o watchdog único de RemoteAccessBroker)
+"""
+
+import asyncio
+import time
+
+READS = 200_000
+CHUNK = b"x" * 512
+TIMEOUT = 30
+
+
+async def read_with_wait_for(reader: asyncio.StreamReader) -> float:
+    """Caminho anterior: um wait_for por leitura"""
+    start = time.perf_counter()
+    for _ in range(READS):
+        reader.feed_data(CHUNK)
+        await asyncio.wait_for(reader.read(4096), timeout=TIMEOUT)
+    return time.perf_counter() - start
+
+
+async def read_with_last_seen(reader: asyncio.StreamReader) -> float:
+    """Caminho atual: leitura direta e só o instante da última leitura"""
+    loop = asyncio.get_running_loop()
+    last_seen = 0.0
+    start = time.perf_counter()
+    for _ in range(READS):
+        reader.feed_data(CHUNK)
+        await reader.read(4096)
+        last_seen = loop.time()
+    assert last_seen
+    return time.perf_counter() - start
+
+
+async def run():
+    print(f"{'caminho':<22} {'ns/leitura':>11}")
+    for label, func in (("wait_for por leitura", read_with_wait_for), ("watchdog (last_seen)", read_with_last_seen)):
+        await func(asyncio.StreamReader())  # Aquecimento
+        elapsed = await func(asyncio.StreamReader())
+        print(f"{label:<22} {elapsed * 1e9 / READS:>11.0f}")
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark do redimensionamento de frames
+Compara o caminho antigo (PIL LANCZOS com ida e volta NumPy/PIL) com o FrameResizer
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.screen_capture import FrameResizer
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+SCALES = [0.5, 0.75]
+ITERATIONS = 20
+
+
+def synthetic_bgra(width: int, height: int) -> np.ndarray:
+    """Gera um frame BGRA sintético (gradiente + ruído), como o buffer do mss"""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    frame[:, :, 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    return frame
+
+
+def legacy_resize(frame: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Implementação anterior: LANCZOS com conversões NumPy <-> PIL"""
+    img = Image.fromarray(frame, "RGB")
+    img = img.resize((width, height), Image.Resampling.LANCZOS)
+    return np.array(img)
+
+
+def measure(func, *args) -> float:
+    """Retorna tempo médio por chamada em ms"""
+    func(*args)  # Aquecimento (aloca buffers)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / ITERATIONS
+
+
+def main():
+    resizer = FrameResizer()
+
+    print(f"{'resolução':<8} {'escala':>6} {'legado (ms)':>12} {'novo (ms)':>10} {'ganho':>7}")
+    for name, (width, height) in RESOLUTIONS.items():
+        frame = synthetic_bgra(width, height)[:, :, :3]
+        for scale in SCALES:
+            new_width, new_height = int(width * scale), int(height * scale)
+            legacy = measure(legacy_resize, frame, new_width, new_height)
+            new = measure(resizer.resize, frame, new_width, new_height)
+            print(f"{name:<8} {scale:>6} {legacy:>12.2f} {new:>10.2f} {legacy / new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Microbenchmark da validação de sessão
+SessionManager.is_session_valid e update_activity (chamados a cada mensagem
+recebida pelo broker) com muitas sessões abertas, para sessões existentes e
+desconhecidas
+"""
+
+import sys
+import logging
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.server import SessionManager
+
+SESSIONS = 10_000
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    """Casos de sessão (nome -> função sem argumentos)"""
+    directory = tempfile.mkdtemp(prefix="bench-sessions-")
+    manager = SessionManager(Path(directory) / "sessions.json")
+
+    # Cria as sessões direto em memória: create_session grava o arquivo a cada chamada
+    manager._save_sessions = lambda: None
+    logging.getLogger("server.server").setLevel(logging.WARNING)
+    session_ids = [manager.create_session(f"user{i}", f"PC{i}") for i in range(SESSIONS)]
+    session_id = session_ids[SESSIONS // 2]
+
+    return {
+        f"session.is_session_valid[{SESSIONS} sessões]": lambda: manager.is_session_valid(session_id),
+        "session.is_session_valid[desconhecida]": lambda: manager.is_session_valid("x" * 43),
+        "session.update_activity": lambda: manager.update_activity(session_id),
+    }
+
+
+def main():
+    from benchmarks.harness import run_cases
+    print("Sessões (tempo por operação):")
+    run_cases(cases())
+
+
+if __name__ == "__main__":
+    main()
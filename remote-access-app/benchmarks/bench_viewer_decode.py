@@ -0,0 +1,95 @@
+"""
+Benchmark da decodificação no viewer
+Alimenta ViewerEngine em modo headless com um stream sintético (keyframe
+seguido de deltas com tiles e copy-rects, no formato de screen_cap) e mede
+FPS de decodificação e latência recepção -> frame completo, para 1..N threads
+"""
+
+import io
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.protocol import ProtocolHandler
+from shared.viewer import ViewerEngine
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+DELTAS = 60
+TILE = 64
+CHANGED_TILES = 120  # Tiles alterados por delta (~0.5 MP, ex.: vídeo numa janela)
+QUALITY = 80
+
+
+def encode(pixels: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, format="JPEG", quality=QUALITY)
+    return buffer.getvalue()
+
+
+def synthetic_stream(width: int, height: int) -> list:
+    """Keyframe fotográfico + deltas com tiles JPEG e um copy-rect de rolagem"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // width).astype(np.uint8)
+    frame[..., 1] = (y * 255 // height).astype(np.uint8)
+    frame[..., 2] = ((x + y) % 256).astype(np.uint8)
+
+    messages = [ProtocolHandler.create_screen_capture(
+        "bench", encode(frame), "jpeg", width, height, seq=0, keyframe=True
+    )]
+    columns, rows = width // TILE, height // TILE
+    for seq in range(1, DELTAS + 1):
+        tiles = []
+        for index in rng.choice(columns * rows, CHANGED_TILES, replace=False):
+            tx, ty = (index % columns) * TILE, (index // columns) * TILE
+            pixels = rng.integers(0, 256, (TILE, TILE, 3), dtype=np.uint8)
+            tiles.append({"x": tx, "y": ty, "w": TILE, "h": TILE, "compression": "jpeg", "data": encode(pixels)})
+        copy_rects = [{"src_x": 0, "src_y": 32, "dst_x": 0, "dst_y": 0, "w": width // 2, "h": height // 2}]
+        messages.append(ProtocolHandler.create_screen_capture(
+            "bench", None, "jpeg", width, height, seq=seq, keyframe=False,
+            tiles=tiles, copy_rects=copy_rects
+        ))
+    return [msg.data for msg in messages]
+
+
+async def measure(stream: list, workers: int) -> dict:
+    """Entrega o stream de uma vez (fila cheia) e retorna as métricas do motor"""
+    engine = ViewerEngine(workers=workers, window=len(stream))
+    start = time.perf_counter()
+    for data in stream:
+        await engine.submit(data)
+    await engine.drain()
+    elapsed = time.perf_counter() - start
+    stats = engine.get_stats()
+    engine.close()
+    stats["throughput_fps"] = len(stream) / elapsed
+    return stats
+
+
+async def run():
+    print(f"{'resolução':<10} {'threads':>7} {'FPS':>8} {'decode p50':>11} {'latência p95':>13} {'realocações':>12}")
+    for label, (width, height) in RESOLUTIONS.items():
+        stream = synthetic_stream(width, height)
+        for workers in (1, 2, 4):
+            stats = await measure(stream, workers)
+            print(
+                f"{label:<10} {workers:>7} {stats['throughput_fps']:>8.1f} "
+                f"{stats['decode_ms']['p50']:>9.2f}ms {stats['latency_ms']['p95']:>11.2f}ms "
+                f"{stats['reallocations']:>12}"
+            )
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
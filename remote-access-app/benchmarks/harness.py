@@ -0,0 +1,155 @@
+"""
+Medição dos microbenchmarks
+Cada suíte (bench_protocol, bench_crypto, bench_capture_ops, bench_session)
+expõe cases() com funções sem argumentos; aqui elas são cronometradas no
+estilo do timeit (lotes de tamanho calibrado, menor tempo entre repetições)
+e comparadas com um baseline em JSON
+"""
+
+import sys
+import json
+import time
+import platform
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+MIN_BATCH_TIME = 0.05  # Segundos mínimos de cada lote (calibra o número de chamadas)
+REPEAT = 5  # Lotes por caso; o resultado é o menor (menos ruído do sistema)
+
+
+def measure(func: Callable[[], object], repeat: int = REPEAT, min_time: float = MIN_BATCH_TIME) -> Dict[str, float]:
+    """
+    Cronometra uma função
+
+    Args:
+        func: Caso sem argumentos
+        repeat (int): Lotes medidos
+        min_time (float): Duração mínima de cada lote (segundos)
+
+    Returns:
+        Dict: {"ns_per_op" (menor lote), "median_ns", "calls"} por chamada
+    """
+    func()  # Aquecimento (caches, imports tardios, buffers)
+
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2 if elapsed < min_time / 4 else 1 + int(min_time / max(elapsed, 1e-9))
+
+    timings = [elapsed / calls]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        timings.append((time.perf_counter() - start) / calls)
+
+    timings.sort()
+    return {
+        "ns_per_op": round(timings[0] * 1e9, 1),
+        "median_ns": round(timings[len(timings) // 2] * 1e9, 1),
+        "calls": calls
+    }
+
+
+def run_cases(cases: Dict[str, Callable[[], object]], pattern: str = None) -> Dict[str, Dict[str, float]]:
+    """Mede os casos (filtrados por substring) e imprime cada resultado"""
+    results = {}
+    for name, func in cases.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(func)
+        print(f"  {name:<52} {format_ns(results[name]['ns_per_op']):>12}")
+    return results
+
+
+def format_ns(ns: float) -> str:
+    """Tempo por operação com a unidade legível"""
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def machine_info() -> Dict[str, str]:
+    """Identifica onde o baseline foi medido (comparar só na mesma máquina)"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine()
+    }
+
+
+def load_baseline(path: Path = DEFAULT_BASELINE) -> Optional[Dict]:
+    """Baseline salvo (None se não existe)"""
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: Path = DEFAULT_BASELINE, merge: bool = True):
+    """
+    Grava os resultados como baseline
+
+    Args:
+        results: Resultados desta execução
+        path: Arquivo JSON
+        merge (bool): Mantém casos do baseline anterior que não rodaram agora
+    """
+    previous = load_baseline(path) if merge else None
+    cases = dict(previous["results"]) if previous else {}
+    cases.update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "saved_at": datetime.now().isoformat(),
+            "machine": machine_info(),
+            "results": dict(sorted(cases.items()))
+        }, f, indent=2, ensure_ascii=False)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    Compara os resultados com o baseline
+
+    Args:
+        results: Resultados desta execução
+        baseline: Conteúdo de load_baseline()
+        threshold (float): Piora relativa tolerada (0.2 = 20% mais lento)
+
+    Returns:
+        List[Dict]: Um item por caso medido: {"name", "ratio", "status"}
+            (status: "ok", "regression", "improvement" ou "new")
+    """
+    previous = baseline.get("results", {})
+    report = []
+    for name, result in results.items():
+        reference = previous.get(name)
+        if not reference:
+            report.append({"name": name, "ratio": None, "status": "new"})
+            continue
+        ratio = result["ns_per_op"] / reference["ns_per_op"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        report.append({"name": name, "ratio": round(ratio, 3), "status": status})
+    return report
+
+
+def warn_machine_mismatch(baseline: Dict):
+    """Baseline de outra máquina/versão do Python não é comparável"""
+    saved = baseline.get("machine", {})
+    current = machine_info()
+    different = [key for key in current if saved.get(key) != current[key]]
+    if different:
+        print(f"Aviso: baseline medido em outro ambiente ({', '.join(different)})", file=sys.stderr)
@@ -0,0 +1,87 @@
+"""
+Executor dos microbenchmarks com baseline
+Roda as suítes, compara com o baseline salvo (benchmarks/baseline.json) e
+sai com código 1 se algum caso ficou mais lento que o limite
+
+Uso:
+    python benchmarks/run_benchmarks.py --save          # grava o baseline
+    python benchmarks/run_benchmarks.py                 # compara (falha em regressão)
+    python benchmarks/run_benchmarks.py --suite protocol --filter screen_cap
+"""
+
+import sys
+import argparse
+import importlib
+from pathlib import Path
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.harness import (
+    DEFAULT_BASELINE, run_cases, load_baseline, save_baseline, compare, warn_machine_mismatch
+)
+
+# Suíte -> módulo com cases(); suítes com dependência ausente são puladas
+SUITES = {
+    "protocol": "benchmarks.bench_protocol",
+    "crypto": "benchmarks.bench_crypto",
+    "capture": "benchmarks.bench_capture_ops",
+    "session": "benchmarks.bench_session",
+}
+DEFAULT_THRESHOLD = 0.20  # Piora relativa tolerada antes de acusar regressão
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks com baseline")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Suíte a rodar (repetível; padrão: todas)")
+    parser.add_argument("--filter", help="Roda só os casos cujo nome contém o texto")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Arquivo do baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Piora tolerada (0.2 = 20%%)")
+    parser.add_argument("--save", action="store_true", help="Grava os resultados como baseline")
+    args = parser.parse_args()
+
+    results = {}
+    skipped = []
+    for suite in args.suite or SUITES:
+        try:
+            module = importlib.import_module(SUITES[suite])
+        except ImportError as e:
+            skipped.append(suite)
+            print(f"[{suite}] ignorada: {e}")
+            continue
+        print(f"[{suite}]")
+        results.update(run_cases(module.cases(), args.filter))
+
+    if not results:
+        print("Nenhum caso executado")
+        return 1
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline gravado em {args.baseline} ({len(results)} casos)")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nSem baseline em {args.baseline}; rode com --save para criar")
+        return 0
+
+    warn_machine_mismatch(baseline)
+    report = compare(results, baseline, args.threshold)
+    regressions = [item for item in report if item["status"] == "regression"]
+
+    print(f"\nComparação com o baseline ({baseline.get('saved_at')}), limite +{args.threshold:.0%}:")
+    for item in report:
+        ratio = f"{item['ratio']:.2f}x" if item["ratio"] is not None else "-"
+        marker = {"regression": "REGRESSÃO", "improvement": "melhora", "new": "novo"}.get(item["status"], "")
+        print(f"  {item['name']:<52} {ratio:>7}  {marker}")
+
+    if regressions:
+        print(f"\n{len(regressions)} caso(s) mais lento(s) que o baseline")
+        return 1
+    print(f"\nSem regressões ({len(report)} casos{', suítes ignoradas: ' + ', '.join(skipped) if skipped else ''})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,8 +6,9 @@ Interface e lógica de conexão
 import asyncio
 import logging
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 # Adiciona diretório pai ao path
@@ -15,11 +16,23 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.settings import (
     DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT, LOG_FILE, LOG_LEVEL,
-    SCREEN_CAPTURE_FPS, SCREEN_QUALITY
+    SCREEN_CAPTURE_FPS, SCREEN_QUALITY, PING_INTERVAL,
+    TRACE_ENABLED, TRACE_EXPORT_FILE, CLOCK_SYNC_BURST,
+    RESUME_GRACE_PERIOD, RESUME_RETRY_DELAY, ADMISSION_CLIENT_RETRIES,
+    UDP_ENABLED, UDP_HANDSHAKE_TIMEOUT, UDP_HANDSHAKE_RETRIES, UDP_FALLBACK_LOSS,
+    SHM_RING_ENABLED, FILE_SERVE_ROOT, FILE_CHUNK_SIZE, KEYFRAME_RETRY_INTERVAL
 )
 from shared.protocol import ProtocolHandler, Message
 from shared.encryption import CryptoManager
-from shared.screen_capture import ScreenCapture
+from shared.screen_capture import MultiMonitorCapture
+from shared.cursor import CursorTracker
+from shared.stream_compression import StreamCompressor, available_methods
+from shared.tile_cache import TileCacheMirror
+from shared.tracing import ClockSync, FrameTracer, now_us, to_us
+from shared.datagram import DatagramEndpoint, open_endpoint
+from shared.viewer import ViewerEngine
+from shared.profiling import Profiler
+from shared.file_transfer import TransferManager, FILE_MESSAGE_TYPES
 
 # Configurar logging
 logging.basicConfig(
@@ -43,6 +56,14 @@ class ClientConfig:
     device_name: str = "RemotePC"
     capture_fps: int = SCREEN_CAPTURE_FPS
     capture_quality: int = SCREEN_QUALITY
+    role: str = "host"  # "host" compartilha a tela, "viewer" assiste
+    attach_to: Optional[str] = None  # Viewer: nome do dispositivo do host
+    monitors: Tuple[int, ...] = (1,)  # Viewer: monitores a assinar
+    udp: bool = UDP_ENABLED  # Negocia o canal UDP para vídeo (fallback: TCP)
+    local_publish: bool = SHM_RING_ENABLED  # Host: frames também no anel em memória compartilhada
+    send_files: Tuple[str, ...] = ()  # Viewer: arquivos enviados ao host após conectar
+    fetch_files: Tuple[str, ...] = ()  # Viewer: arquivos pedidos ao host (caminhos dentro da pasta servida)
+    serve_root: Optional[Path] = FILE_SERVE_ROOT  # Host: pasta que viewers podem baixar (None = nenhuma)
 
 
 class RemoteAccessClient:
@@ -57,12 +78,58 @@ class RemoteAccessClient:
         self.session_id: Optional[str] = None
         self.authenticated = False
         self.crypto = CryptoManager("sua-chave-secreta-super-segura-32-chars!!")
-        self.screen_capture = ScreenCapture(
+        # Host: um stream por monitor, criado quando algum viewer assina
+        self.screen_capture = MultiMonitorCapture(
             target_fps=config.capture_fps,
-            quality=config.capture_quality
+            quality=config.capture_quality,
+            publish=config.local_publish
+        ) if config.role == "host" else None
+        self.cursor_tracker = CursorTracker() if config.role == "host" else None
+        self.sent_cursor_shapes: set = set()  # Host: formatos já enviados ao broker
+        self.cursor_monitor: Optional[int] = None  # Host: monitor onde o cursor foi visto
+        self.capture_wakeup = asyncio.Event()  # Host: acorda o laço de captura antes do prazo
+        # Arquivos e área de transferência: pedaços binários de baixa prioridade
+        self.transfers = TransferManager(
+            send=self._send_transfer_message,
+            send_chunk=self._send_file_chunk,
+            serve_root=config.serve_root if config.role == "host" else None,
+            clipboard_source=lambda: self.clipboard,
+            on_clipboard=self._on_remote_clipboard
         )
+        self.clipboard: Optional[bytes] = None  # Conteúdo local entregue quando o outro lado pede
+        self.remote_clipboard: Optional[bytes] = None  # Último conteúdo recebido do outro lado
+        self._sendfile_idle = asyncio.Event()  # Limpo enquanto um pedaço vai direto do disco
+        self._sendfile_idle.set()
         self.running = False
         self.buffer = b""
+        self.resume_token: Optional[str] = None  # Emitido pelo broker a cada autenticação/retomada
+        self.reconnecting = False
+        self.retry_after: Optional[int] = None  # Última recusa do broker por sobrecarga
+        self.compressor: Optional[StreamCompressor] = None
+        self.stream_seq: Dict[int, Optional[int]] = {}  # Viewer: último seq aplicado por monitor
+        self.resync_requested: Dict[int, float] = {}  # Viewer: último keyframe_req por monitor fora de sincronia
+        self.cursor_shapes: Dict[int, dict] = {}  # Viewer: formatos de cursor por shape_id
+        self.tile_caches: Dict[int, TileCacheMirror] = {}  # Viewer: cache de tiles por monitor
+        # Perfilamento sob demanda (PROFILE_SIGNAL): tempo por tipo de mensagem recebida
+        self.profiler = Profiler(f"client-{config.role}")
+        # Viewer: decodificação no framebuffer persistente (sem interface: modo headless)
+        self.viewer = ViewerEngine(
+            on_frame=self._on_frame_complete,
+            on_error=self._on_decode_error
+        ) if config.role == "viewer" else None
+        self.clock = ClockSync()  # Offset do relógio local para o do broker
+        self.tracer = FrameTracer() if TRACE_ENABLED and config.role == "viewer" else None
+        self._traced_frames = 0  # Viewer: frames no último arquivo exportado
+        # Canal UDP de vídeo (só screen_cap); pronto após o ack do hello
+        self.udp: Optional[DatagramEndpoint] = None
+        self.udp_token: Optional[bytes] = None
+        self.udp_addr: Optional[tuple] = None
+        self.udp_ready = False
+        self._udp_acked: Optional[asyncio.Event] = None
+        self._udp_inbox: Optional["asyncio.Queue[Message]"] = None
+        self._udp_setup: Optional[asyncio.Task] = None
+        self._udp_receiver: Optional[asyncio.Task] = None
+        self._udp_loss_seen = (0, 0)  # (entregues, perdidas) na última verificação
 
         logger.info(f"Cliente inicializado: {config.username}@{config.server_host}:{config.server_port}")
 
@@ -74,20 +141,28 @@ class RemoteAccessClient:
             bool: True se conectado com sucesso
         """
         try:
-            self.reader, self.writer = await asyncio.open_connection(
-                self.config.server_host,
-                self.config.server_port
-            )
+            for attempt in range(ADMISSION_CLIENT_RETRIES + 1):
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.config.server_host,
+                    self.config.server_port
+                )
 
-            logger.info(f"Conectado ao servidor em {self.config.server_host}:{self.config.server_port}")
+                logger.info(f"Conectado ao servidor em {self.config.server_host}:{self.config.server_port}")
 
-            # Autentica
-            if await self.authenticate():
-                self.running = True
-                return True
-            else:
-                self.disconnect()
-                return False
+                # Autentica
+                if await self.authenticate():
+                    self.running = True
+                    return True
+
+                # Broker sobrecarregado: espera o retry-after sugerido
+                if not self.retry_after or attempt == ADMISSION_CLIENT_RETRIES:
+                    break
+                self.writer.close()
+                logger.warning(f"Servidor sobrecarregado; nova tentativa em {self.retry_after}s")
+                await asyncio.sleep(self.retry_after)
+
+            self.disconnect()
+            return False
 
         except Exception as e:
             logger.error(f"Erro ao conectar: {e}")
@@ -106,7 +181,9 @@ class RemoteAccessClient:
             auth_msg = ProtocolHandler.create_auth_request(
                 self.config.username,
                 password_hash,
-                self.config.device_name
+                self.config.device_name,
+                compression=available_methods(),
+                role=self.config.role
             )
 
             # Envia
@@ -116,73 +193,515 @@ class RemoteAccessClient:
 
             logger.info("Mensagem de autenticação enviada")
 
-            # Aguarda resposta
+            msg = await self._read_auth_response()
+            if msg:
+                logger.info(f"Autenticação bem-sucedida. Session ID: {self.session_id}")
+                return True
+            return False
+
+        except Exception as e:
+            logger.error(f"Erro ao autenticar: {e}")
+            return False
+
+    async def _read_auth_response(self) -> Optional[Message]:
+        """
+        Lê o auth_res (de auth_req ou resume) e aplica sessão, compressão e token
+
+        Lê até a resposta estar completa (ela pode chegar em vários pedaços
+        do socket); bytes que chegarem junto (ex: frames reenviados na
+        retomada) ficam em self.buffer para o loop de recepção.
+
+        Returns:
+            Message: Resposta de sucesso, ou None
+        """
+        buffer = b""
+        while True:
             response_data = await self.reader.read(4096)
 
             if not response_data:
                 logger.error("Servidor desconectou antes de responder")
+                return None
+
+            buffer += response_data
+            msg, self.buffer = ProtocolHandler.deserialize_message(buffer)
+            # Incompleta: nada foi consumido do buffer
+            if msg is not None or len(self.buffer) != len(buffer):
+                break
+        self.retry_after = None
+
+        if not msg or msg.msg_type != "auth_res":
+            logger.error("Resposta de autenticação inválida")
+            return None
+
+        if not msg.data.get("success"):
+            self.retry_after = msg.data.get("retry_after")
+            logger.error(f"Falha na autenticação: {msg.data.get('message')}")
+            return None
+
+        self.session_id = msg.session_id
+        self.authenticated = True
+        self.resume_token = msg.data.get("resume_token")
+        self.compressor = None
+        if msg.data.get("compression"):
+            self.compressor = StreamCompressor(msg.data["compression"])
+            logger.info(f"Compressão de stream ativa: {self.compressor.method}")
+        return msg
+
+    async def resume(self) -> bool:
+        """
+        Retoma a sessão na conexão atual usando o token de retomada
+
+        O viewer informa o último seq aplicado por monitor e mantém o estado
+        do stream (seq e cache de tiles); o host força keyframe nos monitores
+        cujos últimos frames não chegaram ao broker.
+
+        Returns:
+            bool: True se a sessão foi retomada
+        """
+        token = self.resume_token
+        try:
+            resume_msg = ProtocolHandler.create_resume_request(
+                token,
+                last_seq={m: seq for m, seq in self.stream_seq.items() if seq is not None},
+                compression=available_methods()
+            )
+            self.resume_token = None  # Uso único
+            self.writer.write(ProtocolHandler.serialize_message(resume_msg))
+            await self.writer.drain()
+
+            msg = await self._read_auth_response()
+            if not msg:
+                if self.retry_after:
+                    self.resume_token = token  # Conexão recusada antes de usar o token
                 return False
 
-            # Processa resposta
-            msg, _ = ProtocolHandler.deserialize_message(response_data)
+            if self.screen_capture:
+                received = msg.data.get("last_seq") or {}
+                for index, stream in self.screen_capture.streams.items():
+                    if received.get(str(index)) != stream.seq:
+                        stream.request_keyframe()
+
+            logger.info(f"Sessão retomada. Session ID: {self.session_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao retomar sessão: {e}")
+            return False
+
+    async def _reconnect(self) -> bool:
+        """
+        Reconecta após queda: retoma a sessão dentro de RESUME_GRACE_PERIOD
+        ou, se o broker recusar o token, autentica do zero
+
+        Returns:
+            bool: True se voltou a ter uma sessão
+        """
+        if not self.running or not self.resume_token:
+            return False
+
+        self.reconnecting = True
+        self._close_udp()
+        self.buffer = b""
+        if self.writer:
+            self.writer.close()
+
+        deadline = time.monotonic() + RESUME_GRACE_PERIOD
+        delay = RESUME_RETRY_DELAY
+        try:
+            while self.running and time.monotonic() < deadline:
+                try:
+                    self.reader, self.writer = await asyncio.open_connection(
+                        self.config.server_host,
+                        self.config.server_port
+                    )
+                except OSError as e:
+                    logger.warning(f"Reconexão falhou ({e}); nova tentativa em {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 4.0)
+                    continue
 
-            if msg and msg.msg_type == "auth_res":
-                if msg.data.get("success"):
-                    self.session_id = msg.session_id
-                    self.authenticated = True
-                    logger.info(f"Autenticação bem-sucedida. Session ID: {self.session_id}")
+                if await self.resume():
                     return True
-                else:
-                    logger.error(f"Falha na autenticação: {msg.data.get('message')}")
+
+                if self.retry_after:
+                    self.writer.close()
+                    logger.warning(f"Servidor sobrecarregado; nova tentativa em {self.retry_after}s")
+                    await asyncio.sleep(self.retry_after)
+                    continue
+
+                # Sessão perdida no broker: começa do zero (imagem em branco)
+                if not await self.authenticate():
                     return False
+                self.stream_seq.clear()
+                self.resync_requested.clear()
+                self.tile_caches.clear()
+                self.sent_cursor_shapes.clear()
+                self.transfers.abort_all()  # Rotas do broker eram da sessão anterior
+                if self.screen_capture:
+                    self.screen_capture.subscribe([])  # Sessão nova ainda sem viewers
+                self.reconnecting = False
+                await self._announce()
+                return True
 
-            logger.error("Resposta de autenticação inválida")
             return False
+        finally:
+            self.reconnecting = False
 
-        except Exception as e:
-            logger.error(f"Erro ao autenticar: {e}")
+    async def _send(self, msg: Message):
+        """Serializa (com a compressão negociada) e envia uma mensagem"""
+        if self.reconnecting:
+            return  # Descartada: a retomada ressincroniza o stream
+        if self.udp_ready and msg.msg_type == "screen_cap":
+            self.udp.send_message(self.udp_token, msg.to_json().encode(), self.udp_addr)
+            return
+        if not self._sendfile_idle.is_set():
+            await self._sendfile_idle.wait()  # O transporte recusa write() durante o sendfile
+        try:
+            self.writer.write(ProtocolHandler.serialize_message(msg, self.compressor))
+            await self.writer.drain()
+        except ConnectionError as e:
+            # O loop de recepção percebe a queda e reconecta
+            logger.warning(f"Falha ao enviar {msg.msg_type}: {e}")
+
+    async def _send_transfer_message(self, msg: Message):
+        """Mensagem de controle do TransferManager (criada sem sessão)"""
+        msg.session_id = self.session_id
+        await self._send(msg)
+
+    async def _send_file_chunk(self, msg: Message, source, offset: int, length: int) -> bool:
+        """
+        Envia um pedaço de arquivo: cabeçalho pelo writer, dados direto da origem
+
+        O sendfile só começa com o buffer de escrita vazio (o que input e
+        vídeo já escreveram sai antes); enquanto ele dura, _send espera.
+
+        Returns:
+            bool: False se a conexão caiu (o TransferManager reoferece após retomar)
+        """
+        if self.reconnecting or not self.writer:
             return False
+        msg.session_id = self.session_id
+        header = ProtocolHandler.frame_binary_header(msg.to_json().encode(), length, msg.msg_type, self.compressor)
+        self._sendfile_idle.clear()
+        try:
+            self.writer.write(header)
+            await source.write_to(self.writer, offset, length)
+            return True
+        except (ConnectionError, OSError, RuntimeError) as e:
+            logger.warning(f"Falha ao enviar pedaço de arquivo: {e}")
+            return False
+        finally:
+            self._sendfile_idle.set()
+
+    def _on_remote_clipboard(self, data: bytes):
+        """
+        Área de transferência recebida do outro lado
+
+        Ponto de integração com a área de transferência do sistema; sem
+        interface só guarda o conteúdo.
+        """
+        self.remote_clipboard = data
+
+    async def _announce(self):
+        """Após autenticar: host publica seus monitores, viewer se conecta ao host"""
+        if self.config.role == "host":
+            await self._send(ProtocolHandler.create_monitor_info(
+                self.session_id,
+                self.screen_capture.list_monitors()
+            ))
+        elif self.config.attach_to:
+            await self._send(ProtocolHandler.create_attach(self.session_id, self.config.attach_to))
+            await self._send(ProtocolHandler.create_monitor_select(
+                self.session_id,
+                list(self.config.monitors)
+            ))
+            for path in self.config.send_files:
+                await self.transfers.send_file(path)
+            for path in self.config.fetch_files:
+                await self.transfers.request_file(path)
+
+    async def _offer_udp(self):
+        """Pede o canal UDP de vídeo ao broker (a resposta chega como udp_offer)"""
+        if self.config.udp:
+            await self._send(ProtocolHandler.create_udp_offer(self.session_id))
+
+    async def _setup_udp(self, port: int, token_hex: str):
+        """
+        Abre o socket UDP e confirma o caminho com hello/ack
+
+        Sem ack após UDP_HANDSHAKE_RETRIES hellos (UDP bloqueado), o vídeo
+        continua pelo TCP.
+        """
+        self._reset_udp()
+        host = self.writer.get_extra_info("peername")[0]
+        try:
+            self.udp = await open_endpoint(
+                "::" if ":" in host else "0.0.0.0", 0, self._on_udp_message, self._on_udp_hello,
+                accept=lambda token, addr: token == self.udp_token
+            )
+        except OSError as e:
+            logger.warning(f"Não foi possível abrir UDP ({e}); vídeo segue pelo TCP")
+            return
+
+        self.udp_token = bytes.fromhex(token_hex)
+        self.udp_addr = (host, port)
+        self._udp_acked = asyncio.Event()
+        for _ in range(UDP_HANDSHAKE_RETRIES):
+            self.udp.send_hello(self.udp_token, self.udp_addr)
+            try:
+                await asyncio.wait_for(self._udp_acked.wait(), UDP_HANDSHAKE_TIMEOUT)
+                break
+            except asyncio.TimeoutError:
+                continue
+        else:
+            logger.warning("Sem resposta UDP do broker (bloqueado?); vídeo segue pelo TCP")
+            self._reset_udp()
+            return
+
+        self.udp_ready = True
+        self._udp_loss_seen = (0, 0)
+        self._udp_inbox = asyncio.Queue()
+        self._udp_receiver = asyncio.ensure_future(self._udp_receive_loop())
+        await self._send(ProtocolHandler.create_udp_ready(self.session_id))
+        logger.info(f"Canal UDP de vídeo ativo ({host}:{port})")
+
+    def _on_udp_hello(self, token: bytes, addr: tuple, ack: bool):
+        if ack and token == self.udp_token and self._udp_acked:
+            self._udp_acked.set()
+
+    def _on_udp_message(self, token: bytes, payload: bytes, addr: tuple):
+        if token != self.udp_token:
+            return
+        try:
+            msg = Message.from_json(payload.decode())
+        except Exception as e:
+            logger.error(f"Datagrama inválido: {e}")
+            return
+        if msg.msg_type == "screen_cap" and self._udp_inbox:
+            self._udp_inbox.put_nowait(msg)
+
+    async def _udp_receive_loop(self):
+        """Processa os frames do canal UDP na ordem de chegada"""
+        while True:
+            await self._handle_message(await self._udp_inbox.get())
+
+    async def _check_udp_loss(self):
+        """Viewer: volta ao TCP se o canal UDP perdeu mensagens demais desde a última verificação"""
+        if not self.udp_ready:
+            return
+        stats = self.udp.get_stats()
+        delivered = stats.get("delivered", 0) - self._udp_loss_seen[0]
+        lost = stats.get("lost", 0) - self._udp_loss_seen[1]
+        self._udp_loss_seen = (stats.get("delivered", 0), stats.get("lost", 0))
+        if delivered + lost >= 10 and lost / (delivered + lost) > UDP_FALLBACK_LOSS:
+            logger.warning(f"Perda UDP de {lost}/{delivered + lost} mensagens; voltando ao TCP")
+            self._reset_udp()
+            await self._send(ProtocolHandler.create_udp_close(self.session_id, "perda alta"))
+
+    def _reset_udp(self):
+        """Fecha socket e recepção do canal UDP (o vídeo volta ao TCP)"""
+        self.udp_ready = False
+        if self._udp_receiver:
+            self._udp_receiver.cancel()
+            self._udp_receiver = None
+        self._udp_inbox = None
+        if self.udp:
+            self.udp.close()
+        self.udp = None
+        self.udp_token = None
+
+    def _close_udp(self):
+        """Fecha o canal UDP, inclusive uma negociação em andamento"""
+        if self._udp_setup:
+            self._udp_setup.cancel()
+            self._udp_setup = None
+        self._reset_udp()
+
+    async def start_keepalive_loop(self):
+        """
+        Envia ping periódico (o host pode ficar sem tráfego sem viewers)
+
+        Os pongs também alimentam a sincronização de relógio com o broker;
+        logo após conectar vai uma rajada curta para a primeira estimativa.
+        O viewer aproveita o ciclo para exportar o rastreamento de latência.
+        """
+        try:
+            for _ in range(CLOCK_SYNC_BURST):
+                await self._send(ProtocolHandler.create_ping(self.session_id, now_us()))
+                await asyncio.sleep(0.2)
+
+            while self.running:
+                await asyncio.sleep(PING_INTERVAL)
+                if self.running:
+                    await self._send(ProtocolHandler.create_ping(self.session_id, now_us()))
+                    self._export_trace()
+                    await self._check_udp_loss()
+                    await self._retry_resync()  # Nem sempre chegam frames para disparar a repetição
+        except Exception as e:
+            logger.error(f"Erro no keep-alive: {e}")
+
+    def _export_trace(self):
+        """Viewer: grava histogramas de latência se chegaram frames novos"""
+        if self.tracer and self.tracer.frames != self._traced_frames:
+            self._traced_frames = self.tracer.frames
+            self.tracer.export(TRACE_EXPORT_FILE, self.clock)
 
     async def start_capture_loop(self):
-        """Inicia loop de captura de tela"""
+        """Inicia loop de captura de tela (apenas monitores assinados por viewers)"""
         if not self.authenticated or not self.writer:
             logger.error("Cliente não autenticado ou não conectado")
             return
 
+        if not self.screen_capture:
+            return
+
         logger.info("Iniciando loop de captura de tela")
 
         try:
             while self.running:
-                # Captura tela
-                result = self.screen_capture.capture_frame()
+                if self.reconnecting:
+                    # Sem conexão: não gasta seq com frames que seriam descartados
+                    await asyncio.sleep(0.05)
+                    continue
 
-                if result:
-                    jpeg_data, (width, height) = result
+                # Captura monitores assinados
+                frames = self.screen_capture.capture_frames()
 
+                for frame in frames:
                     # Cria mensagem
                     screen_msg = ProtocolHandler.create_screen_capture(
                         self.session_id,
-                        jpeg_data,
-                        compression_type="jpeg",
-                        width=width,
-                        height=height
+                        frame.data,
+                        compression_type=frame.image_format,
+                        width=frame.width,
+                        height=frame.height,
+                        monitor=frame.monitor,
+                        region=frame.region,
+                        seq=frame.seq,
+                        keyframe=frame.keyframe,
+                        tiles=[
+                            {
+                                "x": tile.x,
+                                "y": tile.y,
+                                "w": tile.width,
+                                "h": tile.height,
+                                "compression": tile.image_format,
+                                "data": tile.data,
+                                "slot": tile.cache_slot
+                            }
+                            for tile in frame.tiles
+                        ],
+                        copy_rects=[
+                            {
+                                "src_x": rect.src_x,
+                                "src_y": rect.src_y,
+                                "dst_x": rect.dst_x,
+                                "dst_y": rect.dst_y,
+                                "w": rect.width,
+                                "h": rect.height
+                            }
+                            for rect in frame.copy_rects
+                        ],
+                        cache_reset=frame.cache_reset,
+                        timestamps={
+                            "grab": self.clock.to_reference(to_us(frame.grab_time)),
+                            "enc": self.clock.to_reference(to_us(frame.encoded_time))
+                        } if TRACE_ENABLED and self.clock.synced else None
                     )
 
                     # Envia
-                    screen_data = ProtocolHandler.serialize_message(screen_msg)
-                    self.writer.write(screen_data)
-                    await self.writer.drain()
+                    if screen_msg.data["ts"] is not None:
+                        screen_msg.data["ts"]["sent"] = self.clock.to_reference(now_us())
+                    await self._send(screen_msg)
 
-                    logger.debug(f"Tela enviada: {len(jpeg_data)} bytes ({width}x{height})")
+                    logger.debug(
+                        f"Tela enviada: monitor {frame.monitor} seq {frame.seq} "
+                        f"{'keyframe' if frame.keyframe else f'delta {len(frame.tiles)} tiles, {len(frame.copy_rects)} cópias'} "
+                        f"({frame.width}x{frame.height})"
+                    )
+
+                # Cursor vai em canal próprio, fora do framebuffer
+                await self._send_cursor()
 
-                else:
-                    await asyncio.sleep(0.01)
+                await self._wait_next_capture()
 
         except Exception as e:
             logger.error(f"Erro no loop de captura: {e}")
         finally:
             logger.info("Loop de captura encerrado")
 
+    async def _wait_next_capture(self):
+        """
+        Host: dorme até o próximo prazo (frame ou leitura do cursor)
+
+        Entrada do usuário, nova assinatura ou pedido de keyframe acordam o
+        laço antes do prazo (_wake_capture); sem monitores assinados espera
+        só pelo despertar.
+        """
+        delay = self.screen_capture.time_until_next()
+        if delay is not None:
+            cursor_delay = self.cursor_tracker.time_until_poll()
+            if cursor_delay is not None:
+                delay = min(delay, cursor_delay)
+            if delay <= 0:
+                return
+
+        try:
+            await asyncio.wait_for(self.capture_wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        self.capture_wakeup.clear()
+
+    def _wake_capture(self, input_event: bool = False):
+        """Host: acorda o laço de captura (entrada do usuário volta os streams ao FPS alvo)"""
+        if not self.screen_capture:
+            return
+        if input_event:
+            self.screen_capture.wake()
+        self.capture_wakeup.set()
+
+    async def _send_cursor(self):
+        """Host: envia posição do cursor (e o formato, na primeira vez que aparece)"""
+        if not self.screen_capture.streams:
+            return
+
+        state = self.cursor_tracker.poll()
+        if not state:
+            return
+
+        located = self.screen_capture.locate(state["x"], state["y"]) if state["visible"] else None
+
+        if located is None:
+            # Oculto ou fora dos monitores assinados: avisa uma vez
+            if self.cursor_monitor is not None:
+                await self._send(ProtocolHandler.create_cursor_position(
+                    self.session_id, self.cursor_monitor, 0, 0, visible=False
+                ))
+                self.cursor_monitor = None
+            return
+
+        monitor, x, y = located
+        shape_id = state["shape_id"]
+
+        if shape_id is not None and shape_id not in self.sent_cursor_shapes:
+            shape = self.cursor_tracker.get_shape(shape_id)
+            if shape:
+                await self._send(ProtocolHandler.create_cursor_shape(
+                    self.session_id, shape_id, shape["image"], shape["width"],
+                    shape["height"], shape["hotspot_x"], shape["hotspot_y"]
+                ))
+                self.sent_cursor_shapes.add(shape_id)
+
+        if self.cursor_monitor is not None and self.cursor_monitor != monitor:
+            await self._send(ProtocolHandler.create_cursor_position(
+                self.session_id, self.cursor_monitor, 0, 0, visible=False
+            ))
+
+        self.cursor_monitor = monitor
+        await self._send(ProtocolHandler.create_cursor_position(
+            self.session_id, monitor, x, y, visible=True, shape_id=shape_id
+        ))
+
     async def start_receive_loop(self):
         """Inicia loop de recepção de eventos"""
         if not self.authenticated or not self.reader:
@@ -192,26 +711,34 @@ class RemoteAccessClient:
 
         try:
             while self.running:
-                data = await asyncio.wait_for(
-                    self.reader.read(4096),
-                    timeout=30.0
-                )
+                try:
+                    data = await asyncio.wait_for(
+                        self.reader.read(FILE_CHUNK_SIZE),
+                        timeout=30.0
+                    )
+                except ConnectionError:
+                    data = b""
 
                 if not data:
                     logger.warning("Servidor desconectou")
-                    self.running = False
-                    break
+                    if not await self._reconnect():
+                        self.running = False
+                        self.capture_wakeup.set()  # Laço de captura pode estar esperando sem prazo
+                        break
+                    await self._offer_udp()  # Canal UDP é por conexão: negocia de novo
+                    await self.transfers.resume()  # Retoma do offset que o receptor já gravou
+                    # Segue para processar o que já chegou junto com a resposta
 
                 self.buffer += data
 
                 # Processa mensagens
                 while self.buffer:
-                    msg, self.buffer = ProtocolHandler.deserialize_message(self.buffer)
+                    msg, self.buffer = ProtocolHandler.deserialize_message(self.buffer, self.compressor)
 
                     if msg is None:
                         break
 
-                    await self._handle_message(msg)
+                    await self.profiler.timed(msg.msg_type, self._handle_message(msg))
 
         except asyncio.TimeoutError:
             logger.warning("Timeout na recepção de dados")
@@ -231,19 +758,207 @@ class RemoteAccessClient:
             x = msg.data.get("x")
             y = msg.data.get("y")
             logger.info(f"Evento de mouse: ({x}, {y})")
+            self._wake_capture(input_event=True)
 
         elif msg_type == "key_evt":
             # Simula pressionamento de tecla
             key = msg.data.get("key")
             action = msg.data.get("action")
             logger.info(f"Evento de teclado: {action} {key}")
+            self._wake_capture(input_event=True)
 
         elif msg_type == "ping":
             # Responde com pong
-            pong = ProtocolHandler.create_pong(self.session_id)
-            pong_data = ProtocolHandler.serialize_message(pong)
-            self.writer.write(pong_data)
-            await self.writer.drain()
+            await self._send(ProtocolHandler.create_pong(self.session_id, msg.data.get("sent_at"), now_us()))
+
+        elif msg_type == "pong":
+            if msg.data.get("echo") is not None and msg.data.get("server_time") is not None:
+                self.clock.update(msg.data["echo"], msg.data["server_time"], now_us())
+
+        elif msg_type == "monitor_sel" and self.screen_capture:
+            # Broker informa a união dos monitores assinados pelos viewers
+            monitors = msg.data.get("monitors", [])
+            self.screen_capture.subscribe(monitors, msg.data.get("fps"))
+            self._wake_capture()
+            logger.info(f"Monitores assinados: {monitors}")
+
+        elif msg_type == "region_sel" and self.screen_capture:
+            # Região de interesse efetiva do monitor (calculada pelo broker)
+            self.screen_capture.set_region(
+                msg.data.get("monitor", 1),
+                msg.data.get("region"),
+                msg.data.get("window")
+            )
+            self._wake_capture(input_event=True)
+
+        elif msg_type == "udp_offer":
+            if msg.data.get("port"):
+                self._close_udp()
+                self._udp_setup = asyncio.ensure_future(self._setup_udp(msg.data["port"], msg.data["token"]))
+            else:
+                logger.info("Broker sem canal UDP; vídeo pelo TCP")
+
+        elif msg_type == "keyframe_req" and self.screen_capture:
+            self.screen_capture.request_keyframe(msg.data.get("monitor", 1))
+            self._wake_capture()
+
+        elif msg_type == "screen_cap":
+            received = now_us()
+            if await self._check_stream_sequence(msg):
+                if await self._resolve_cached_tiles(msg):
+                    self._stamp_received(msg, received)
+                    if self.viewer:
+                        await self.viewer.submit(msg.data)
+            logger.debug(
+                f"Frame recebido: monitor {msg.data.get('monitor')} seq {msg.data.get('seq')} "
+                f"({msg.data.get('width')}x{msg.data.get('height')})"
+            )
+
+        elif msg_type == "cursor_shape":
+            self.cursor_shapes[msg.data.get("shape_id")] = msg.data
+
+        elif msg_type == "cursor_pos":
+            logger.debug(
+                f"Cursor: monitor {msg.data.get('monitor')} ({msg.data.get('x')}, {msg.data.get('y')}) "
+                f"formato {msg.data.get('shape_id')}"
+            )
+
+        elif msg_type == "notification":
+            logger.info(f"Notificação: {msg.data}")
+
+        elif msg_type == "profile_res":
+            status = msg.data.get("status") or {}
+            logger.info(
+                f"Perfil do broker: {'ok' if msg.data.get('success') else msg.data.get('message')} "
+                f"(ativo: {status.get('active')}, arquivos: {status.get('files')})"
+            )
+
+        elif msg_type in FILE_MESSAGE_TYPES:
+            await self.transfers.handle(msg)
+
+        elif msg_type == "error":
+            logger.warning(f"Erro do servidor: {msg.data.get('message')}")
+
+    async def _check_stream_sequence(self, msg: Message) -> bool:
+        """
+        Viewer: detecta lacunas no stream de um monitor e pede keyframe
+
+        Um delta só é aplicável se o frame anterior (seq - 1) foi recebido;
+        após uma lacuna os deltas são ignorados até chegar um keyframe com
+        cache_reset (o cache de tiles pode ter perdido slots junto com os frames).
+        O pedido de keyframe pode se perder no caminho; enquanto o monitor
+        segue fora de sincronia ele é repetido a cada KEYFRAME_RETRY_INTERVAL.
+
+        Returns:
+            bool: True se o frame pode ser aplicado
+        """
+        monitor = msg.data.get("monitor", 1)
+        seq = msg.data.get("seq")
+        if seq is None:
+            return True
+
+        last_seq = self.stream_seq.get(monitor)
+        synced = last_seq is not None
+
+        if msg.data.get("keyframe", True):
+            if synced or msg.data.get("cache_reset", True):
+                self.stream_seq[monitor] = seq
+                self.resync_requested.pop(monitor, None)
+                return True
+            await self._retry_resync(monitor)
+            return False
+
+        if synced and seq == last_seq + 1:
+            self.stream_seq[monitor] = seq
+            return True
+
+        # Lacuna (ou ainda sem keyframe): pede resincronização; já pedida, repete após o intervalo
+        if synced or monitor not in self.stream_seq:
+            await self._request_resync(monitor, f"esperado {last_seq}+1, recebido {seq}")
+        else:
+            await self._retry_resync(monitor)
+        return False
+
+    def _stamp_received(self, msg: Message, received: int):
+        """Viewer: carimba a recepção do frame (o registro sai após a decodificação)"""
+        stamps = msg.data.get("ts")
+        if self.tracer and stamps and self.clock.synced:
+            stamps["vrx"] = self.clock.to_reference(received)
+
+    def _on_frame_complete(self, monitor: int, framebuffer, data: dict):
+        """
+        Viewer: frame composto no framebuffer do monitor
+
+        Ponto de renderização de uma interface; sem ela só registra os
+        carimbos do frame com "dec" ao fim da decodificação.
+        """
+        stamps = data.get("ts")
+        if self.tracer and stamps and "vrx" in stamps:
+            stamps["dec"] = self.clock.to_reference(now_us())
+            self.tracer.record(stamps)
+
+    def _on_decode_error(self, monitor: int, reason: str):
+        """Viewer: frame não decodificado; o framebuffer só volta com keyframe"""
+        if self.running:
+            asyncio.ensure_future(self._request_resync(monitor, f"falha na decodificação: {reason}"))
+
+    async def _request_resync(self, monitor: int, reason: str):
+        """Viewer: descarta o estado do stream e pede keyframe com reset do cache"""
+        logger.warning(f"Lacuna no stream do monitor {monitor} ({reason})")
+        last_seq = self.stream_seq.get(monitor)
+        self.stream_seq[monitor] = None
+        self.resync_requested[monitor] = time.monotonic()
+        await self._send(ProtocolHandler.create_keyframe_request(self.session_id, monitor, last_seq))
+
+    async def _retry_resync(self, monitor: Optional[int] = None):
+        """
+        Viewer: repete o keyframe_req de monitores ainda fora de sincronia
+
+        O pedido anterior pode ter se perdido (host sem conexão no broker,
+        queda do link); sem a repetição o viewer ignoraria os deltas para sempre.
+
+        Args:
+            monitor: Monitor a verificar (None = todos os pendentes)
+        """
+        now = time.monotonic()
+        monitors = [monitor] if monitor is not None else list(self.resync_requested)
+        for index in monitors:
+            requested = self.resync_requested.get(index)
+            if requested is None or self.stream_seq.get(index) is not None:
+                self.resync_requested.pop(index, None)
+                continue
+            if now - requested < KEYFRAME_RETRY_INTERVAL:
+                continue
+            logger.info(f"Monitor {index} ainda fora de sincronia: repetindo pedido de keyframe")
+            self.resync_requested[index] = now
+            await self._send(ProtocolHandler.create_keyframe_request(self.session_id, index, None))
+
+    async def _resolve_cached_tiles(self, msg: Message) -> bool:
+        """
+        Viewer: mantém o cache de tiles espelhado e troca referências pelos tiles
+
+        Tiles com "slot" são guardados no slot indicado pelo host (que decide
+        o despejo); referências ("cache") são substituídas pelo tile guardado.
+
+        Returns:
+            bool: False se alguma referência não pôde ser resolvida (resync pedido)
+        """
+        monitor = msg.data.get("monitor", 1)
+        cache = self.tile_caches.setdefault(monitor, TileCacheMirror())
+        if msg.data.get("cache_reset"):
+            cache.reset()
+
+        tiles = msg.data.get("tiles") or []
+        for i, tile in enumerate(tiles):
+            if tile.get("compression") == "cache":
+                resolved = cache.resolve(tile)
+                if resolved is None:
+                    await self._request_resync(monitor, f"slot {tile.get('slot')} ausente no cache de tiles")
+                    return False
+                tiles[i] = resolved
+            elif tile.get("slot") is not None:
+                cache.store(tile["slot"], tile)
+        return True
 
     async def run(self):
         """Executa cliente"""
@@ -251,11 +966,16 @@ class RemoteAccessClient:
             logger.error("Falha ao conectar ao servidor")
             return
 
+        self.profiler.install_signal()
+
         # Inicia loops de captura e recepção
         try:
+            await self._announce()
+            await self._offer_udp()
             await asyncio.gather(
                 self.start_capture_loop(),
-                self.start_receive_loop()
+                self.start_receive_loop(),
+                self.start_keepalive_loop()
             )
         except KeyboardInterrupt:
             logger.info("Cliente interrompido pelo usuário")
@@ -267,6 +987,10 @@ class RemoteAccessClient:
     def disconnect(self):
         """Desconecta do servidor"""
         self.running = False
+        self.capture_wakeup.set()
+        self._close_udp()
+        self.profiler.stop()
+        self.transfers.close()
 
         if self.session_id and self.writer:
             try:
@@ -274,7 +998,7 @@ class RemoteAccessClient:
                     self.session_id,
                     "Desconexão normal"
                 )
-                data = ProtocolHandler.serialize_message(msg)
+                data = ProtocolHandler.serialize_message(msg, self.compressor)
                 self.writer.write(data)
             except Exception as e:
                 logger.error(f"Erro ao enviar desconexão: {e}")
@@ -285,7 +1009,17 @@ class RemoteAccessClient:
             except:
                 pass
 
-        self.screen_capture.close()
+        if self.compressor:
+            logger.info(f"Bytes por tipo de mensagem: {self.compressor.get_stats()}")
+        if self.tracer and self.tracer.frames:
+            self._export_trace()
+            logger.info(f"Latência por estágio (ms):\n{self.tracer.format_table()}")
+        if self.screen_capture:
+            logger.info(f"Estatísticas do codificador: {self.screen_capture.get_encoder_stats()}")
+            self.screen_capture.close()
+        if self.viewer:
+            logger.info(f"Estatísticas de decodificação: {self.viewer.get_stats()}")
+            self.viewer.close()
         logger.info("Cliente desconectado")
 
 
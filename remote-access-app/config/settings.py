@@ -20,10 +20,21 @@ LOGS_DIR.mkdir(exist_ok=True)
 # Servidor TCP
 SERVER_HOST = "0.0.0.0"  # Escuta em todas as interfaces
 SERVER_PORT = 5500
-SERVER_TIMEOUT = 30
+SERVER_TIMEOUT = 30  # Inatividade máxima de uma conexão (segundos)
+IDLE_SWEEP_INTERVAL = 1.0  # Período da varredura de conexões inativas
+PING_INTERVAL = 10  # Keep-alive do cliente (deve ser menor que SERVER_TIMEOUT)
 
-# Banco de dados de usuários (para MVP, arquivo JSON)
-USERS_DB_FILE = LOGS_DIR / "users.json"
+# Retomada de sessão após queda da conexão
+RESUME_GRACE_PERIOD = 30  # Segundos que a sessão fica reservada após a queda
+RESUME_REPLAY_MAX_BYTES = 8 * 1024 * 1024  # Frames recentes guardados por monitor do host
+RESUME_RETRY_DELAY = 0.5  # Primeira espera entre tentativas do cliente (dobra até 4 s)
+
+# Banco de dados de usuários (SQLite em modo WAL; sessões seguem em JSON)
+USERS_DB_FILE = LOGS_DIR / "users.db"
+LEGACY_USERS_FILE = LOGS_DIR / "users.json"  # Formato antigo, migrado na primeira execução
+USER_CACHE_SIZE = 4096  # Usuários mantidos em memória (LRU)
+USER_CACHE_TTL = 30.0  # Segundos até reler do banco (import --replace com o broker rodando)
+USER_IMPORT_BATCH = 1000  # Linhas por transação na importação em lote
 SESSIONS_DB_FILE = LOGS_DIR / "sessions.json"
 
 # ==================== CONFIGURAÇÕES DO CLIENTE ====================
@@ -60,6 +71,24 @@ LOG_FILE = LOGS_DIR / "app.log"
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
+# Rastreamento de latência por frame (estágios com relógio monotônico)
+TRACE_ENABLED = True
+TRACE_EXPORT_FILE = LOGS_DIR / "frame_trace.json"  # Escrito pelo viewer
+TRACE_SAMPLE_WINDOW = 1000  # Últimos N frames usados nos percentis
+TRACE_HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+CLOCK_SYNC_SAMPLES = 8  # Pings considerados na estimativa de offset (menor RTT)
+CLOCK_SYNC_BURST = 5  # Pings enviados logo após conectar
+
+# Perfilamento sob demanda (sinal ou mensagem "profile" de um usuário com permissão admin)
+PROFILE_DIR = LOGS_DIR / "profiles"  # .folded/.pstats + resumo .json de cada perfil
+PROFILE_SIGNAL = "SIGUSR1"  # Liga/desliga o perfil (kill -USR1 <pid>); ausente no Windows
+PROFILE_DEFAULT_SECONDS = 30  # Duração de um perfil iniciado sem duração explícita
+PROFILE_MAX_SECONDS = 300  # Duração máxima aceita
+PROFILE_SAMPLE_INTERVAL = 0.005  # Período de amostragem das pilhas do loop (segundos)
+PROFILE_LAG_INTERVAL = 0.01  # Período da medição de atraso do loop (segundos)
+PROFILE_SLOW_CALLBACK_MS = 100  # Bloqueio do loop registrado como callback lento (padrão do asyncio)
+PROFILE_HANDLER_SAMPLES = 10000  # Amostras por tipo de mensagem usadas nos percentis
+
 # ==================== LIMITES ====================
 
 # Tamanho máximo de pacote
@@ -69,7 +98,58 @@ MAX_PACKET_SIZE = 1024 * 1024  # 1 MB
 MAX_CONNECTIONS = 100
 
 # Bandwidth (bytes por segundo) - 0 = ilimitado
-BANDWIDTH_LIMIT = 0
+BANDWIDTH_LIMIT = 0  # Saída total do broker
+SESSION_BANDWIDTH_LIMIT = 0  # Saída do broker para cada sessão
+
+# Escalonador de saída do broker (deficit round robin entre sessões e classes)
+BANDWIDTH_CLASS_WEIGHTS = {"input": 8, "control": 4, "video": 1, "bulk": 0.25}  # Quantum relativo por rodada
+DRR_QUANTUM = 16 * 1024  # Bytes por rodada para peso 1
+SCHEDULER_CONN_BUFFER_LIMIT = 1024 * 1024  # Buffer de escrita acima do qual a conexão espera
+SCHEDULER_VIDEO_QUEUE_LIMIT = 8 * 1024 * 1024  # Fila de vídeo por sessão; acima disso descarta e pede keyframe
+
+# Controle de admissão e degradação sob carga (MAX_CONNECTIONS também limita as conexões abertas)
+LOAD_SAMPLE_INTERVAL = 0.5  # Período da medição de atraso do loop e memória (segundos)
+LOOP_LAG_DEGRADE_MS = 50  # Atraso do loop a partir do qual os hosts reduzem o FPS
+LOOP_LAG_OVERLOAD_MS = 200  # Atraso do loop a partir do qual logins são recusados
+MEMORY_LIMIT_MB = 2048  # Memória residente do broker considerada sobrecarga (0 = não monitora)
+ADMISSION_RETRY_AFTER = 5  # Segundos sugeridos ao cliente recusado antes de tentar de novo
+ADMISSION_CLIENT_RETRIES = 5  # Tentativas do cliente recusado por sobrecarga
+DEGRADED_FPS = 5  # FPS máximo dos hosts enquanto o broker está degradado
+LOAD_SHED_INTERVAL = 5.0  # Sobrecarga contínua por este tempo derruba o viewer mais ocioso
+
+# Canal UDP opcional para vídeo (screen_cap); controle e input seguem no TCP
+UDP_ENABLED = True  # Cliente tenta negociar o canal após autenticar
+UDP_PORT = SERVER_PORT  # Porta UDP do broker (0 = desativa no broker)
+UDP_MTU = 1200  # Tamanho máximo de cada datagrama (cabe em qualquer caminho comum)
+UDP_FEC_GROUP = 4  # Fragmentos por paridade XOR (0 = sem FEC)
+UDP_SOCKET_BUFFER = 4 * 1024 * 1024  # SO_RCVBUF/SO_SNDBUF pedidos (o SO pode limitar)
+UDP_REASSEMBLY_TIMEOUT = 0.5  # Mensagem incompleta há mais que isso é dada como perdida
+UDP_HANDSHAKE_TIMEOUT = 0.5  # Espera por resposta a cada hello
+UDP_HANDSHAKE_RETRIES = 4  # Hellos sem resposta antes de ficar só no TCP
+UDP_FALLBACK_LOSS = 0.3  # Perda de mensagens (por ciclo de ping) que faz voltar ao TCP
+UDP_SIMULATED_LOSS = 0.0  # Descarte aleatório de datagramas recebidos (testes em localhost)
+
+# Federação de brokers: viewers assistem hosts conectados a outro broker (malha completa)
+PEER_BROKERS = []  # [(host, porta)] dos brokers vizinhos; vazio = broker isolado
+PEER_SECRET_DEFAULT = "troque-este-segredo-compartilhado-entre-brokers"  # Exemplo: com ele, links são recusados
+PEER_SECRET = PEER_SECRET_DEFAULT  # ⚠️ MUDAR para federar (o mesmo em todos os brokers)
+PEER_REQUEST_TIMEOUT = 3.0  # Espera pelo hello e por cada consulta a um broker vizinho
+PEER_RECONNECT_DELAY = 1.0  # Primeira espera para refazer um link caído (dobra até 8x)
+
+# Anel em memória compartilhada: frames capturados para consumidores locais (gravador, monitoramento)
+SHM_RING_ENABLED = False  # Host publica os frames RGB de cada monitor capturado
+SHM_RING_NAME = "remote-access-screen"  # Prefixo dos segmentos (um por monitor: <prefixo>-<monitor>)
+SHM_RING_SLOTS = 4  # Frames guardados; o mais antigo é sobrescrito (leitor lento perde frames)
+SHM_RING_POLL_INTERVAL = 0.005  # Espera entre consultas do leitor sem socket Unix (Windows)
+
+# Transferência de arquivos e área de transferência (pedaços binários, classe "bulk" no broker)
+FILE_TRANSFER_DIR = BASE_DIR / "transfers"  # Arquivos recebidos (e .part das transferências em andamento)
+FILE_SERVE_ROOT = None  # Host: pasta atendida em pedidos de arquivo (None = não atende; ex.: BASE_DIR / "shared")
+FILE_CHUNK_SIZE = 64 * 1024  # Bytes por pedaço (múltiplo de mmap.ALLOCATIONGRANULARITY)
+FILE_WINDOW = 1024 * 1024  # Bytes enviados e ainda não confirmados por transferência
+FILE_ACK_INTERVAL = 256 * 1024  # Receptor confirma a cada N bytes gravados
+FILE_CLIPBOARD_MAX = 16 * 1024 * 1024  # Maior conteúdo de área de transferência aceito (em memória)
+FILE_RECEIVE_MAX = 4 * 1024 ** 3  # Maior arquivo aceito numa oferta (None = só o espaço livre em disco limita)
 
 # ==================== MODO DEBUG ====================
 
@@ -89,15 +169,88 @@ MESSAGE_TYPES = {
     "PONG": "pong",
     "DISCONNECT": "disconnect",
     "ERROR": "error",
-    "NOTIFICATION": "notification"
+    "NOTIFICATION": "notification",
+    "ATTACH": "attach",
+    "MONITOR_INFO": "monitor_info",
+    "MONITOR_SELECT": "monitor_sel",
+    "REGION_SELECT": "region_sel",
+    "REQUEST_KEYFRAME": "keyframe_req",
+    "CURSOR_POSITION": "cursor_pos",
+    "CURSOR_SHAPE": "cursor_shape",
+    "RESUME": "resume",
+    "UDP_OFFER": "udp_offer",
+    "UDP_READY": "udp_ready",
+    "UDP_CLOSE": "udp_close",
+    "PEER_HELLO": "peer_hello",
+    "PEER_ATTACH": "peer_attach",
+    "PEER_ATTACH_RESULT": "peer_attach_res",
+    "PEER_DETACH": "peer_detach",
+    "PROFILE": "profile",
+    "PROFILE_RESULT": "profile_res",
+    "FILE_REQUEST": "file_req",
+    "FILE_OFFER": "file_offer",
+    "FILE_ACCEPT": "file_accept",
+    "FILE_CHUNK": "file_chunk",
+    "FILE_ACK": "file_ack",
+    "FILE_CANCEL": "file_cancel"
 }
 
+# Papéis de cliente: host (compartilha a tela) ou viewer (assiste/controla)
+CLIENT_ROLES = ["host", "viewer"]
+
 # ==================== COMPRESSÃO ====================
 
 # Método de compressão de imagem
 COMPRESSION_ENABLED = True
-COMPRESSION_METHOD = "jpeg"  # png, jpeg
+COMPRESSION_METHOD = "adaptive"  # adaptive, png, jpeg
 COMPRESSION_LEVEL = 85  # Para JPEG
+PNG_COMPRESS_LEVEL = 1  # zlib do PNG (1 = rápido, 9 = menor)
+
+# Classificação do modo adaptive (sintético -> PNG paleta, fotográfico -> JPEG)
+ADAPTIVE_MAX_COLORS = 256  # Até N cores: paleta sem perdas
+ADAPTIVE_ENTROPY_THRESHOLD = 5.0  # Entropia de luminância (bits) abaixo = sintético
+ADAPTIVE_SAMPLE_STEP = 4  # Amostra 1 a cada N pixels em cada eixo
+
+# Codificação paralela (pool de processos + memória compartilhada)
+ENCODER_WORKERS = 0  # 0 = automático (núcleos - 1, até 4); 1 = sem pool
+PARALLEL_ENCODE_MIN_PIXELS = 1280 * 720  # Abaixo disso codifica no próprio processo
+
+# Compressão do stream de mensagens (controle/input), negociada na autenticação
+STREAM_COMPRESSION_ENABLED = True
+STREAM_COMPRESSION_METHODS = ["zstd", "zlib"]  # Ordem de preferência
+STREAM_COMPRESSION_LEVEL = 6
+STREAM_COMPRESSION_MIN_SIZE = 32  # Mensagens menores não são comprimidas
+STREAM_COMPRESSIBLE_TYPES = [
+    "mouse_evt", "key_evt", "ping", "pong",
+    "error", "notification", "disconnect", "cursor_pos"
+]
+
+# ==================== STREAM DE VÍDEO ====================
+
+# Keyframes periódicos + deltas por tile numerados por sequência
+KEYFRAME_INTERVAL = 150  # Frames entre keyframes (~10 s a 15 FPS)
+TILE_SIZE = 64  # Lado dos tiles dos deltas (pixels)
+TILE_CACHE_SIZE = 2048  # Slots do cache de tiles por monitor (espelhado no viewer)
+DELTA_MAX_CHANGED_RATIO = 0.5  # Acima desta fração de área alterada envia keyframe
+KEYFRAME_RETRY_INTERVAL = 2.0  # Viewer fora de sincronia repete o keyframe_req após este tempo (s)
+
+# Detecção de rolagem/arraste (copy-rect)
+SCROLL_DETECT_MIN_RATIO = 0.1  # Só procura deslocamentos se ao menos esta fração mudou
+SCROLL_STRIP_WIDTH = 256  # Largura das faixas de hash de linha (múltiplo de 8)
+SCROLL_MIN_ROWS = 16  # Mínimo de linhas deslocadas para emitir COPY_RECT
+
+# Cadência de captura (prazos monotônicos por monitor)
+PACER_IDLE_AFTER = 3  # Capturas seguidas sem mudança antes de espaçar as próximas
+PACER_IDLE_MAX_INTERVAL = 0.5  # Intervalo máximo entre capturas com a tela parada (dobra até aqui)
+
+# Cursor enviado em canal próprio (não é desenhado na captura)
+CURSOR_FPS = 30  # Atualizações máximas de posição por segundo
+CURSOR_SHAPE_CACHE_SIZE = 64  # Formatos guardados pelo broker por host
+
+# Viewer: decodificação e composição no framebuffer persistente
+VIEWER_DECODE_WORKERS = 4  # Threads de decodificação (o PIL libera o GIL ao decodificar)
+VIEWER_MAX_PENDING = 3  # Frames por monitor aguardando decodificação antes de segurar a leitura
+VIEWER_STATS_WINDOW = 300  # Últimos N frames usados no FPS e na latência de decodificação
 
 # ==================== RESOLUÇÃO DA TELA ====================
 
@@ -0,0 +1,214 @@
+"""
+Controle de admissão do broker
+Acompanha conexões abertas, atraso do loop asyncio e memória residente,
+classifica a carga em níveis e decide quando recusar conexões/logins
+(com um retry-after para o cliente) e quando derrubar viewers
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+from config.settings import (
+    MAX_CONNECTIONS, LOOP_LAG_DEGRADE_MS, LOOP_LAG_OVERLOAD_MS,
+    MEMORY_LIMIT_MB, ADMISSION_RETRY_AFTER, LOAD_SHED_INTERVAL
+)
+
+try:
+    import psutil
+except ImportError:  # psutil é opcional; no Linux /proc basta
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Níveis de carga, do mais leve ao mais grave
+LOAD_NORMAL = "normal"
+LOAD_DEGRADED = "degraded"  # Hosts limitados a DEGRADED_FPS
+LOAD_OVERLOADED = "overloaded"  # Logins recusados; viewers ociosos derrubados
+LOAD_LEVELS = [LOAD_NORMAL, LOAD_DEGRADED, LOAD_OVERLOADED]
+
+# Peso da amostra nova na média móvel do atraso do loop
+LAG_SMOOTHING = 0.3
+
+
+def resident_memory_mb() -> Optional[float]:
+    """Memória residente do processo em MB (None se não for possível medir)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class AdmissionController:
+    """
+    Decide admissão e degradação a partir de amostras periódicas
+
+    Sobe de nível assim que um limite é ultrapassado e só desce quando a
+    métrica volta abaixo da metade do limite (histerese), para não oscilar
+    o FPS dos hosts a cada amostra.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        lag_degrade_ms: float = LOOP_LAG_DEGRADE_MS,
+        lag_overload_ms: float = LOOP_LAG_OVERLOAD_MS,
+        memory_limit_mb: float = MEMORY_LIMIT_MB,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+        shed_interval: float = LOAD_SHED_INTERVAL
+    ):
+        """
+        Inicializa o controle de admissão
+
+        Args:
+            max_connections (int): Conexões abertas simultâneas aceitas
+            lag_degrade_ms (float): Atraso do loop que degrada as sessões
+            lag_overload_ms (float): Atraso do loop que recusa logins
+            memory_limit_mb (float): Memória residente de sobrecarga (0 = ignora)
+            retry_after (int): Segundos sugeridos aos clientes recusados
+            shed_interval (float): Sobrecarga contínua entre viewers derrubados
+        """
+        self.max_connections = max_connections
+        self.lag_degrade_ms = lag_degrade_ms
+        self.lag_overload_ms = lag_overload_ms
+        self.memory_limit_mb = memory_limit_mb
+        self.retry_after = retry_after
+        self.shed_interval = shed_interval
+
+        self.level = LOAD_NORMAL
+        self.lag_ms = 0.0
+        self.memory_mb: Optional[float] = None
+        self.overloaded_since: Optional[float] = None
+        self.last_shed = 0.0
+        self.rejected = {"connections": 0, "logins": 0}
+        self.shed_viewers = 0  # Incrementado pelo broker ao derrubar
+
+    def _target_level(self) -> str:
+        """Nível indicado pelas métricas atuais (com histerese para descer)"""
+        memory = self.memory_mb or 0.0
+        limit = self.memory_limit_mb
+
+        if self.lag_ms >= self.lag_overload_ms or (limit and memory >= limit):
+            return LOAD_OVERLOADED
+        # Abaixo dos limites: desce um nível só com folga
+        if self.level == LOAD_OVERLOADED and not (
+            self.lag_ms < self.lag_overload_ms / 2 and (not limit or memory < 0.8 * limit)
+        ):
+            return LOAD_OVERLOADED
+
+        if self.lag_ms >= self.lag_degrade_ms or (limit and memory >= 0.8 * limit):
+            return LOAD_DEGRADED
+        if self.level != LOAD_NORMAL and not (
+            self.lag_ms < self.lag_degrade_ms / 2 and (not limit or memory < 0.6 * limit)
+        ):
+            return LOAD_DEGRADED
+        return LOAD_NORMAL
+
+    def update(self, lag_ms: float, now: float = None) -> str:
+        """
+        Registra uma amostra e recalcula o nível de carga
+
+        Args:
+            lag_ms: Atraso medido do loop (quanto um sleep passou do previsto)
+            now: Instante monotônico da amostra
+
+        Returns:
+            str: Nível de carga atual
+        """
+        now = time.monotonic() if now is None else now
+        self.lag_ms += LAG_SMOOTHING * (max(0.0, lag_ms) - self.lag_ms)
+        if self.memory_limit_mb:
+            self.memory_mb = resident_memory_mb()
+
+        level = self._target_level()
+        if level != self.level:
+            logger.warning(
+                f"Carga do broker: {self.level} -> {level} "
+                f"(atraso {self.lag_ms:.1f} ms, memória {self.memory_mb or 0:.0f} MB)"
+            )
+            self.level = level
+
+        if level == LOAD_OVERLOADED:
+            if self.overloaded_since is None:
+                self.overloaded_since = now
+                self.last_shed = now
+        else:
+            self.overloaded_since = None
+        return level
+
+    @property
+    def degraded(self) -> bool:
+        """True em qualquer nível acima do normal"""
+        return self.level != LOAD_NORMAL
+
+    def admit_connection(self, open_connections: int) -> Optional[int]:
+        """
+        Decide se uma conexão nova é aceita
+
+        Args:
+            open_connections: Conexões abertas antes desta
+
+        Returns:
+            int: Segundos para o cliente tentar de novo (recusada)
+            None: Aceita
+        """
+        if open_connections >= self.max_connections or self.level == LOAD_OVERLOADED:
+            self.rejected["connections"] += 1
+            return self.retry_after
+        return None
+
+    def admit_login(self) -> Optional[int]:
+        """
+        Decide se uma autenticação nova é aceita (retomadas não passam aqui)
+
+        Returns:
+            int: Segundos para o cliente tentar de novo (recusada)
+            None: Aceita
+        """
+        if self.level == LOAD_OVERLOADED:
+            self.rejected["logins"] += 1
+            return self.retry_after
+        return None
+
+    def should_shed(self, now: float = None) -> bool:
+        """
+        Verifica se é hora de derrubar mais um viewer
+
+        Só depois de shed_interval em sobrecarga contínua (a redução de FPS
+        tem esse tempo para surtir efeito) e no máximo um por intervalo.
+        """
+        if self.overloaded_since is None:
+            return False
+        now = time.monotonic() if now is None else now
+        if now - self.last_shed < self.shed_interval:
+            return False
+        self.last_shed = now
+        return True
+
+    def get_stats(self) -> Dict:
+        """Nível, métricas e contadores de recusa"""
+        return {
+            "level": self.level,
+            "loop_lag_ms": round(self.lag_ms, 2),
+            "memory_mb": round(self.memory_mb, 1) if self.memory_mb is not None else None,
+            "rejected": dict(self.rejected),
+            "shed_viewers": self.shed_viewers
+        }
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    admission = AdmissionController(shed_interval=1.0)
+    for second, lag in enumerate([5, 80, 120, 400, 600, 600, 600, 30, 10, 5, 2, 1]):
+        level = admission.update(lag, now=float(second))
+        print(f"t={second:>2}s atraso={lag:>4} ms -> {level:<10} "
+              f"login={'recusado' if admission.admit_login() else 'aceito'} "
+              f"derrubar={admission.should_shed(now=float(second))}")
+    print(admission.get_stats())
@@ -0,0 +1,221 @@
+"""
+Federação de brokers
+Links TCP entre brokers, com o mesmo enquadramento do protocolo dos
+clientes e autenticação mútua por desafio-resposta (HMAC com segredo
+compartilhado, um nonce escolhido por cada lado). Cada
+host assistido de outro broker vira um relay: os frames cruzam o link uma
+vez e o broker do viewer os distribui aos seus viewers locais
+"""
+
+import asyncio
+import hmac
+import hashlib
+import secrets
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.settings import (
+    PEER_SECRET, PEER_SECRET_DEFAULT, PEER_REQUEST_TIMEOUT, PEER_RECONNECT_DELAY, PING_INTERVAL
+)
+from shared.protocol import ProtocolHandler, Message
+
+logger = logging.getLogger(__name__)
+
+
+def peering_enabled(peers: List[Tuple[str, int]], secret: str = PEER_SECRET) -> bool:
+    """Federação só com vizinhos configurados e um segredo diferente do de exemplo"""
+    return bool(peers) and bool(secret) and secret != PEER_SECRET_DEFAULT
+
+
+def sign_hello(role: str, broker_id: str, nonce: str, secret: str = PEER_SECRET) -> str:
+    """
+    HMAC-SHA256 de "role:broker_id:nonce" (hex)
+
+    Args:
+        role: "accept" (resposta de quem recebeu o link) ou "connect" (prova
+            de quem o abriu); provas de um papel não servem para o outro
+        broker_id: Quem assina
+        nonce: Desafio escolhido pelo outro lado
+    """
+    return hmac.new(secret.encode(), f"{role}:{broker_id}:{nonce}".encode(), hashlib.sha256).hexdigest()
+
+
+def verify_hello(msg: Message, role: str, nonce: str, secret: str = PEER_SECRET) -> bool:
+    """Confere a prova de um peer_hello para o desafio que este broker enviou"""
+    broker_id = msg.data.get("broker_id")
+    signature = msg.data.get("signature")
+    if not broker_id or not signature or not nonce:
+        return False
+    return hmac.compare_digest(signature, sign_hello(role, broker_id, nonce, secret))
+
+
+async def read_messages(reader: asyncio.StreamReader) -> AsyncIterator[Message]:
+    """Mensagens enquadradas de um link (sem compressão de stream) até o EOF"""
+    buffer = b""
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return
+        buffer += data
+        while buffer:
+            msg, buffer = ProtocolHandler.deserialize_message(buffer)
+            if msg is None:
+                break
+            yield msg
+
+
+class PeerLink:
+    """
+    Link estabelecido com outro broker (aberto por qualquer um dos lados)
+
+    Mensagens de controle do link (peer_*) saem direto no socket; as dos
+    relays passam pelo escalonador do broker, pelas conexões virtuais
+    guardadas em relays.
+    """
+
+    def __init__(self, broker_id: str, writer: asyncio.StreamWriter, address: tuple, outbound: bool):
+        """
+        Args:
+            broker_id (str): Identificador do broker vizinho
+            writer: Socket do link
+            address (tuple): Endereço do vizinho
+            outbound (bool): True se este broker abriu o link
+        """
+        self.broker_id = broker_id
+        self.writer = writer
+        self.address = address
+        self.outbound = outbound
+        self.relays: Dict[str, object] = {}  # relay_id -> ClientConnection virtual
+        self.pending: Dict[str, asyncio.Future] = {}  # relay_id -> resposta de peer_attach
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing()
+
+    def send(self, msg: Message):
+        """Envia uma mensagem de controle do link"""
+        if not self.closed:
+            self.writer.write(ProtocolHandler.serialize_message(msg))
+
+    async def request(self, msg: Message, timeout: float = PEER_REQUEST_TIMEOUT) -> Optional[Message]:
+        """
+        Envia um pedido e espera a resposta com o mesmo relay_id
+
+        Returns:
+            Message: Resposta do vizinho
+            None: Sem resposta no prazo (ou link caiu)
+        """
+        relay_id = msg.data["relay_id"]
+        future = asyncio.get_running_loop().create_future()
+        self.pending[relay_id] = future
+        self.send(msg)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            logger.warning(f"Broker {self.broker_id} não respondeu a {msg.msg_type}")
+            return None
+        finally:
+            self.pending.pop(relay_id, None)
+
+    def resolve(self, msg: Message):
+        """Entrega uma resposta ao pedido pendente"""
+        future = self.pending.get(msg.data.get("relay_id"))
+        if future and not future.done():
+            future.set_result(msg)
+
+    def close(self):
+        """Fecha o socket e falha os pedidos pendentes"""
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("link encerrado"))
+        self.pending.clear()
+        self.writer.close()
+
+
+class PeerConnector:
+    """
+    Mantém o link de saída para um broker vizinho
+
+    Conecta e autentica com peer_hello nos dois sentidos: envia um nonce,
+    confere a resposta do vizinho para ele e prova o segredo para o nonce
+    que o vizinho mandou de volta. Envia pings para o watchdog de
+    inatividade do outro lado e reconecta com espera crescente.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        broker_id: str,
+        on_link: Callable[[PeerLink], None],
+        on_message: Callable[[PeerLink, Message], Awaitable[None]],
+        on_link_down: Callable[[PeerLink], Awaitable[None]],
+        secret: str = PEER_SECRET
+    ):
+        """
+        Args:
+            host, port: Endereço do vizinho (porta TCP dos clientes)
+            broker_id: Identificador deste broker
+            on_link: Link autenticado
+            on_message: Mensagem recebida pelo link
+            on_link_down: Link caiu (relays devem ser desfeitos)
+            secret: Segredo compartilhado entre os brokers
+        """
+        self.host = host
+        self.port = port
+        self.broker_id = broker_id
+        self.on_link = on_link
+        self.on_message = on_message
+        self.on_link_down = on_link_down
+        self.secret = secret
+
+    async def _handshake(self, writer: asyncio.StreamWriter, messages: AsyncIterator[Message]) -> PeerLink:
+        nonce = secrets.token_hex(16)
+        writer.write(ProtocolHandler.serialize_message(ProtocolHandler.create_peer_hello(self.broker_id, nonce)))
+        reply = await asyncio.wait_for(messages.__anext__(), PEER_REQUEST_TIMEOUT)
+        challenge = reply.data.get("nonce")
+        if reply.msg_type != "peer_hello" or not challenge or not verify_hello(reply, "accept", nonce, self.secret):
+            raise ValueError(f"resposta não autenticada ({reply.msg_type})")
+        # Prova para o desafio do vizinho; se ele a recusar, fecha o link
+        writer.write(ProtocolHandler.serialize_message(ProtocolHandler.create_peer_hello(
+            self.broker_id, signature=sign_hello("connect", self.broker_id, challenge, self.secret)
+        )))
+        return PeerLink(reply.data["broker_id"], writer, (self.host, self.port), outbound=True)
+
+    async def _keepalive(self, link: PeerLink):
+        while not link.closed:
+            await asyncio.sleep(PING_INTERVAL)
+            link.send(ProtocolHandler.create_ping(self.broker_id))
+
+    async def run(self):
+        """Loop de conexão (uma task por vizinho)"""
+        delay = PEER_RECONNECT_DELAY
+        while True:
+            link = None
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                messages = read_messages(reader)
+                link = await self._handshake(writer, messages)
+                delay = PEER_RECONNECT_DELAY
+                logger.info(f"Link com o broker {link.broker_id} ({self.host}:{self.port}) estabelecido")
+                self.on_link(link)
+
+                keepalive = asyncio.ensure_future(self._keepalive(link))
+                try:
+                    async for msg in messages:
+                        await self.on_message(link, msg)
+                finally:
+                    keepalive.cancel()
+            except (OSError, asyncio.TimeoutError, StopAsyncIteration, ValueError) as e:
+                logger.warning(f"Link com {self.host}:{self.port} indisponível: {e or type(e).__name__}")
+            except Exception as e:
+                logger.error(f"Erro no link com {self.host}:{self.port}: {e}")
+            finally:
+                if link:
+                    await self.on_link_down(link)
+                elif writer:
+                    writer.close()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, PEER_RECONNECT_DELAY * 8)
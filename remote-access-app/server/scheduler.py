@@ -0,0 +1,295 @@
+"""
+Escalonador de saída do broker
+Token buckets hierárquicos (limite global e por sessão) e deficit round
+robin entre filas por sessão e classe de tráfego (input, controle, vídeo,
+arquivos), para que um host 4K não esgote o uplink dos demais e o input
+continue com latência baixa
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from config.settings import (
+    BANDWIDTH_LIMIT, SESSION_BANDWIDTH_LIMIT, BANDWIDTH_CLASS_WEIGHTS,
+    DRR_QUANTUM, SCHEDULER_CONN_BUFFER_LIMIT, SCHEDULER_VIDEO_QUEUE_LIMIT
+)
+from shared.protocol import ProtocolHandler, Message
+
+logger = logging.getLogger(__name__)
+
+# Classe de cada tipo de mensagem (demais tipos: "control").
+# Formato e posição do cursor ficam na mesma fila para manter a ordem entre eles.
+MESSAGE_CLASSES = {
+    "mouse_evt": "input",
+    "key_evt": "input",
+    "cursor_pos": "input",
+    "cursor_shape": "input",
+    "screen_cap": "video",
+    "file_chunk": "bulk"
+}
+
+# Todas as classes, independentes dos pesos: pesos customizados que omitam
+# uma classe usam peso 1 (ver _serve_flow), sem KeyError nem filas esquecidas
+TRAFFIC_CLASSES = tuple(sorted(set(MESSAGE_CLASSES.values()) | {"control"}))
+
+
+class TokenBucket:
+    """
+    Token bucket em bytes por segundo (rate 0 = ilimitado)
+
+    Permite dívida: um pacote maior que o saldo sai assim que o saldo é
+    positivo e o deixa negativo, então pacotes grandes não ficam presos.
+    """
+
+    def __init__(self, rate: int, burst: int = None):
+        """
+        Args:
+            rate (int): Bytes por segundo (0 = ilimitado)
+            burst (int): Saldo máximo acumulado (padrão: 1/4 de segundo de taxa)
+        """
+        self.rate = rate
+        self.burst = burst or max(rate // 4, DRR_QUANTUM)
+        self.tokens = float(self.burst)
+        self.last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, now: float) -> float:
+        """Segundos até o bucket liberar envio (0 = pode enviar)"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def consume(self, size: int):
+        """Desconta bytes enviados"""
+        if self.rate:
+            self.tokens -= size
+
+
+class _Flow:
+    """Fila de uma sessão para uma classe de tráfego"""
+
+    __slots__ = ("conn", "key", "traffic_class", "queue", "deficit", "queued_bytes")
+
+    def __init__(self, conn, key: int, traffic_class: str):
+        self.conn = conn
+        self.key = key
+        self.traffic_class = traffic_class
+        # (json, tipo, compressor da conexão no momento do enfileiramento, via UDP,
+        # dados binários anexados ou None)
+        self.queue: Deque[Tuple[bytes, str, object, bool, Optional[bytes]]] = deque()
+        self.deficit = 0
+        self.queued_bytes = 0
+
+
+class FairScheduler:
+    """
+    Fila de saída única do broker
+
+    As mensagens são enfileiradas já em JSON (retrato do conteúdo no
+    momento do envio lógico) e só comprimidas/enquadradas ao sair, para
+    que o contexto de compressão de cada conexão veja a ordem real da rede.
+    A cada rodada cada fila ativa recebe quantum proporcional ao peso da
+    sua classe; o envio respeita o bucket global e o da sessão e pula
+    conexões com buffer de escrita cheio (cliente lento não trava os demais).
+    """
+
+    def __init__(
+        self,
+        global_limit: int = BANDWIDTH_LIMIT,
+        session_limit: int = SESSION_BANDWIDTH_LIMIT,
+        weights: Dict[str, float] = None,
+        quantum: int = DRR_QUANTUM,
+        on_video_overflow: Optional[Callable] = None,
+        datagram_sender: Optional[Callable] = None
+    ):
+        """
+        Inicializa o escalonador
+
+        Args:
+            global_limit (int): Bytes/s de saída do broker (0 = ilimitado)
+            session_limit (int): Bytes/s de saída por sessão (0 = ilimitado)
+            weights (Dict[str, float]): Peso de cada classe no DRR
+            quantum (int): Bytes por rodada para peso 1
+            on_video_overflow: Chamado com a conexão quando a fila de vídeo
+                dela é descartada (o broker pede keyframe)
+            datagram_sender: Envia (conexão, JSON) pelo canal UDP e retorna
+                os bytes enviados (mensagens enfileiradas com datagram=True)
+        """
+        self.global_bucket = TokenBucket(global_limit)
+        self.session_limit = session_limit
+        self.weights = dict(weights or BANDWIDTH_CLASS_WEIGHTS)
+        self.quantum = quantum
+        self.on_video_overflow = on_video_overflow
+        self.datagram_sender = datagram_sender
+
+        self.flows: Dict[Tuple[int, str], _Flow] = {}
+        self.session_buckets: Dict[int, TokenBucket] = {}
+        self.active: Deque[_Flow] = deque()
+        self.wakeup = asyncio.Event()
+        self.stats: Dict[str, Dict[str, int]] = {
+            traffic_class: {"messages": 0, "bytes": 0, "dropped": 0}
+            for traffic_class in TRAFFIC_CLASSES
+        }
+
+    @staticmethod
+    def classify(msg_type: str) -> str:
+        """Retorna a classe de tráfego de um tipo de mensagem"""
+        return MESSAGE_CLASSES.get(msg_type, "control")
+
+    def enqueue(self, conn, msg: Message, datagram: bool = False):
+        """
+        Enfileira uma mensagem para a conexão
+
+        Args:
+            conn: ClientConnection de destino (writer e compressor)
+            msg: Mensagem a enviar
+            datagram: Sai pelo canal UDP (sem compressão de stream) em vez do TCP
+        """
+        traffic_class = self.classify(msg.msg_type)
+        key = id(conn)
+        flow = self.flows.get((key, traffic_class))
+        if flow is None:
+            flow = _Flow(conn, key, traffic_class)
+            self.flows[(key, traffic_class)] = flow
+            if key not in self.session_buckets:
+                self.session_buckets[key] = TokenBucket(self.session_limit)
+
+        payload = msg.to_json().encode()
+        size = len(payload) + (len(msg.payload) if msg.payload is not None else 0)
+
+        # Vídeo atrasado demais: descarta a fila (deltas dependem uns dos outros)
+        if traffic_class == "video" and flow.queued_bytes + size > SCHEDULER_VIDEO_QUEUE_LIMIT:
+            self.stats["video"]["dropped"] += len(flow.queue) + 1
+            flow.queue.clear()
+            flow.queued_bytes = 0
+            if self.on_video_overflow:
+                self.on_video_overflow(conn)
+            return
+
+        if not flow.queue:
+            self.active.append(flow)
+        flow.queue.append((payload, msg.msg_type, conn.compressor, datagram, msg.payload))
+        flow.queued_bytes += size
+        self.wakeup.set()
+
+    def remove(self, conn):
+        """Descarta filas e bucket de uma conexão encerrada"""
+        key = id(conn)
+        for traffic_class in TRAFFIC_CLASSES:
+            flow = self.flows.pop((key, traffic_class), None)
+            if flow:
+                flow.queue.clear()
+        self.session_buckets.pop(key, None)
+        self.active = deque(flow for flow in self.active if flow.key != key)
+
+    def _sendable(self, flow: _Flow) -> bool:
+        """Conexão ainda aberta e sem buffer de escrita acumulado"""
+        writer = flow.conn.writer
+        if writer is None or writer.is_closing():
+            return False
+        return writer.transport.get_write_buffer_size() < SCHEDULER_CONN_BUFFER_LIMIT
+
+    def _serve(self, flow: _Flow, now: float) -> float:
+        """
+        Atende uma fila por até um quantum
+
+        Returns:
+            float: Espera sugerida pelos buckets (0 se não foi limitado)
+        """
+        bucket = self.session_buckets[flow.key]
+        wait = max(self.global_bucket.wait_time(now), bucket.wait_time(now))
+        if wait:
+            return wait  # Sem crédito nesta rodada (não acumula enquanto limitado)
+        flow.deficit += self.quantum * self.weights.get(flow.traffic_class, 1)
+
+        while flow.queue:
+            payload, msg_type, compressor, datagram, binary = flow.queue[0]
+            size = len(payload) + (len(binary) if binary is not None else 0)
+            if size > flow.deficit:
+                return 0.0
+
+            wait = max(self.global_bucket.wait_time(now), bucket.wait_time(now))
+            if wait:
+                return wait
+
+            flow.queue.popleft()
+            flow.queued_bytes -= size
+            if datagram:
+                sent = self.datagram_sender(flow.conn, payload)
+            elif binary is not None:
+                # Pacote binário: os dados vão para o socket sem concatenar
+                header = ProtocolHandler.frame_binary_header(payload, len(binary), msg_type, compressor)
+                flow.conn.writer.write(header)
+                flow.conn.writer.write(binary)
+                sent = len(header) + len(binary)
+            else:
+                data = ProtocolHandler.frame_payload(payload, msg_type, compressor)
+                flow.conn.writer.write(data)
+                sent = len(data)
+
+            flow.deficit -= size
+            self.global_bucket.consume(sent)
+            bucket.consume(sent)
+            stats = self.stats[flow.traffic_class]
+            stats["messages"] += 1
+            stats["bytes"] += sent
+
+        flow.deficit = 0  # Fila vazia não acumula crédito
+        return 0.0
+
+    async def run(self):
+        """Loop de envio (uma task por broker)"""
+        while True:
+            if not self.active:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            waits = []
+            progressed = False
+
+            for _ in range(len(self.active)):
+                flow = self.active.popleft()
+                if (flow.key, flow.traffic_class) not in self.flows:
+                    continue  # Conexão removida
+
+                if not self._sendable(flow):
+                    if flow.conn.writer is None or flow.conn.writer.is_closing():
+                        flow.queue.clear()
+                        flow.queued_bytes = 0
+                        continue
+                    self.active.append(flow)
+                    continue
+
+                # Atendida sem limite de bucket conta como progresso, mesmo que só
+                # tenha acumulado crédito para uma mensagem maior que o quantum
+                wait = self._serve(flow, now)
+                if wait:
+                    waits.append(wait)
+                else:
+                    progressed = True
+                if flow.queue:
+                    self.active.append(flow)
+
+            if not progressed:
+                # Tudo limitado por bucket ou por buffer de escrita cheio
+                await asyncio.sleep(min(waits) if waits else 0.005)
+            else:
+                await asyncio.sleep(0)  # Cede o loop para as leituras
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Mensagens, bytes enviados e descartes por classe, mais filas pendentes"""
+        result = {traffic_class: dict(stats) for traffic_class, stats in self.stats.items()}
+        for flow in self.flows.values():
+            result[flow.traffic_class]["queued_bytes"] = (
+                result[flow.traffic_class].get("queued_bytes", 0) + flow.queued_bytes
+            )
+        return result
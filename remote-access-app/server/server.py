@@ -6,8 +6,11 @@ Responsável por autenticação, roteamento de mensagens e gerenciamento de sess
 import asyncio
 import logging
 import json
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Set
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+import secrets
 import socket
 import sys
 from pathlib import Path
@@ -16,12 +19,24 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.settings import (
-    SERVER_HOST, SERVER_PORT, SERVER_TIMEOUT, USERS_DB_FILE, SESSIONS_DB_FILE,
+    SERVER_HOST, SERVER_PORT, SERVER_TIMEOUT, USERS_DB_FILE, LEGACY_USERS_FILE, SESSIONS_DB_FILE,
     MAX_CONNECTIONS, SESSION_TIMEOUT, MAX_LOGIN_ATTEMPTS, LOCKOUT_DURATION,
-    LOG_FILE, LOG_LEVEL
+    LOG_FILE, LOG_LEVEL, CLIENT_ROLES, CURSOR_SHAPE_CACHE_SIZE,
+    RESUME_GRACE_PERIOD, RESUME_REPLAY_MAX_BYTES, IDLE_SWEEP_INTERVAL,
+    SCREEN_CAPTURE_FPS, LOAD_SAMPLE_INTERVAL, DEGRADED_FPS, UDP_PORT, PEER_BROKERS, PEER_SECRET,
+    PROFILE_DEFAULT_SECONDS, FILE_WINDOW, FILE_CHUNK_SIZE
 )
 from shared.protocol import ProtocolHandler, Message
 from shared.encryption import CryptoManager
+from shared.stream_compression import StreamCompressor, negotiate_method
+from shared.tracing import now_us
+from shared.datagram import DatagramEndpoint, open_endpoint
+from shared.profiling import Profiler
+from shared.file_transfer import FILE_MESSAGE_TYPES
+from server.scheduler import FairScheduler
+from server.admission import AdmissionController, LOAD_OVERLOADED
+from server.user_store import UserStore
+from server.peering import PeerLink, PeerConnector, peering_enabled, sign_hello, verify_hello
 
 # Configurar logging
 logging.basicConfig(
@@ -38,25 +53,21 @@ logger = logging.getLogger(__name__)
 class UserManager:
     """
     Gerencia usuários e credenciais
-    Para MVP, usa arquivo JSON
+    Registros no UserStore (SQLite, fora do loop); bloqueios ficam em memória
     """
 
     def __init__(self, db_file: Path):
-        self.db_file = db_file
-        self.users = self._load_users()
+        self.store = UserStore(db_file)
         self.failed_attempts = {}  # Rastreamento de tentativas falhadas
         self.lockout_times = {}  # Rastreamento de bloqueios
+        self._ensure_users()
 
-    def _load_users(self) -> Dict:
-        """Carrega usuários do arquivo"""
-        try:
-            if self.db_file.exists():
-                with open(self.db_file, "r") as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"Erro ao carregar usuários: {e}")
-
-        return self._get_default_users()
+    def _ensure_users(self):
+        """Banco vazio: migra o users.json antigo ou cria os usuários padrão"""
+        if self.store.count():
+            return
+        if not self.store.migrate_json(LEGACY_USERS_FILE):
+            self.store.import_users(self._get_default_users())
 
     def _get_default_users(self) -> Dict:
         """Retorna usuários padrão para teste"""
@@ -65,7 +76,7 @@ class UserManager:
             "admin": {
                 "password": CryptoManager.hash_password("admin123"),
                 "created_at": datetime.now().isoformat(),
-                "permissions": ["control", "view"]
+                "permissions": ["control", "view", "admin"]
             },
             "viewer": {
                 "password": CryptoManager.hash_password("viewer123"),
@@ -74,16 +85,7 @@ class UserManager:
             }
         }
 
-    def _save_users(self):
-        """Salva usuários no arquivo"""
-        try:
-            self.db_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.db_file, "w") as f:
-                json.dump(self.users, f, indent=2)
-        except Exception as e:
-            logger.error(f"Erro ao salvar usuários: {e}")
-
-    def authenticate(self, username: str, password_hash: str) -> Optional[str]:
+    async def authenticate(self, username: str, password_hash: str) -> Optional[str]:
         """
         Autentica um usuário
 
@@ -106,12 +108,12 @@ class UserManager:
                 self.failed_attempts[username] = 0
 
         # Verifica existência
-        if username not in self.users:
+        user = await self.store.get_user(username)
+        if user is None:
             logger.warning(f"Tentativa de login com usuário inexistente: {username}")
             return "Usuário ou senha inválidos"
 
         # Verifica senha
-        user = self.users[username]
         if user["password"] != password_hash:
             self.failed_attempts[username] = self.failed_attempts.get(username, 0) + 1
 
@@ -125,24 +127,27 @@ class UserManager:
             logger.warning(f"Falha de autenticação para {username}")
             return "Usuário ou senha inválidos"
 
-        # Sucesso
+        # Sucesso: só usuários autenticados entram no cache
         self.failed_attempts[username] = 0
+        self.store.remember(username, user)
         logger.info(f"Usuário {username} autenticado com sucesso")
         return None
 
-    def add_user(self, username: str, password: str, permissions: list = None):
-        """Adiciona novo usuário"""
-        if username in self.users:
-            return False
+    async def get_permissions(self, username: str) -> List[str]:
+        """Permissões do usuário (do cache logo após autenticar)"""
+        user = await self.store.get_user(username)
+        return user["permissions"] if user else []
 
-        self.users[username] = {
+    async def add_user(self, username: str, password: str, permissions: list = None):
+        """Adiciona novo usuário"""
+        created = await self.store.add_user(username, {
             "password": CryptoManager.hash_password(password),
             "created_at": datetime.now().isoformat(),
             "permissions": permissions or ["view"]
-        }
-        self._save_users()
-        logger.info(f"Novo usuário criado: {username}")
-        return True
+        })
+        if created:
+            logger.info(f"Novo usuário criado: {username}")
+        return created
 
 
 class SessionManager:
@@ -234,19 +239,153 @@ class SessionManager:
         return self.sessions.get(session_id)
 
 
+@dataclass
+class ClientConnection:
+    """Estado de uma conexão autenticada (ou em autenticação)"""
+    writer: Optional[asyncio.StreamWriter]  # None: conexão caiu, sessão reservada para retomada
+    address: tuple
+    compressor: Optional[StreamCompressor] = None
+    last_seen: float = 0.0  # loop.time() da última leitura (watchdog de inatividade)
+    timed_out: bool = False  # Fechada pelo watchdog
+    # Canal UDP de vídeo: token, endereço confirmado por hello e pronto (cliente recebeu o ack)
+    udp_token: Optional[bytes] = None
+    udp_addr: Optional[tuple] = None
+    udp_ready: bool = False
+    session_id: Optional[str] = None
+    resume_token: Optional[str] = None
+    username: Optional[str] = None
+    device_name: Optional[str] = None
+    role: str = "host"
+    permissions: Set[str] = field(default_factory=set)  # Carregadas na autenticação
+    last_activity: float = 0.0  # loop.time() da última mensagem além de ping (viewer mais ocioso)
+    # Host: monitores disponíveis e viewers conectados
+    monitors: List[dict] = field(default_factory=list)
+    requested_fps: Optional[int] = None  # Último FPS pedido por um viewer
+    viewers: Set[str] = field(default_factory=set)
+    effective_regions: Dict[int, dict] = field(default_factory=dict)  # Última ROI enviada por monitor
+    cursor_shapes: "OrderedDict[int, Message]" = field(default_factory=OrderedDict)  # LRU de formatos
+    # Frames recentes por monitor (seq, bytes, mensagem) para reenviar a viewers que retomam
+    recent_frames: Dict[int, Deque[Tuple[int, int, Message]]] = field(default_factory=dict)
+    recent_bytes: Dict[int, int] = field(default_factory=dict)
+    # Viewer: host assistido, monitores assinados e ROI por monitor
+    host_session: Optional[str] = None
+    subscribed_monitors: Set[int] = field(default_factory=set)
+    synced_monitors: Set[int] = field(default_factory=set)  # Já receberam keyframe
+    regions: Dict[int, dict] = field(default_factory=dict)
+    known_cursor_shapes: Set[int] = field(default_factory=set)
+    # Relay: conexão virtual que representa um host ou viewer de outro broker
+    # (session_id = relay_id; envia pelo link com o vizinho)
+    peer: Optional[PeerLink] = None
+    peer_challenge: Optional[Tuple[str, str]] = None  # (broker_id, nonce) do hello em andamento
+
+    # Campos de transporte: os demais pertencem à sessão e passam para a nova conexão
+    TRANSPORT_FIELDS = (
+        "writer", "address", "compressor", "last_seen", "timed_out",
+        "udp_token", "udp_addr", "udp_ready"
+    )
+
+    def adopt(self, previous: "ClientConnection"):
+        """Assume o estado de sessão de uma conexão anterior (retomada)"""
+        for f in fields(self):
+            if f.name not in self.TRANSPORT_FIELDS:
+                setattr(self, f.name, getattr(previous, f.name))
+
+    def remember_frame(self, monitor: int, seq: int, msg: Message):
+        """Host: guarda um frame encaminhado (limitado a RESUME_REPLAY_MAX_BYTES por monitor)"""
+        if seq is None:
+            return
+        size = len(msg.data.get("image") or "") + sum(
+            len(tile.get("image") or "") for tile in msg.data.get("tiles") or []
+        )
+        frames = self.recent_frames.setdefault(monitor, deque())
+        frames.append((seq, size, msg))
+        self.recent_bytes[monitor] = self.recent_bytes.get(monitor, 0) + size
+        while len(frames) > 1 and self.recent_bytes[monitor] > RESUME_REPLAY_MAX_BYTES:
+            self.recent_bytes[monitor] -= frames.popleft()[1]
+
+    def frames_after(self, monitor: int, last_seq: int) -> Optional[List[Message]]:
+        """
+        Host: frames com seq > last_seq, se o histórico ainda cobre a sequência
+
+        Returns:
+            List[Message]: Frames a reenviar (vazia se não há nada novo)
+            None: Histórico não alcança last_seq (viewer precisa de keyframe)
+        """
+        frames = self.recent_frames.get(monitor)
+        if not frames or last_seq is None:
+            return None
+        if last_seq >= frames[-1][0]:
+            return []
+        if frames[0][0] > last_seq + 1:
+            return None
+        return [msg for seq, _, msg in frames if seq > last_seq]
+
+    def reset_viewer_state(self):
+        """Desvincula o viewer do host (estado de stream é específico do host)"""
+        self.host_session = None
+        self.subscribed_monitors = set()
+        self.synced_monitors = set()
+        self.regions = {}
+        self.known_cursor_shapes = set()
+
+
+@dataclass
+class FileRoute:
+    """Transferência de arquivo em andamento entre duas sessões"""
+    sender: str
+    receiver: str
+    size: int
+    acked: int = 0  # Último offset confirmado pelo receptor (limita a janela em trânsito)
+
+
 class RemoteAccessBroker:
     """
     Servidor intermediário principal
     """
 
-    def __init__(self, host: str, port: int):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        peers: List[Tuple[str, int]] = None,
+        broker_id: str = None,
+        peer_secret: str = None
+    ):
         self.host = host
         self.port = port
         self.user_manager = UserManager(USERS_DB_FILE)
         self.session_manager = SessionManager(SESSIONS_DB_FILE)
         self.crypto = CryptoManager("sua-chave-secreta-super-segura-32-chars!!")
-        self.active_clients: Set[asyncio.StreamWriter] = set()
-        self.client_sessions: Dict[str, Dict] = {}  # session_id -> client_info
+        # Conexões abertas (inclusive não autenticadas), varridas pelo watchdog de inatividade
+        self.active_clients: Dict[asyncio.StreamWriter, ClientConnection] = {}
+        self.client_sessions: Dict[str, ClientConnection] = {}  # session_id -> conexão
+        self.resume_tokens: Dict[str, str] = {}  # token de retomada -> session_id
+        self.expiry_tasks: Set[asyncio.Task] = set()  # Expiração de sessões reservadas
+        # Fila de saída única: limite de banda global/por sessão e prioridade por classe
+        self.scheduler = FairScheduler(
+            on_video_overflow=self._on_video_overflow,
+            datagram_sender=self._send_datagram
+        )
+        self.scheduler_task: Optional[asyncio.Task] = None
+        # Admissão: recusa conexões/logins sob carga e degrada as sessões existentes
+        self.admission = AdmissionController()
+        # Canal UDP de vídeo (aberto em start; None = só TCP)
+        self.udp: Optional[DatagramEndpoint] = None
+        self.udp_channels: Dict[bytes, ClientConnection] = {}  # token -> conexão
+        self.udp_tasks: Set[asyncio.Task] = set()  # Frames recebidos por UDP em processamento
+        # Federação: links com brokers vizinhos (relays de hosts entre brokers)
+        self.broker_id = broker_id or f"{socket.gethostname()}:{port}"
+        self.peers = list(PEER_BROKERS if peers is None else peers)
+        self.peer_secret = peer_secret or PEER_SECRET
+        # Links (de entrada e de saída) só com vizinhos configurados e segredo próprio
+        self.peering = peering_enabled(self.peers, self.peer_secret)
+        self.peer_links: Dict[str, PeerLink] = {}  # broker_id -> link mais recente
+        self.peer_tasks: List[asyncio.Task] = []
+        # Perfilamento sob demanda (PROFILE_SIGNAL ou mensagem "profile" de admin)
+        self.profiler = Profiler("broker")
+        # Transferências de arquivo: rota por transfer_id e pedidos de viewers aguardando o host
+        self.file_routes: Dict[str, FileRoute] = {}
+        self.file_requests: Dict[str, Tuple[str, str]] = {}  # request_id -> (viewer, host)
 
         logger.info(f"Broker inicializado: {host}:{port}")
 
@@ -259,87 +398,294 @@ class RemoteAccessBroker:
         client_addr = writer.get_extra_info("peername")
         logger.info(f"Novo cliente conectado: {client_addr}")
 
-        self.active_clients.add(writer)
-        session_id = None
+        retry_after = self.admission.admit_connection(len(self.active_clients))
+        if retry_after:
+            logger.warning(f"Conexão recusada por carga ({client_addr}); retry-after {retry_after}s")
+            await self._reject(writer, "Servidor sobrecarregado", retry_after)
+            return
+
+        loop = asyncio.get_running_loop()
+        conn = ClientConnection(writer=writer, address=client_addr, last_seen=loop.time())
+        self.active_clients[writer] = conn
+        closed_by_client = False
 
         try:
             buffer = b""
 
             while True:
-                # Lê dados
-                data = await asyncio.wait_for(
-                    reader.read(4096),
-                    timeout=SERVER_TIMEOUT
-                )
+                # Lê dados (timeout de inatividade fica com _idle_watchdog); leituras
+                # de FILE_CHUNK_SIZE: um pedaço de arquivo não é remontado de 4 em 4 KB
+                data = await reader.read(FILE_CHUNK_SIZE)
 
                 if not data:
+                    if conn.timed_out:
+                        logger.warning(f"Timeout para cliente: {client_addr}")
                     break
 
+                conn.last_seen = loop.time()
+
                 buffer += data
 
                 # Processa mensagens
                 while buffer:
-                    msg, buffer = ProtocolHandler.deserialize_message(buffer)
+                    msg, buffer = ProtocolHandler.deserialize_message(buffer, conn.compressor)
 
                     if msg is None:
                         break
 
+                    if msg.msg_type != "ping":
+                        conn.last_activity = conn.last_seen
+
+                    # Link de outro broker: mensagens dos relays
+                    if conn.peer is not None:
+                        await self._handle_peer_message(conn.peer, msg)
+                        continue
+
                     # Processa mensagem
-                    response = await self._process_message(msg, session_id)
+                    response = await self._process_message(msg, conn)
 
                     if response:
-                        # Atualiza session_id se foi autenticado
-                        if (
-                            msg.msg_type == "auth_req" and
-                            response.data.get("success")
-                        ):
-                            session_id = response.session_id
-
                         # Envia resposta
-                        response_data = ProtocolHandler.serialize_message(response)
-                        writer.write(response_data)
-                        await writer.drain()
+                        await self._send(conn, response)
+
+                        # Ativa compressão negociada (após enviar a resposta de auth)
+                        if msg.msg_type in ("auth_req", "resume") and response.data.get("compression"):
+                            conn.compressor = StreamCompressor(response.data["compression"])
+
+                        # Viewer retomado: reenvia o que perdeu (já com a compressão nova)
+                        if msg.msg_type == "resume" and response.data.get("success"):
+                            await self._replay_after_resume(conn, msg.data.get("last_seq") or {})
 
                     # Verifica desconexão
                     if msg.msg_type == "disconnect":
-                        if session_id:
-                            self.session_manager.end_session(session_id)
+                        closed_by_client = True
                         break
 
-        except asyncio.TimeoutError:
-            logger.warning(f"Timeout para cliente: {client_addr}")
         except Exception as e:
             logger.error(f"Erro ao processar cliente: {e}")
         finally:
-            self.active_clients.discard(writer)
-            if session_id:
-                self.session_manager.end_session(session_id)
+            self.active_clients.pop(writer, None)
+            self.scheduler.remove(conn)
+            self._release_udp(conn)
+            if conn.peer is not None:
+                await self._peer_link_down(conn.peer)
+            if conn.compressor:
+                logger.debug(f"Bytes por tipo ({client_addr}): {conn.compressor.get_stats()}")
+            # Sessão já retomada por outra conexão: nada a desfazer aqui
+            if conn.session_id and self.client_sessions.get(conn.session_id) is conn:
+                if closed_by_client:
+                    await self._end_connection(conn)
+                else:
+                    self._park(conn)
             writer.close()
             await writer.wait_closed()
             logger.info(f"Cliente desconectado: {client_addr}")
 
+    async def _send(self, conn: ClientConnection, msg: Message):
+        """
+        Envia uma mensagem pela fila de saída do broker
+
+        A resposta de autenticação vai direto para o socket: ela precisa
+        sair antes de qualquer mensagem comprimida (replay de retomada).
+        """
+        if conn.writer is None:
+            return  # Aguardando retomada: o viewer recupera frames pelo histórico do host
+        if msg.msg_type == "auth_res":
+            conn.writer.write(ProtocolHandler.serialize_message(msg, conn.compressor))
+            await conn.writer.drain()
+            return
+        if self.scheduler_task is None:
+            self.scheduler_task = asyncio.ensure_future(self.scheduler.run())
+        self.scheduler.enqueue(conn, msg, datagram=conn.udp_ready and msg.msg_type == "screen_cap")
+
+    def _send_datagram(self, conn: ClientConnection, payload: bytes) -> int:
+        """Envia um frame pelo canal UDP da conexão (chamado pelo escalonador)"""
+        if not self.udp or not conn.udp_ready:
+            return 0  # Canal fechado depois de enfileirar: o viewer vê a lacuna e pede keyframe
+        return self.udp.send_message(conn.udp_token, payload, conn.udp_addr)
+
+    def _on_udp_hello(self, token: bytes, addr: tuple, ack: bool):
+        """
+        Hello de um cliente: registra o endereço UDP do canal e confirma
+
+        O endereço é fixado pelo primeiro hello do token: quem vir o token
+        depois não consegue desviar o canal. Hellos repetidos do mesmo
+        endereço são confirmados de novo (o ack pode ter se perdido); se o
+        endereço do cliente mudar, ele volta ao TCP e pede um canal novo.
+        """
+        conn = self.udp_channels.get(token)
+        if ack or conn is None:
+            return
+        if conn.udp_addr is None:
+            conn.udp_addr = addr
+        elif conn.udp_addr != addr:
+            logger.debug(f"Hello UDP de {addr} ignorado: canal de {conn.address} já ligado a {conn.udp_addr}")
+            return
+        self.udp.send_hello(token, addr, ack=True)
+
+    def _udp_accepts(self, token: bytes, addr: tuple) -> bool:
+        """Datagrama de um canal aberto, vindo do endereço registrado no hello"""
+        conn = self.udp_channels.get(token)
+        return conn is not None and conn.udp_addr == addr
+
+    def _on_udp_message(self, token: bytes, payload: bytes, addr: tuple):
+        """Frame de um host pelo canal UDP: mesmo caminho do screen_cap via TCP"""
+        conn = self.udp_channels.get(token)
+        if conn is None or conn.udp_addr != addr:
+            return
+        try:
+            msg = Message.from_json(payload.decode())
+        except Exception as e:
+            logger.error(f"Datagrama inválido de {addr}: {e}")
+            return
+        if msg.msg_type != "screen_cap":
+            return  # Controle e input só pelo TCP
+
+        conn.last_seen = asyncio.get_running_loop().time()
+        task = asyncio.ensure_future(self._process_message(msg, conn))
+        self.udp_tasks.add(task)
+        task.add_done_callback(self.udp_tasks.discard)
+
+    def _release_udp(self, conn: ClientConnection):
+        """Fecha o canal UDP da conexão (volta ao TCP)"""
+        if conn.udp_token is None:
+            return
+        self.udp_channels.pop(conn.udp_token, None)
+        if self.udp:
+            self.udp.forget(conn.udp_token)
+        conn.udp_token = None
+        conn.udp_addr = None
+        conn.udp_ready = False
+
+    async def _reject(self, writer: asyncio.StreamWriter, message: str, retry_after: int):
+        """Recusa uma conexão antes de autenticar (auth_res com retry_after) e fecha"""
+        try:
+            writer.write(ProtocolHandler.serialize_message(
+                ProtocolHandler.create_auth_response(False, None, message, retry_after=retry_after)
+            ))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _on_video_overflow(self, conn: ClientConnection):
+        """
+        Fila de vídeo de um viewer estourou e foi descartada
+
+        Os deltas seguintes não teriam base: o viewer volta a exigir keyframe
+        e o host é avisado para gerar um.
+        """
+        logger.warning(f"Viewer {conn.address} atrasado: frames descartados, pedindo keyframe")
+        host = self.client_sessions.get(conn.host_session)
+        monitors = set(conn.synced_monitors)
+        conn.synced_monitors.clear()
+        if not host or host.writer is None:
+            return
+        for monitor in sorted(monitors):
+            self.scheduler.enqueue(host, ProtocolHandler.create_keyframe_request(host.session_id, monitor))
+
+    def _park(self, conn: ClientConnection):
+        """
+        Reserva a sessão de uma conexão que caiu por RESUME_GRACE_PERIOD
+
+        O roteamento (viewers, assinaturas, ROI) continua montado; se o
+        cliente não voltar com o token de retomada a tempo, a sessão é
+        encerrada como numa desconexão normal.
+        """
+        self.scheduler.remove(conn)
+        self._release_udp(conn)
+        conn.writer = None
+        conn.compressor = None
+        logger.info(f"Conexão de {conn.address} caiu; sessão reservada por {RESUME_GRACE_PERIOD}s")
+
+        async def expire():
+            await asyncio.sleep(RESUME_GRACE_PERIOD)
+            if self.client_sessions.get(conn.session_id) is conn and conn.writer is None:
+                logger.info(f"Sessão não retomada a tempo: {conn.session_id}")
+                await self._end_connection(conn)
+
+        task = asyncio.ensure_future(expire())
+        self.expiry_tasks.add(task)
+        task.add_done_callback(self.expiry_tasks.discard)
+
+    async def _end_connection(self, conn: ClientConnection):
+        """Encerra a sessão de vez (desconexão normal ou retomada expirada)"""
+        self.resume_tokens.pop(conn.resume_token, None)
+        await self._unregister(conn)
+        self.session_manager.end_session(conn.session_id)
+
+    def _issue_resume_token(self, conn: ClientConnection) -> str:
+        """Gera um token de retomada novo (o anterior deixa de valer)"""
+        self.resume_tokens.pop(conn.resume_token, None)
+        conn.resume_token = CryptoManager.generate_session_token()
+        self.resume_tokens[conn.resume_token] = conn.session_id
+        return conn.resume_token
+
+    async def _forward(self, msg: Message, target_session: str, data: Dict[str, Any] = None):
+        """
+        Encaminha mensagem para outra sessão
+
+        O session_id é trocado pelo do destinatário para não expor o token
+        de quem enviou.
+
+        Args:
+            msg: Mensagem original (não é alterada)
+            target_session: Sessão de destino
+            data: Dados no lugar de msg.data (ex: carimbos de tempo por viewer)
+        """
+        target = self.client_sessions.get(target_session)
+        if not target:
+            return
+
+        forwarded = Message(
+            msg_type=msg.msg_type,
+            session_id=target_session,
+            data=msg.data if data is None else data,
+            timestamp=msg.timestamp,
+            payload=msg.payload
+        )
+        try:
+            await self._send(target, forwarded)
+        except Exception as e:
+            logger.error(f"Erro ao encaminhar {msg.msg_type} para {target.address}: {e}")
+
     async def _process_message(
         self,
         msg: Message,
-        session_id: Optional[str]
+        conn: ClientConnection
     ) -> Optional[Message]:
         """
         Processa mensagem do cliente
 
+        Com um perfil ativo, o tempo de cada mensagem (até a resposta,
+        incluindo esperas) é acumulado por tipo.
+
         Args:
             msg: Mensagem recebida
-            session_id: ID da sessão atual
+            conn: Conexão de origem
 
         Returns:
             Message: Resposta para enviar ao cliente
         """
+        return await self.profiler.timed(msg.msg_type, self._dispatch_message(msg, conn))
+
+    async def _dispatch_message(self, msg: Message, conn: ClientConnection) -> Optional[Message]:
+        """Trata a mensagem conforme o tipo (ver _process_message)"""
         msg_type = msg.msg_type
+        session_id = conn.session_id
 
         if msg_type == "auth_req":
-            return await self._handle_auth(msg)
+            return await self._handle_auth(msg, conn)
 
-        # Valida sessão para outros tipos
-        if not session_id or not self.session_manager.is_session_valid(session_id):
+        if msg_type == "resume":
+            return await self._handle_resume(msg, conn)
+
+        if msg_type == "peer_hello":
+            return self._accept_peer(msg, conn)
+
+        # Valida sessão para outros tipos (relays já vêm de um link autenticado)
+        if conn.peer is None and (not session_id or not self.session_manager.is_session_valid(session_id)):
             return ProtocolHandler.create_error(
                 session_id or "unknown",
                 401,
@@ -350,15 +696,118 @@ class RemoteAccessBroker:
         self.session_manager.update_activity(session_id)
 
         if msg_type == "ping":
-            return ProtocolHandler.create_pong(session_id)
+            # Ecoa o relógio do cliente com o do broker (estimativa de offset)
+            return ProtocolHandler.create_pong(session_id, msg.data.get("sent_at"), now_us())
+
+        elif msg_type == "udp_offer":
+            # Cliente quer o canal UDP de vídeo: token novo; o endereço vem no hello
+            if not self.udp:
+                return ProtocolHandler.create_udp_offer(session_id)
+            self._release_udp(conn)
+            conn.udp_token = secrets.token_bytes(8)
+            self.udp_channels[conn.udp_token] = conn
+            port = self.udp.transport.get_extra_info("sockname")[1]
+            return ProtocolHandler.create_udp_offer(session_id, port, conn.udp_token.hex())
+
+        elif msg_type == "udp_ready":
+            # Cliente recebeu o ack do hello: frames para ele passam a ir por UDP
+            conn.udp_ready = conn.udp_addr is not None
+            logger.info(f"Canal UDP {'ativo' if conn.udp_ready else 'sem hello'} para {conn.address}")
+            return None
+
+        elif msg_type == "udp_close":
+            logger.info(f"Canal UDP encerrado por {conn.address}: {msg.data.get('reason')}")
+            self._release_udp(conn)
+            return None
 
         elif msg_type == "screen_cap":
-            # Rotearia para outro cliente ou armazenaria
-            return ProtocolHandler.create_pong(session_id)
+            # Host -> viewers assinantes do monitor
+            monitor = msg.data.get("monitor", 1)
+            keyframe = msg.data.get("keyframe", True)
+            cache_reset = msg.data.get("cache_reset", True)
+            # Carimbos do broker só nas cópias encaminhadas: a mensagem guardada
+            # para retomada mantém os do host
+            stamps = msg.data.get("ts")
+            received_at = now_us() if stamps is not None else None
+            conn.remember_frame(monitor, msg.data.get("seq"), msg)
+            for viewer_session in list(conn.viewers):
+                viewer = self.client_sessions.get(viewer_session)
+                if not viewer or monitor not in viewer.subscribed_monitors:
+                    continue
+                # Deltas são inúteis para quem ainda não tem o keyframe base;
+                # só keyframes que esvaziam o cache de tiles sincronizam o viewer
+                if keyframe and cache_reset:
+                    viewer.synced_monitors.add(monitor)
+                elif monitor not in viewer.synced_monitors:
+                    continue
+                if viewer.writer is None:
+                    continue  # Viewer aguardando retomada: recebe pelo histórico
+                data = None
+                if stamps is not None:
+                    data = dict(msg.data, ts=dict(stamps, brx=received_at, bfw=now_us()))
+                await self._forward(msg, viewer_session, data)
+            return None
+
+        elif msg_type == "cursor_shape":
+            # Guardado por ID; enviado a cada viewer só quando ele precisar
+            shape_id = msg.data.get("shape_id")
+            conn.cursor_shapes[shape_id] = msg
+            conn.cursor_shapes.move_to_end(shape_id)
+            while len(conn.cursor_shapes) > CURSOR_SHAPE_CACHE_SIZE:
+                conn.cursor_shapes.popitem(last=False)
+            return None
+
+        elif msg_type == "cursor_pos":
+            monitor = msg.data.get("monitor", 1)
+            shape_id = msg.data.get("shape_id")
+            for viewer_session in list(conn.viewers):
+                viewer = self.client_sessions.get(viewer_session)
+                if not viewer or monitor not in viewer.subscribed_monitors:
+                    continue
+                if shape_id is not None and shape_id not in viewer.known_cursor_shapes:
+                    shape = conn.cursor_shapes.get(shape_id)
+                    if shape:
+                        await self._forward(shape, viewer_session)
+                        viewer.known_cursor_shapes.add(shape_id)
+                await self._forward(msg, viewer_session)
+            return None
+
+        elif msg_type == "keyframe_req":
+            # Viewer -> host: resincronização após perda de frames
+            monitor = msg.data.get("monitor", 1)
+            if not conn.host_session or monitor not in conn.subscribed_monitors:
+                return ProtocolHandler.create_error(session_id, 409, f"Monitor não assinado: {monitor}")
+            conn.synced_monitors.discard(monitor)
+            await self._forward(msg, conn.host_session)
+            return None
 
         elif msg_type == "mouse_evt" or msg_type == "key_evt":
-            # Rotearia para o cliente alvo
-            return ProtocolHandler.create_pong(session_id)
+            # Viewer -> host assistido (requer permissão de controle)
+            if not conn.host_session:
+                return ProtocolHandler.create_error(session_id, 409, "Nenhum host conectado")
+            if not self._has_permission(conn, "control"):
+                return ProtocolHandler.create_error(session_id, 403, "Sem permissão de controle")
+            await self._forward(msg, conn.host_session)
+            return None
+
+        elif msg_type == "attach":
+            return await self._handle_attach(msg, conn)
+
+        elif msg_type == "monitor_info":
+            conn.monitors = msg.data.get("monitors", [])
+            return None
+
+        elif msg_type == "monitor_sel":
+            return await self._handle_monitor_select(msg, conn)
+
+        elif msg_type == "region_sel":
+            return await self._handle_region_select(msg, conn)
+
+        elif msg_type == "profile":
+            return self._handle_profile(msg, conn)
+
+        elif msg_type in FILE_MESSAGE_TYPES:
+            return await self._handle_file_message(msg, conn)
 
         elif msg_type == "disconnect":
             return ProtocolHandler.create_disconnect(session_id, "OK")
@@ -370,18 +819,28 @@ class RemoteAccessBroker:
                 f"Tipo de mensagem desconhecido: {msg_type}"
             )
 
-    async def _handle_auth(self, msg: Message) -> Message:
+    async def _handle_auth(self, msg: Message, conn: ClientConnection) -> Message:
         """Processa autenticação"""
         data = msg.data
         username = data.get("username")
         password_hash = data.get("password")
         device_name = data.get("device_name")
+        role = data.get("role", "host")
 
         if not username or not password_hash:
             return ProtocolHandler.create_auth_response(False, None, "Credenciais inválidas")
 
+        if role not in CLIENT_ROLES:
+            return ProtocolHandler.create_auth_response(False, None, f"Papel inválido: {role}")
+
+        retry_after = self.admission.admit_login()
+        if retry_after:
+            return ProtocolHandler.create_auth_response(
+                False, None, "Servidor sobrecarregado", retry_after=retry_after
+            )
+
         # Autentica
-        error = self.user_manager.authenticate(username, password_hash)
+        error = await self.user_manager.authenticate(username, password_hash)
 
         if error:
             return ProtocolHandler.create_auth_response(False, None, error)
@@ -389,14 +848,676 @@ class RemoteAccessBroker:
         # Cria sessão
         session_id = self.session_manager.create_session(username, device_name)
 
+        conn.session_id = session_id
+        conn.username = username
+        conn.device_name = device_name
+        conn.role = role
+        conn.permissions = set(await self.user_manager.get_permissions(username))
+        self.client_sessions[session_id] = conn
+
+        return ProtocolHandler.create_auth_response(
+            True,
+            session_id,
+            "Autenticado com sucesso!",
+            compression=negotiate_method(data.get("compression")),
+            resume_token=self._issue_resume_token(conn)
+        )
+
+    async def _handle_resume(self, msg: Message, conn: ClientConnection) -> Message:
+        """
+        Retoma uma sessão pelo token emitido na autenticação (sem credenciais)
+
+        Vale enquanto a sessão está reservada após a queda, ou se a conexão
+        antiga ainda não percebeu a queda (ela é fechada). O token é de uso
+        único: a resposta traz um novo.
+        """
+        session_id = self.resume_tokens.pop(msg.data.get("resume_token"), None)
+        previous = self.client_sessions.get(session_id) if session_id else None
+
+        if (
+            not previous or conn.session_id or
+            not self.session_manager.is_session_valid(session_id)
+        ):
+            return ProtocolHandler.create_auth_response(False, None, "Sessão não pode ser retomada")
+
+        if previous.writer is not None:
+            previous.writer.close()  # Conexão meio-aberta: a nova assume
+
+        conn.adopt(previous)
+        self.client_sessions[session_id] = conn
+        self.session_manager.update_activity(session_id)
+
+        logger.info(f"Sessão retomada por {conn.address}: {conn.username} ({conn.role})")
         return ProtocolHandler.create_auth_response(
             True,
             session_id,
-            "Autenticado com sucesso!"
+            "Sessão retomada",
+            compression=negotiate_method(msg.data.get("compression")),
+            resume_token=self._issue_resume_token(conn),
+            # Host: o que o broker recebeu por último; o resto precisa de keyframe
+            last_seq={
+                str(monitor): frames[-1][0]
+                for monitor, frames in conn.recent_frames.items() if frames
+            } if conn.role == "host" else None
         )
 
+    async def _replay_after_resume(self, conn: ClientConnection, last_seq: Dict[str, int]):
+        """
+        Viewer retomado: reenvia os frames posteriores ao último seq aplicado
+
+        Monitores cujo histórico não alcança o seq do viewer voltam a exigir
+        keyframe (pedido ao host, com reset do cache de tiles).
+        """
+        host = self.client_sessions.get(conn.host_session)
+        if conn.role != "viewer" or not host:
+            return
+
+        for monitor in sorted(conn.subscribed_monitors):
+            frames = host.frames_after(monitor, last_seq.get(str(monitor)))
+            if frames is None:
+                conn.synced_monitors.discard(monitor)
+                await self._forward(
+                    ProtocolHandler.create_keyframe_request(host.session_id, monitor),
+                    host.session_id
+                )
+                continue
+
+            conn.synced_monitors.add(monitor)
+            for frame in frames:
+                await self._forward(frame, conn.session_id)
+            logger.debug(f"Retomada: {len(frames)} frame(s) reenviados do monitor {monitor}")
+
+    def _handle_profile(self, msg: Message, conn: ClientConnection) -> Message:
+        """
+        Liga, desliga ou consulta o perfilador do broker (permissão admin)
+
+        Os arquivos ficam em PROFILE_DIR na máquina do broker; a resposta
+        traz os caminhos e, ao encerrar, o resumo (atraso do loop, callbacks
+        lentos e tempo por tipo de mensagem).
+        """
+        session_id = conn.session_id
+        if not self._has_permission(conn, "admin"):
+            return ProtocolHandler.create_error(session_id, 403, "Sem permissão de administração")
+
+        action = msg.data.get("action", "status")
+        if action == "start":
+            started = self.profiler.start(
+                msg.data.get("seconds") or PROFILE_DEFAULT_SECONDS,
+                msg.data.get("mode") or "sample"
+            )
+            if started:
+                logger.info(f"Perfil iniciado por {conn.username} ({conn.address})")
+            return ProtocolHandler.create_profile_result(
+                session_id, started, self.profiler.status(),
+                message=None if started else "Perfil já ativo ou modo inválido"
+            )
+
+        if action == "stop":
+            stopped = bool(self.profiler.stop())
+            return ProtocolHandler.create_profile_result(
+                session_id, stopped, self.profiler.status(),
+                summary=self.profiler.summary() if stopped else None,
+                message=None if stopped else "Nenhum perfil ativo"
+            )
+
+        if action == "status":
+            return ProtocolHandler.create_profile_result(session_id, True, self.profiler.status())
+
+        return ProtocolHandler.create_error(session_id, 400, f"Ação de perfil desconhecida: {action}")
+
+    def _has_permission(self, conn: ClientConnection, permission: str) -> bool:
+        """Verifica permissão do usuário da conexão"""
+        return permission in conn.permissions
+
+    async def _handle_attach(self, msg: Message, conn: ClientConnection) -> Message:
+        """Conecta um viewer ao host do mesmo usuário com o nome de dispositivo pedido"""
+        session_id = conn.session_id
+
+        if conn.role != "viewer":
+            return ProtocolHandler.create_error(session_id, 400, "Apenas viewers podem assistir um host")
+        if not self._has_permission(conn, "view"):
+            return ProtocolHandler.create_error(session_id, 403, "Sem permissão de visualização")
+
+        device_name = msg.data.get("device_name")
+        host = self._find_host(conn.username, device_name) or await self._attach_remote_host(
+            conn.username, device_name
+        )
+        if not host:
+            return ProtocolHandler.create_error(session_id, 404, f"Host não encontrado: {device_name}")
+
+        await self._detach_viewer(conn)
+        conn.host_session = host.session_id
+        conn.subscribed_monitors = {1}  # Monitor principal até o viewer escolher
+        host.viewers.add(session_id)
+        await self._update_host_subscriptions(host)
+
+        logger.info(f"Viewer {conn.address} assistindo {device_name}")
+        return ProtocolHandler.create_notification(
+            session_id,
+            "attached",
+            device_name=device_name,
+            monitors=host.monitors
+        )
+
+    def _find_host(self, username: str, device_name: str, local_only: bool = False) -> Optional[ClientConnection]:
+        """
+        Diretório de sessões: host do usuário com o nome de dispositivo pedido
+
+        Inclui hosts de outros brokers com relay já montado (viewers locais
+        novos reaproveitam o relay); local_only os exclui (pedidos de
+        vizinhos não encadeiam relays).
+        """
+        return next(
+            (
+                c for c in self.client_sessions.values()
+                if c.role == "host" and c.device_name == device_name and c.username == username
+                and not (local_only and c.peer)
+            ),
+            None
+        )
+
+    async def _handle_monitor_select(self, msg: Message, conn: ClientConnection) -> Optional[Message]:
+        """Atualiza os monitores assinados por um viewer"""
+        host = self.client_sessions.get(conn.host_session)
+        if conn.role != "viewer" or not host:
+            return ProtocolHandler.create_error(conn.session_id, 409, "Nenhum host conectado")
+
+        conn.subscribed_monitors = set(msg.data.get("monitors") or [])
+        conn.synced_monitors &= conn.subscribed_monitors
+        conn.regions = {m: r for m, r in conn.regions.items() if m in conn.subscribed_monitors}
+        await self._update_host_subscriptions(host, msg.data.get("fps"))
+        return None
+
+    async def _update_host_subscriptions(self, host: ClientConnection, fps: int = None):
+        """
+        Envia ao host a união dos monitores assinados pelos seus viewers
+
+        Com o broker degradado o FPS é limitado a DEGRADED_FPS; ao voltar ao
+        normal o FPS pedido (ou o padrão) é restaurado.
+        """
+        if fps:
+            host.requested_fps = fps
+        if self.admission.degraded:
+            fps = min(host.requested_fps or SCREEN_CAPTURE_FPS, DEGRADED_FPS)
+
+        monitors = set()
+        for viewer_session in host.viewers:
+            viewer = self.client_sessions.get(viewer_session)
+            if viewer:
+                monitors |= viewer.subscribed_monitors
+
+        await self._forward(
+            ProtocolHandler.create_monitor_select(host.session_id, sorted(monitors), fps),
+            host.session_id
+        )
+
+        # Assinantes mudaram: a ROI efetiva de cada monitor pode ter mudado
+        for monitor in sorted(monitors):
+            await self._update_host_region(host, monitor)
+        for monitor in list(host.effective_regions):
+            if monitor not in monitors:
+                del host.effective_regions[monitor]
+
+    async def _handle_region_select(self, msg: Message, conn: ClientConnection) -> Optional[Message]:
+        """Registra a ROI pedida por um viewer para um monitor"""
+        host = self.client_sessions.get(conn.host_session)
+        if conn.role != "viewer" or not host:
+            return ProtocolHandler.create_error(conn.session_id, 409, "Nenhum host conectado")
+
+        monitor = msg.data.get("monitor", 1)
+        if monitor not in conn.subscribed_monitors:
+            return ProtocolHandler.create_error(conn.session_id, 400, f"Monitor não assinado: {monitor}")
+
+        if msg.data.get("region") or msg.data.get("window"):
+            conn.regions[monitor] = {
+                "region": msg.data.get("region"),
+                "window": msg.data.get("window")
+            }
+        else:
+            conn.regions.pop(monitor, None)
+
+        await self._update_host_region(host, monitor)
+        return None
+
+    async def _update_host_region(self, host: ClientConnection, monitor: int):
+        """
+        Calcula a ROI efetiva de um monitor e envia ao host se mudou
+
+        Um único viewer: a ROI dele. Vários viewers com retângulos: o
+        retângulo envolvente. Qualquer viewer sem ROI (ou janelas
+        diferentes): monitor inteiro.
+        """
+        specs = []
+        for viewer_session in host.viewers:
+            viewer = self.client_sessions.get(viewer_session)
+            if viewer and monitor in viewer.subscribed_monitors:
+                specs.append(viewer.regions.get(monitor))
+
+        effective = {"region": None, "window": None}
+        if specs and all(specs):
+            windows = {spec["window"] for spec in specs}
+            if len(specs) == 1 or (len(windows) == 1 and None not in windows):
+                effective = specs[0]
+            elif windows == {None}:
+                rects = [spec["region"] for spec in specs]
+                left = min(r["left"] for r in rects)
+                top = min(r["top"] for r in rects)
+                right = max(r["left"] + r["width"] for r in rects)
+                bottom = max(r["top"] + r["height"] for r in rects)
+                effective = {
+                    "region": {"left": left, "top": top, "width": right - left, "height": bottom - top},
+                    "window": None
+                }
+
+        if host.effective_regions.get(monitor, {"region": None, "window": None}) == effective:
+            return
+
+        host.effective_regions[monitor] = effective
+        await self._forward(
+            ProtocolHandler.create_region_select(
+                host.session_id, monitor, effective["region"], effective["window"]
+            ),
+            host.session_id
+        )
+
+    async def _detach_viewer(self, conn: ClientConnection):
+        """Remove o viewer do host que ele assiste (relay sem viewers é desfeito)"""
+        host = self.client_sessions.get(conn.host_session)
+        conn.reset_viewer_state()
+        if host:
+            host.viewers.discard(conn.session_id)
+            await self._update_host_subscriptions(host)
+            if host.peer and not host.viewers:
+                await self._close_relay(host)
+
+    async def _unregister(self, conn: ClientConnection):
+        """Remove a conexão do roteamento (viewers do host são notificados)"""
+        self.client_sessions.pop(conn.session_id, None)
+        await self._drop_file_routes(conn.session_id)
+
+        if conn.role == "viewer":
+            await self._detach_viewer(conn)
+            return
+
+        for viewer_session in list(conn.viewers):
+            viewer = self.client_sessions.get(viewer_session)
+            if viewer and viewer.peer:
+                await self._close_relay(viewer)  # O broker vizinho avisa os viewers dele
+            elif viewer:
+                viewer.reset_viewer_state()
+                await self._forward(
+                    ProtocolHandler.create_notification(
+                        viewer_session, "host_disconnected", device_name=conn.device_name
+                    ),
+                    viewer_session
+                )
+        conn.viewers.clear()
+
+    # ---- Transferência de arquivos ----
+
+    async def _handle_file_message(self, msg: Message, conn: ClientConnection) -> Optional[Message]:
+        """
+        Roteia a transferência de arquivos entre viewer e host
+
+        Viewer envia ao seu host (upload) ou pede um arquivo com file_req, e
+        o host responde com file_offer do mesmo request_id (download). A
+        oferta cria a rota; pedaços só seguem do emissor para o receptor, e
+        confirmações e aceite no sentido inverso. Pedaços além da janela
+        confirmada (FILE_WINDOW) são descartados: a fila do broker por
+        transferência fica limitada mesmo com um emissor que a ignore.
+        """
+        session_id = conn.session_id
+        msg_type = msg.msg_type
+        transfer_id = msg.data.get("transfer")
+
+        if msg_type == "file_req" or (msg_type == "file_offer" and conn.role == "viewer"):
+            host = self.client_sessions.get(conn.host_session) if conn.host_session else None
+            if not host:
+                return ProtocolHandler.create_error(session_id, 409, "Nenhum host conectado")
+            if not self._has_permission(conn, "control"):
+                return ProtocolHandler.create_error(session_id, 403, "Sem permissão de controle")
+            if host.peer is not None:
+                return ProtocolHandler.create_error(session_id, 501, "Transferência não suportada entre brokers")
+            if msg_type == "file_req":
+                self.file_requests[msg.data.get("request")] = (session_id, host.session_id)
+                await self._forward(msg, host.session_id)
+                return None
+            receiver = host.session_id
+
+        elif msg_type == "file_offer" or (
+            msg_type == "file_cancel" and conn.role == "host" and transfer_id not in self.file_routes
+        ):
+            # Host respondendo a um pedido (oferta ou recusa)
+            request = self.file_requests.pop(msg.data.get("request"), None)
+            if not request or request[1] != session_id:
+                return ProtocolHandler.create_error(session_id, 409, "Pedido de arquivo desconhecido")
+            if msg_type == "file_cancel":
+                await self._forward(msg, request[0])
+                return None
+            receiver = request[0]
+
+        else:
+            route = self.file_routes.get(transfer_id)
+            if not route or session_id not in (route.sender, route.receiver):
+                return ProtocolHandler.create_error(session_id, 404, f"Transferência desconhecida: {transfer_id}")
+
+            if msg_type == "file_cancel":
+                del self.file_routes[transfer_id]
+                await self._forward(msg, route.receiver if session_id == route.sender else route.sender)
+                return None
+
+            if msg_type == "file_chunk":
+                if session_id != route.sender:
+                    return None
+                end = msg.data.get("offset", 0) + len(msg.payload or b"")
+                if end > route.acked + FILE_WINDOW:
+                    logger.debug(f"Pedaço além da janela descartado: {transfer_id} ({end} bytes)")
+                    return None
+                await self._forward(msg, route.receiver)
+                return None
+
+            # file_accept / file_ack: receptor -> emissor
+            if session_id != route.receiver:
+                return None
+            route.acked = msg.data.get("offset") or 0
+            if (msg_type == "file_accept" and msg.data.get("error")) or route.acked >= route.size:
+                del self.file_routes[transfer_id]  # Recusada ou concluída
+            await self._forward(msg, route.sender)
+            return None
+
+        # Oferta (nova ou reenviada para retomar): cria ou confere a rota
+        route = self.file_routes.get(transfer_id)
+        if route and (route.sender, route.receiver) != (session_id, receiver):
+            return ProtocolHandler.create_error(session_id, 409, f"Transferência já em uso: {transfer_id}")
+        self.file_routes[transfer_id] = FileRoute(session_id, receiver, msg.data.get("size") or 0)
+        logger.info(
+            f"Transferência {transfer_id}: {msg.data.get('kind')} '{msg.data.get('name')}' "
+            f"({msg.data.get('size')} bytes) de {conn.address}"
+        )
+        await self._forward(msg, receiver)
+        return None
+
+    async def _drop_file_routes(self, session_id: str):
+        """Sessão encerrada: cancela as transferências dela e descarta seus pedidos"""
+        for transfer_id, route in list(self.file_routes.items()):
+            if session_id in (route.sender, route.receiver):
+                del self.file_routes[transfer_id]
+                other = route.receiver if session_id == route.sender else route.sender
+                await self._forward(
+                    ProtocolHandler.create_file_cancel(other, transfer_id, "Outro lado desconectou"),
+                    other
+                )
+        for request_id, (viewer, host) in list(self.file_requests.items()):
+            if session_id in (viewer, host):
+                del self.file_requests[request_id]
+
+    # ---- Federação de brokers ----
+
+    def _accept_peer(self, msg: Message, conn: ClientConnection) -> Optional[Message]:
+        """
+        Hello de um broker vizinho (desafio-resposta nos dois sentidos)
+
+        No primeiro hello, responde com a prova do segredo para o nonce do
+        vizinho e com um desafio próprio; no segundo, confere a prova do
+        vizinho para esse desafio e transforma a conexão em link. Um hello
+        capturado não serve de novo: o desafio muda a cada conexão.
+        """
+        broker_id = msg.data.get("broker_id")
+        if not self.peering or conn.session_id or not broker_id or broker_id == self.broker_id:
+            return self._refuse_peer(conn, broker_id)
+
+        if conn.peer_challenge is None:
+            nonce = msg.data.get("nonce")
+            if not nonce:
+                return self._refuse_peer(conn, broker_id)
+            conn.peer_challenge = (broker_id, secrets.token_hex(16))
+            return ProtocolHandler.create_peer_hello(
+                self.broker_id,
+                conn.peer_challenge[1],
+                sign_hello("accept", self.broker_id, nonce, self.peer_secret)
+            )
+
+        expected_id, challenge = conn.peer_challenge
+        conn.peer_challenge = None
+        if broker_id != expected_id or not verify_hello(msg, "connect", challenge, self.peer_secret):
+            return self._refuse_peer(conn, broker_id)
+
+        conn.role = "peer"
+        conn.peer = PeerLink(broker_id, conn.writer, conn.address, outbound=False)
+        self._register_link(conn.peer)
+        return None
+
+    def _refuse_peer(self, conn: ClientConnection, broker_id: Optional[str]) -> Message:
+        """Hello recusado (federação desligada, segredo errado ou hello fora de ordem)"""
+        conn.peer_challenge = None
+        reason = "federação desativada" if not self.peering else "prova inválida"
+        logger.warning(f"Link de broker recusado: {conn.address} ({broker_id}): {reason}")
+        return ProtocolHandler.create_error("unknown", 401, "Broker não autorizado")
+
+    def _register_link(self, link: PeerLink):
+        """Link autenticado (de entrada ou de saída) passa a atender consultas"""
+        self.peer_links[link.broker_id] = link
+        logger.info(f"Link com o broker {link.broker_id} ativo ({'saída' if link.outbound else 'entrada'})")
+
+    async def _peer_link_down(self, link: PeerLink):
+        """Link caiu: desfaz os relays que passavam por ele"""
+        if self.peer_links.get(link.broker_id) is link:
+            del self.peer_links[link.broker_id]
+        link.close()
+        for relay in list(link.relays.values()):
+            await self._close_relay(relay, notify=False)
+        logger.warning(f"Link com o broker {link.broker_id} encerrado")
+
+    async def _attach_remote_host(self, username: str, device_name: str) -> Optional[ClientConnection]:
+        """
+        Procura o host nos brokers vizinhos e monta um relay com o primeiro que o tiver
+
+        O host remoto vira uma conexão virtual local (role "host") com
+        session_id = relay_id: viewers locais se ligam a ela como a um host
+        local e o roteamento existente faz o resto.
+        """
+        for link in list(self.peer_links.values()):
+            relay_id = CryptoManager.generate_session_token()
+            reply = await link.request(ProtocolHandler.create_peer_attach(relay_id, username, device_name))
+            if not reply or not reply.data.get("success"):
+                continue
+
+            host = ClientConnection(
+                writer=link.writer,
+                address=link.address,
+                session_id=relay_id,
+                username=username,
+                device_name=device_name,
+                role="host",
+                monitors=reply.data.get("monitors") or [],
+                peer=link
+            )
+            link.relays[relay_id] = host
+            self.client_sessions[relay_id] = host
+            logger.info(f"Relay {relay_id[:8]}: {device_name} via broker {link.broker_id}")
+            return host
+        return None
+
+    async def _handle_peer_attach(self, link: PeerLink, msg: Message):
+        """
+        Pedido de relay de um vizinho para um host local
+
+        O broker vizinho vira um viewer virtual do host, com a união das
+        assinaturas dos viewers dele. O pedido traz o usuário autenticado lá;
+        as permissões do relay são as desse usuário no cadastro deste broker
+        (sem "view" aqui, o pedido é recusado).
+        """
+        relay_id = msg.data.get("relay_id")
+        username = msg.data.get("username")
+        host = self._find_host(username, msg.data.get("device_name"), local_only=True)
+        permissions = set(await self.user_manager.get_permissions(username)) & {"view", "control"} if host else set()
+        if not relay_id or not host or relay_id in self.client_sessions or "view" not in permissions:
+            logger.warning(f"Relay recusado para o broker {link.broker_id}: {username}/{msg.data.get('device_name')}")
+            link.send(ProtocolHandler.create_peer_attach_result(relay_id, False))
+            return
+
+        viewer = ClientConnection(
+            writer=link.writer,
+            address=link.address,
+            session_id=relay_id,
+            username=host.username,
+            role="viewer",
+            permissions=permissions,
+            host_session=host.session_id,
+            subscribed_monitors={1},
+            peer=link
+        )
+        link.relays[relay_id] = viewer
+        self.client_sessions[relay_id] = viewer
+        host.viewers.add(relay_id)
+        # As assinaturas chegam em seguida (monitor_sel do vizinho, como de um viewer local)
+        link.send(ProtocolHandler.create_peer_attach_result(relay_id, True, host.monitors))
+        logger.info(f"Relay {relay_id[:8]}: {host.device_name} para o broker {link.broker_id}")
+
+    async def _close_relay(self, relay: ClientConnection, notify: bool = True):
+        """
+        Desfaz um relay (host ou viewer virtual)
+
+        Args:
+            relay: Conexão virtual do relay
+            notify: Avisa o vizinho com peer_detach
+        """
+        link = relay.peer
+        if link.relays.pop(relay.session_id, None) is None:
+            return
+        self.scheduler.remove(relay)
+        if notify:
+            link.send(ProtocolHandler.create_peer_detach(relay.session_id))
+        if self.client_sessions.get(relay.session_id) is relay:
+            await self._unregister(relay)
+        logger.info(f"Relay {relay.session_id[:8]} encerrado ({relay.device_name or relay.role})")
+
+    async def _handle_peer_message(self, link: PeerLink, msg: Message):
+        """
+        Mensagem recebida por um link de broker
+
+        Controle do link (peer_*) é tratado aqui; o resto pertence a um
+        relay (session_id = relay_id) e segue o caminho normal de mensagens
+        de um host (frames, cursor) ou de um viewer (input, assinaturas).
+        Erros não voltam pelo link, para não ecoar entre os brokers.
+        """
+        msg_type = msg.msg_type
+        try:
+            if msg_type == "ping":
+                return
+            if msg_type == "peer_attach":
+                await self._handle_peer_attach(link, msg)
+                return
+            if msg_type == "peer_attach_res":
+                link.resolve(msg)
+                return
+            if msg_type == "peer_detach":
+                relay = link.relays.get(msg.data.get("relay_id"))
+                if relay:
+                    await self._close_relay(relay, notify=False)
+                return
+
+            relay = link.relays.get(msg.session_id)
+            if relay is None:
+                logger.debug(f"{msg_type} para relay desconhecido do broker {link.broker_id}")
+                return
+
+            if relay.role == "host":
+                if msg_type in ("screen_cap", "cursor_pos", "cursor_shape"):
+                    await self._process_message(msg, relay)
+                elif msg_type == "error":
+                    logger.warning(f"Relay {relay.session_id[:8]}: {msg.data.get('message')}")
+            elif msg_type in ("mouse_evt", "key_evt", "keyframe_req", "monitor_sel", "region_sel"):
+                response = await self._process_message(msg, relay)
+                if response and response.msg_type == "error":
+                    logger.warning(f"Relay {relay.session_id[:8]}: {response.data.get('message')}")
+        except Exception as e:
+            logger.error(f"Erro ao processar {msg_type} do broker {link.broker_id}: {e}")
+
+    async def _idle_watchdog(self):
+        """
+        Fecha conexões sem tráfego há mais de SERVER_TIMEOUT
+
+        Uma única varredura periódica para todo o broker, em vez de um
+        timer criado e cancelado a cada leitura. O fechamento faz a leitura
+        pendente retornar vazia e a conexão segue o caminho de queda normal
+        (sessão reservada para retomada).
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(IDLE_SWEEP_INTERVAL)
+            deadline = loop.time() - SERVER_TIMEOUT
+            for writer, conn in list(self.active_clients.items()):
+                if conn.last_seen < deadline and not conn.timed_out:
+                    conn.timed_out = True
+                    writer.close()
+
+    async def _load_monitor(self):
+        """
+        Mede atraso do loop e memória e degrada as sessões sob carga
+
+        Primeiro os hosts passam a DEGRADED_FPS; se a sobrecarga persistir,
+        o viewer há mais tempo sem interagir é derrubado a cada
+        LOAD_SHED_INTERVAL até a carga ceder.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOAD_SAMPLE_INTERVAL)
+            lag_ms = (loop.time() - start - LOAD_SAMPLE_INTERVAL) * 1000
+
+            was_degraded = self.admission.degraded
+            level = self.admission.update(lag_ms)
+
+            if self.admission.degraded != was_degraded:
+                await self._apply_fps_limits(restore=not self.admission.degraded)
+
+            if level == LOAD_OVERLOADED and self.admission.should_shed():
+                await self._shed_idlest_viewer()
+
+    async def _apply_fps_limits(self, restore: bool):
+        """Reenvia as assinaturas dos hosts com o FPS do nível de carga atual"""
+        for conn in list(self.client_sessions.values()):
+            if conn.role != "host" or not conn.viewers:
+                continue
+            # Sem limite ativo, o FPS pedido (ou o padrão) precisa ser explícito para desfazer a redução
+            fps = (conn.requested_fps or SCREEN_CAPTURE_FPS) if restore else None
+            await self._update_host_subscriptions(conn, fps)
+
+    async def _shed_idlest_viewer(self):
+        """Encerra a sessão do viewer conectado há mais tempo sem interagir"""
+        viewers = [
+            conn for conn in self.client_sessions.values()
+            if conn.role == "viewer" and conn.writer is not None and conn.peer is None
+        ]
+        if not viewers:
+            return
+
+        conn = min(viewers, key=lambda c: c.last_activity)
+        logger.warning(f"Sobrecarga: derrubando viewer ocioso {conn.address} ({conn.username})")
+        self.admission.shed_viewers += 1
+        # Direto no socket: o que ainda estiver na fila de saída é descartado com a conexão
+        writer = conn.writer
+        writer.write(ProtocolHandler.serialize_message(
+            ProtocolHandler.create_disconnect(conn.session_id, "Servidor sobrecarregado"),
+            conn.compressor
+        ))
+        await self._end_connection(conn)  # Sem sessão reservada: retomar traria a carga de volta
+        writer.close()
+
     async def start(self):
         """Inicia o servidor"""
+        watchdog = asyncio.create_task(self._idle_watchdog())
+        load_monitor = asyncio.create_task(self._load_monitor())
+        self.profiler.install_signal()
+        if UDP_PORT:
+            try:
+                self.udp = await open_endpoint(
+                    self.host, UDP_PORT, self._on_udp_message, self._on_udp_hello, accept=self._udp_accepts
+                )
+                logger.info(f"Canal UDP de vídeo em {self.host}:{UDP_PORT}")
+            except OSError as e:
+                logger.warning(f"UDP indisponível ({e}); vídeo só pelo TCP")
         server = await asyncio.start_server(
             self.handle_client,
             self.host,
@@ -404,15 +1525,48 @@ class RemoteAccessBroker:
             backlog=MAX_CONNECTIONS
         )
 
-        logger.info(f"Servidor iniciado em {self.host}:{self.port}")
+        logger.info(f"Servidor iniciado em {self.host}:{self.port} (broker {self.broker_id})")
+
+        if self.peers and not self.peering:
+            logger.error("Federação desativada: defina PEER_SECRET (o de exemplo não é aceito)")
+        for peer_host, peer_port in self.peers if self.peering else []:
+            connector = PeerConnector(
+                peer_host, peer_port, self.broker_id,
+                self._register_link, self._handle_peer_message, self._peer_link_down,
+                secret=self.peer_secret
+            )
+            self.peer_tasks.append(asyncio.create_task(connector.run()))
 
-        async with server:
-            await server.serve_forever()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watchdog.cancel()
+            load_monitor.cancel()
+            if self.udp:
+                self.udp.close()
+            if self.scheduler_task:
+                self.scheduler_task.cancel()
+            for task in self.peer_tasks:
+                task.cancel()
+            self.profiler.stop()
 
 
 async def main():
-    """Função principal"""
-    broker = RemoteAccessBroker(SERVER_HOST, SERVER_PORT)
+    """Função principal (vários brokers na mesma máquina: --port e --peer)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Broker de acesso remoto")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--peer", action="append", metavar="HOST:PORTA", help="Broker vizinho (repetível)")
+    parser.add_argument("--id", dest="broker_id", help="Identificador do broker (padrão: máquina:porta)")
+    args = parser.parse_args()
+
+    peers = None
+    if args.peer:
+        peers = [(peer.rsplit(":", 1)[0], int(peer.rsplit(":", 1)[1])) for peer in args.peer]
+    broker = RemoteAccessBroker(args.host, args.port, peers=peers, broker_id=args.broker_id)
 
     try:
         await broker.start()
@@ -0,0 +1,311 @@
+"""
+Banco de usuários do broker
+SQLite em modo WAL com índice pela chave primária (username); o broker
+acessa por uma thread dedicada para não bloquear o loop asyncio e mantém
+um cache LRU dos usuários autenticados recentemente, válido por
+USER_CACHE_TTL (alterações feitas por outro processo valem depois disso)
+
+Uso como ferramenta:
+    python -m server.user_store import usuarios.json
+    python -m server.user_store export usuarios.json
+    python -m server.user_store migrate
+"""
+
+import asyncio
+import json
+import sqlite3
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from config.settings import (
+    USERS_DB_FILE, LEGACY_USERS_FILE, USER_CACHE_SIZE, USER_CACHE_TTL, USER_IMPORT_BATCH
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    permissions TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def _to_row(username: str, user: dict) -> Tuple[str, str, str, str]:
+    """Registro no formato do users.json -> linha da tabela"""
+    return (
+        username,
+        user["password"],
+        user.get("created_at") or datetime.now().isoformat(),
+        json.dumps(user.get("permissions") or ["view"])
+    )
+
+
+def _from_row(row: Tuple[str, str, str, str]) -> dict:
+    """Linha da tabela -> registro no formato do users.json (sem o username)"""
+    return {
+        "password": row[1],
+        "created_at": row[2],
+        "permissions": json.loads(row[3])
+    }
+
+
+class UserStore:
+    """
+    Usuários em SQLite com cache LRU
+
+    Todas as operações no banco passam por um único executor de uma
+    thread (a conexão SQLite não é compartilhada entre threads). Os métodos
+    async são para o broker; os síncronos, para ferramentas e inicialização.
+
+    Só entram no cache usuários que acabaram de se autenticar (remember):
+    consultas de nomes inexistentes ou com senha errada não ocupam espaço
+    nem expulsam usuários ativos. Cada entrada vale por cache_ttl segundos.
+    """
+
+    def __init__(
+        self,
+        db_file: Path = USERS_DB_FILE,
+        cache_size: int = USER_CACHE_SIZE,
+        cache_ttl: float = USER_CACHE_TTL
+    ):
+        """
+        Abre (ou cria) o banco
+
+        Args:
+            db_file (Path): Arquivo SQLite
+            cache_size (int): Usuários mantidos no cache LRU
+            cache_ttl (float): Segundos até uma entrada do cache ser relida do banco
+        """
+        self.db_file = Path(db_file)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()  # username -> (registro, expira em)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-store")
+
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.db = self.executor.submit(self._open).result()
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # Seguro com WAL; commit sem fsync por transação
+        db.execute(SCHEMA)
+        db.commit()
+        return db
+
+    def _call(self, func, *args):
+        """Executa no thread do banco e espera (uso síncrono)"""
+        return self.executor.submit(func, *args).result()
+
+    async def _call_async(self, func, *args):
+        """Executa no thread do banco sem bloquear o loop"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # ---- Operações no thread do banco ----
+
+    def _get(self, username: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT username, password, created_at, permissions FROM users WHERE username = ?",
+            (username,)
+        ).fetchone()
+        return _from_row(row) if row else None
+
+    def _insert(self, username: str, user: dict) -> bool:
+        try:
+            with self.db:
+                self.db.execute("INSERT INTO users VALUES (?, ?, ?, ?)", _to_row(username, user))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def _insert_many(self, users: Iterable[Tuple[str, dict]], replace: bool) -> int:
+        statement = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        total = 0
+        batch = []
+        for username, user in users:
+            batch.append(_to_row(username, user))
+            if len(batch) >= USER_IMPORT_BATCH:
+                total += self._write_batch(statement, batch)
+                batch = []
+        if batch:
+            total += self._write_batch(statement, batch)
+        return total
+
+    def _write_batch(self, statement: str, batch: list) -> int:
+        with self.db:
+            cursor = self.db.executemany(f"{statement} INTO users VALUES (?, ?, ?, ?)", batch)
+        return cursor.rowcount
+
+    def _count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    # ---- Cache ----
+
+    def _cache_put(self, username: str, user: dict):
+        self.cache[username] = (user, time.monotonic() + self.cache_ttl)
+        self.cache.move_to_end(username)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    # ---- API ----
+
+    async def get_user(self, username: str) -> Optional[dict]:
+        """
+        Retorna o registro de um usuário (cache LRU, depois banco)
+
+        Uma leitura do banco não entra no cache; quem confere a senha chama
+        remember se ela estiver certa.
+
+        Args:
+            username: Nome do usuário
+
+        Returns:
+            dict: {"password", "created_at", "permissions"}, ou None
+        """
+        entry = self.cache.get(username)
+        if entry is not None:
+            user, expires_at = entry
+            if time.monotonic() < expires_at:
+                self.cache.move_to_end(username)
+                self.cache_hits += 1
+                return user
+            del self.cache[username]
+
+        self.cache_misses += 1
+        return await self._call_async(self._get, username)
+
+    def remember(self, username: str, user: dict):
+        """Guarda no cache um usuário que acabou de se autenticar"""
+        self._cache_put(username, user)
+
+    async def add_user(self, username: str, user: dict) -> bool:
+        """
+        Cria um usuário
+
+        Returns:
+            bool: False se o usuário já existe
+        """
+        created = await self._call_async(self._insert, username, user)
+        if created:
+            self.cache.pop(username, None)
+        return created
+
+    def count(self) -> int:
+        """Total de usuários"""
+        return self._call(self._count)
+
+    def import_users(self, users: Dict[str, dict], replace: bool = False) -> int:
+        """
+        Importa usuários em lote (transações de USER_IMPORT_BATCH linhas)
+
+        Args:
+            users: username -> registro no formato do users.json
+            replace: Sobrescreve usuários existentes (senão, mantém)
+
+        Returns:
+            int: Linhas gravadas
+        """
+        total = self._call(self._insert_many, list(users.items()), replace)
+        self.cache.clear()
+        logger.info(f"{total} usuário(s) importado(s) para {self.db_file}")
+        return total
+
+    def iter_users(self) -> Iterator[Tuple[str, dict]]:
+        """Percorre todos os usuários em ordem de nome (exportação)"""
+        rows = self._call(
+            lambda: self.db.execute(
+                "SELECT username, password, created_at, permissions FROM users ORDER BY username"
+            ).fetchall()
+        )
+        for row in rows:
+            yield row[0], _from_row(row)
+
+    def export_json(self, path: Path) -> int:
+        """
+        Exporta todos os usuários no formato do users.json
+
+        Returns:
+            int: Usuários exportados
+        """
+        users = dict(self.iter_users())
+        with open(path, "w") as f:
+            json.dump(users, f, indent=2)
+        logger.info(f"{len(users)} usuário(s) exportado(s) para {path}")
+        return len(users)
+
+    def migrate_json(self, json_file: Path = LEGACY_USERS_FILE) -> int:
+        """
+        Importa o users.json antigo e o renomeia para .migrated
+
+        Usuários já presentes no banco não são sobrescritos, então rodar de
+        novo é seguro.
+
+        Returns:
+            int: Usuários importados (0 se não há arquivo antigo)
+        """
+        json_file = Path(json_file)
+        if not json_file.exists():
+            return 0
+
+        with open(json_file, "r") as f:
+            users = json.load(f)
+
+        total = self.import_users(users)
+        json_file.rename(json_file.with_name(json_file.name + ".migrated"))
+        logger.info(f"Migração de {json_file} concluída ({total} novo(s))")
+        return total
+
+    def get_stats(self) -> Dict[str, int]:
+        """Tamanho e acertos do cache"""
+        return {
+            "cached": len(self.cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses
+        }
+
+    def close(self):
+        """Fecha o banco e o executor"""
+        self._call(self.db.close)
+        self.executor.shutdown()
+
+
+def main():
+    """Ferramenta de importação/exportação em lote"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banco de usuários do broker")
+    parser.add_argument("command", choices=["import", "export", "migrate"])
+    parser.add_argument("file", nargs="?", type=Path, help="Arquivo JSON (formato do users.json)")
+    parser.add_argument("--db", type=Path, default=USERS_DB_FILE, help="Arquivo SQLite")
+    parser.add_argument("--replace", action="store_true", help="Import: sobrescreve usuários existentes")
+    args = parser.parse_args()
+
+    if args.command in ("import", "export") and not args.file:
+        parser.error(f"{args.command} exige o arquivo JSON")
+
+    store = UserStore(args.db)
+    try:
+        if args.command == "import":
+            with open(args.file, "r") as f:
+                print(f"{store.import_users(json.load(f), replace=args.replace)} usuário(s) importado(s)")
+        elif args.command == "export":
+            print(f"{store.export_json(args.file)} usuário(s) exportado(s)")
+        else:
+            print(f"{store.migrate_json(args.file or LEGACY_USERS_FILE)} usuário(s) migrado(s)")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,259 @@
+"""
+Canal do cursor
+Rastreia posição e formato do ponteiro separadamente da captura de tela,
+para que mover o mouse não suje o framebuffer nem force recodificação
+"""
+
+import io
+import sys
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config.settings import CURSOR_FPS
+
+logger = logging.getLogger(__name__)
+
+
+class CursorTracker:
+    """
+    Lê a posição e o formato atual do cursor (Windows via user32/gdi32)
+
+    O formato é identificado pelo handle do cursor (shape_id); a imagem
+    só precisa ser extraída uma vez por formato. Fora do Windows o cursor
+    não é rastreado e poll() retorna None.
+    """
+
+    def __init__(self, fps: int = CURSOR_FPS):
+        """
+        Inicializa o rastreador
+
+        Args:
+            fps (int): Frequência máxima de atualizações de posição
+        """
+        self.interval = 1.0 / fps
+        self.last_poll = 0.0
+        self.last_state: Optional[Tuple[int, int, bool, Optional[int]]] = None
+        self._win32 = _Win32Cursor() if sys.platform == "win32" else None
+
+    def time_until_poll(self) -> Optional[float]:
+        """Segundos até a próxima leitura permitida (None: plataforma sem suporte)"""
+        if self._win32 is None:
+            return None
+        return max(0.0, self.last_poll + self.interval - time.monotonic())
+
+    def poll(self) -> Optional[Dict]:
+        """
+        Lê o cursor se o intervalo mínimo passou e algo mudou
+
+        Returns:
+            Dict: {"x", "y", "visible", "shape_id"} em coordenadas da área virtual
+            None: Sem mudança, fora do intervalo ou plataforma sem suporte
+        """
+        if self._win32 is None:
+            return None
+
+        now = time.monotonic()
+        if now - self.last_poll < self.interval:
+            return None
+        self.last_poll = now
+
+        try:
+            state = self._win32.cursor_state()
+        except Exception as e:
+            logger.error(f"Erro ao ler cursor: {e}")
+            return None
+
+        if state is None or state == self.last_state:
+            return None
+
+        self.last_state = state
+        x, y, visible, shape_id = state
+        return {"x": x, "y": y, "visible": visible, "shape_id": shape_id}
+
+    def get_shape(self, shape_id: int) -> Optional[Dict]:
+        """
+        Extrai a imagem de um formato de cursor
+
+        Args:
+            shape_id: Handle do cursor retornado em poll()
+
+        Returns:
+            Dict: {"image" (PNG RGBA), "width", "height", "hotspot_x", "hotspot_y"}
+        """
+        if self._win32 is None or shape_id is None:
+            return None
+
+        try:
+            return self._win32.render_shape(shape_id)
+        except Exception as e:
+            logger.error(f"Erro ao extrair formato do cursor: {e}")
+            return None
+
+
+class _Win32Cursor:
+    """Acesso ao cursor via ctypes (apenas Windows)"""
+
+    CURSOR_SHOWING = 0x00000001
+    DI_NORMAL = 0x0003
+    SM_CXCURSOR = 13
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.windll.user32
+        self.gdi32 = ctypes.windll.gdi32
+
+        class CURSORINFO(ctypes.Structure):
+            _fields_ = [
+                ("cbSize", wintypes.DWORD),
+                ("flags", wintypes.DWORD),
+                ("hCursor", ctypes.c_void_p),
+                ("ptScreenPos", wintypes.POINT)
+            ]
+
+        class ICONINFO(ctypes.Structure):
+            _fields_ = [
+                ("fIcon", wintypes.BOOL),
+                ("xHotspot", wintypes.DWORD),
+                ("yHotspot", wintypes.DWORD),
+                ("hbmMask", ctypes.c_void_p),
+                ("hbmColor", ctypes.c_void_p)
+            ]
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ("biSize", wintypes.DWORD),
+                ("biWidth", wintypes.LONG),
+                ("biHeight", wintypes.LONG),
+                ("biPlanes", wintypes.WORD),
+                ("biBitCount", wintypes.WORD),
+                ("biCompression", wintypes.DWORD),
+                ("biSizeImage", wintypes.DWORD),
+                ("biXPelsPerMeter", wintypes.LONG),
+                ("biYPelsPerMeter", wintypes.LONG),
+                ("biClrUsed", wintypes.DWORD),
+                ("biClrImportant", wintypes.DWORD)
+            ]
+
+        self.CURSORINFO = CURSORINFO
+        self.ICONINFO = ICONINFO
+        self.BITMAPINFOHEADER = BITMAPINFOHEADER
+
+        # Handles são ponteiros: sem restype explícito o ctypes trunca em 64 bits
+        handle = ctypes.c_void_p
+        self.user32.GetDC.restype = handle
+        self.user32.GetDC.argtypes = [handle]
+        self.user32.ReleaseDC.argtypes = [handle, handle]
+        self.user32.GetIconInfo.argtypes = [handle, ctypes.POINTER(ICONINFO)]
+        self.user32.DrawIconEx.argtypes = [
+            handle, ctypes.c_int, ctypes.c_int, handle, ctypes.c_int,
+            ctypes.c_int, wintypes.UINT, handle, wintypes.UINT
+        ]
+        self.user32.FillRect.argtypes = [handle, ctypes.POINTER(wintypes.RECT), handle]
+        self.gdi32.CreateCompatibleDC.restype = handle
+        self.gdi32.CreateCompatibleDC.argtypes = [handle]
+        self.gdi32.CreateDIBSection.restype = handle
+        self.gdi32.CreateDIBSection.argtypes = [
+            handle, ctypes.POINTER(BITMAPINFOHEADER), wintypes.UINT,
+            ctypes.POINTER(ctypes.c_void_p), handle, wintypes.DWORD
+        ]
+        self.gdi32.SelectObject.restype = handle
+        self.gdi32.SelectObject.argtypes = [handle, handle]
+        self.gdi32.CreateSolidBrush.restype = handle
+        self.gdi32.DeleteObject.argtypes = [handle]
+        self.gdi32.DeleteDC.argtypes = [handle]
+
+    def cursor_state(self) -> Optional[Tuple[int, int, bool, Optional[int]]]:
+        """Retorna (x, y, visível, handle do formato)"""
+        info = self.CURSORINFO()
+        info.cbSize = self.ctypes.sizeof(info)
+        if not self.user32.GetCursorInfo(self.ctypes.byref(info)):
+            return None
+
+        visible = bool(info.flags & self.CURSOR_SHOWING)
+        shape_id = info.hCursor if visible else None
+        return info.ptScreenPos.x, info.ptScreenPos.y, visible, shape_id
+
+    def render_shape(self, shape_id: int) -> Optional[Dict]:
+        """
+        Desenha o cursor sobre fundo preto e branco e deriva o alfa
+
+        Funciona para cursores coloridos e monocromáticos (máscara AND/XOR).
+        """
+        ctypes = self.ctypes
+
+        icon_info = self.ICONINFO()
+        if not self.user32.GetIconInfo(shape_id, ctypes.byref(icon_info)):
+            return None
+        for bitmap in (icon_info.hbmMask, icon_info.hbmColor):
+            if bitmap:
+                self.gdi32.DeleteObject(bitmap)
+
+        size = self.user32.GetSystemMetrics(self.SM_CXCURSOR) or 32
+
+        header = self.BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(header)
+        header.biWidth = size
+        header.biHeight = -size  # Top-down
+        header.biPlanes = 1
+        header.biBitCount = 32
+
+        screen_dc = self.user32.GetDC(None)
+        mem_dc = self.gdi32.CreateCompatibleDC(screen_dc)
+        bits = ctypes.c_void_p()
+        bitmap = self.gdi32.CreateDIBSection(mem_dc, ctypes.byref(header), 0, ctypes.byref(bits), None, 0)
+        old = self.gdi32.SelectObject(mem_dc, bitmap)
+
+        layers = []
+        try:
+            rect = self.wintypes.RECT(0, 0, size, size)
+            for background in (0x000000, 0xFFFFFF):
+                brush = self.gdi32.CreateSolidBrush(background)
+                self.user32.FillRect(mem_dc, ctypes.byref(rect), brush)
+                self.gdi32.DeleteObject(brush)
+                self.user32.DrawIconEx(mem_dc, 0, 0, shape_id, size, size, 0, None, self.DI_NORMAL)
+                raw = (ctypes.c_ubyte * (size * size * 4)).from_address(bits.value)
+                layers.append(np.frombuffer(bytes(raw), dtype=np.uint8).reshape(size, size, 4))
+        finally:
+            self.gdi32.SelectObject(mem_dc, old)
+            self.gdi32.DeleteObject(bitmap)
+            self.gdi32.DeleteDC(mem_dc)
+            self.user32.ReleaseDC(None, screen_dc)
+
+        # Sobre preto: cor * alfa; sobre branco: cor * alfa + (1 - alfa)
+        black = layers[0][..., 2::-1].astype(np.int16)
+        white = layers[1][..., 2::-1].astype(np.int16)
+        alpha = np.clip(255 - (white - black).max(axis=2), 0, 255).astype(np.uint8)
+        safe_alpha = np.maximum(alpha, 1)[..., None].astype(np.uint16)
+        color = np.clip(black.astype(np.uint16) * 255 // safe_alpha, 0, 255).astype(np.uint8)
+
+        rgba = np.dstack([color, alpha])
+        buffer = io.BytesIO()
+        Image.fromarray(rgba, "RGBA").save(buffer, format="PNG")
+
+        return {
+            "image": buffer.getvalue(),
+            "width": size,
+            "height": size,
+            "hotspot_x": icon_info.xHotspot,
+            "hotspot_y": icon_info.yHotspot
+        }
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    tracker = CursorTracker()
+    for _ in range(50):
+        state = tracker.poll()
+        if state:
+            print(f"Cursor: {state}")
+        time.sleep(0.1)
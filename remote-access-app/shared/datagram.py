@@ -0,0 +1,405 @@
+"""
+Canal UDP para vídeo
+Mensagens (JSON de screen_cap) são fragmentadas em datagramas de até
+UDP_MTU bytes com número de mensagem e índice do fragmento; a cada
+UDP_FEC_GROUP fragmentos vai um de paridade XOR, que recupera um fragmento
+perdido do grupo. Uma perda não recuperada descarta só aquela mensagem,
+sem travar as seguintes (o viewer percebe a lacuna de seq e pede keyframe)
+"""
+
+import asyncio
+import random
+import socket
+import struct
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import (
+    UDP_MTU, UDP_FEC_GROUP, UDP_REASSEMBLY_TIMEOUT, UDP_SIMULATED_LOSS,
+    UDP_SOCKET_BUFFER
+)
+
+logger = logging.getLogger(__name__)
+
+# Header: magic, tipo, token do canal, id da mensagem, índice (fragmento ou
+# grupo de paridade), total de fragmentos de dados, tamanho total da mensagem
+HEADER = struct.Struct("!2sB8sIHHI")
+MAGIC = b"RA"
+
+KIND_HELLO = 1  # Cliente -> broker: associa o endereço UDP ao token
+KIND_HELLO_ACK = 2  # Broker -> cliente: o caminho de volta funciona
+KIND_DATA = 3
+KIND_PARITY = 4
+
+# Mensagens incompletas guardadas por remetente
+MAX_PENDING_MESSAGES = 64
+
+
+def _as_int(chunk: bytes, size: int) -> int:
+    """Fragmento como inteiro (completado com zeros) para XOR de uma vez só"""
+    return int.from_bytes(chunk.ljust(size, b"\0"), "big")
+
+
+def fragment(
+    token: bytes,
+    msg_id: int,
+    payload: bytes,
+    mtu: int = UDP_MTU,
+    fec_group: int = UDP_FEC_GROUP
+) -> List[bytes]:
+    """
+    Divide uma mensagem em datagramas (dados + paridade)
+
+    Args:
+        token: Token do canal (8 bytes)
+        msg_id: Número da mensagem
+        payload: Mensagem completa
+        mtu: Tamanho máximo de cada datagrama
+        fec_group: Fragmentos por paridade (0 = sem FEC)
+
+    Returns:
+        List[bytes]: Datagramas na ordem de envio
+    """
+    size = mtu - HEADER.size
+    chunks = [payload[i:i + size] for i in range(0, len(payload), size)] or [b""]
+    count = len(chunks)
+    total = len(payload)
+
+    datagrams = []
+    parity = 0
+    for index, chunk in enumerate(chunks):
+        datagrams.append(HEADER.pack(MAGIC, KIND_DATA, token, msg_id, index, count, total) + chunk)
+        if not fec_group or count == 1:
+            continue
+
+        parity ^= _as_int(chunk, size)
+        if (index + 1) % fec_group == 0 or index == count - 1:
+            group = index // fec_group
+            datagrams.append(
+                HEADER.pack(MAGIC, KIND_PARITY, token, msg_id, group, count, total) + parity.to_bytes(size, "big")
+            )
+            parity = 0
+    return datagrams
+
+
+class _Pending:
+    """Mensagem em remontagem"""
+
+    __slots__ = ("count", "total", "chunks", "parity", "created")
+
+    def __init__(self, count: int, total: int):
+        self.count = count
+        self.total = total
+        self.chunks: Dict[int, bytes] = {}
+        self.parity: Dict[int, bytes] = {}
+        self.created = time.monotonic()
+
+
+class Reassembler:
+    """
+    Remonta mensagens de um remetente
+
+    Entrega cada mensagem uma vez, em ordem crescente de id: mensagens
+    que completam depois de uma mais nova já entregue são descartadas
+    (para o stream de vídeo, chegar fora de ordem equivale a perder).
+
+    Perdas contam pela lacuna de ids entre entregas, então uma mensagem da
+    qual nenhum datagrama chegou também conta (o caso comum de deltas
+    pequenos, de um datagrama só).
+    """
+
+    def __init__(
+        self,
+        mtu: int = UDP_MTU,
+        fec_group: int = UDP_FEC_GROUP,
+        timeout: float = UDP_REASSEMBLY_TIMEOUT
+    ):
+        self.fragment_size = mtu - HEADER.size
+        self.fec_group = fec_group
+        self.timeout = timeout
+        self.pending: Dict[int, _Pending] = {}
+        self.last_delivered = -1
+        self.counted_lost: Set[int] = set()  # Ids após last_delivered já contados como perdidos
+        self.stats = {"delivered": 0, "lost": 0, "recovered": 0}
+
+    def _recover(self, pending: _Pending, group: int):
+        """Reconstrói o único fragmento ausente de um grupo com a paridade"""
+        parity = pending.parity.get(group)
+        if parity is None:
+            return
+        first = group * self.fec_group
+        members = range(first, min(first + self.fec_group, pending.count))
+        missing = [i for i in members if i not in pending.chunks]
+        if len(missing) != 1:
+            return
+
+        size = self.fragment_size
+        value = int.from_bytes(parity, "big")
+        for i in members:
+            if i != missing[0]:
+                value ^= _as_int(pending.chunks[i], size)
+
+        index = missing[0]
+        length = size
+        if index == pending.count - 1:
+            length = pending.total - index * size
+        pending.chunks[index] = value.to_bytes(size, "big")[:length]
+        self.stats["recovered"] += 1
+
+    def _drop(self, msg_id: int):
+        """Descarta uma mensagem incompleta (conta como perdida uma vez só)"""
+        del self.pending[msg_id]
+        self.counted_lost.add(msg_id)
+        self.stats["lost"] += 1
+
+    def _expire(self, now: float):
+        for msg_id in [m for m, p in self.pending.items() if now - p.created > self.timeout]:
+            self._drop(msg_id)
+        while len(self.pending) > MAX_PENDING_MESSAGES:
+            self._drop(min(self.pending))
+
+    def _valid(self, kind: int, index: int, count: int, total: int, body: bytes) -> bool:
+        """Cabeçalho coerente (fragmento dentro da mensagem, tamanhos possíveis)"""
+        size = self.fragment_size
+        if count == 0 or len(body) > size or total > count * size:
+            return False
+        if kind == KIND_DATA:
+            return index < count
+        return bool(self.fec_group) and index < -(-count // self.fec_group) and len(body) == size
+
+    def add(self, kind: int, msg_id: int, index: int, count: int, total: int, body: bytes) -> Optional[bytes]:
+        """
+        Registra um datagrama de dados ou paridade
+
+        Returns:
+            bytes: Mensagem completa, se este datagrama a completou
+        """
+        if msg_id <= self.last_delivered or msg_id in self.counted_lost:
+            return None
+        # Datagrama malformado ou forjado: descartado antes de guardar
+        if kind not in (KIND_DATA, KIND_PARITY) or not self._valid(kind, index, count, total, body):
+            return None
+
+        now = time.monotonic()
+        self._expire(now)
+
+        pending = self.pending.get(msg_id)
+        if pending is None:
+            pending = self.pending[msg_id] = _Pending(count, total)
+        elif pending.count != count or pending.total != total:
+            return None
+
+        if kind == KIND_DATA:
+            pending.chunks[index] = body
+            group = index // self.fec_group if self.fec_group else None
+        else:
+            pending.parity[index] = body
+            group = index
+        if group is not None:
+            self._recover(pending, group)
+
+        if len(pending.chunks) < pending.count:
+            return None
+
+        del self.pending[msg_id]
+        # Mensagens mais antigas ainda incompletas já não serão entregues
+        for older in [m for m in self.pending if m < msg_id]:
+            self._drop(older)
+        # Lacuna de ids: mensagens sem nenhum datagrama recebido (as já contadas não repetem)
+        counted = sum(1 for m in self.counted_lost if m < msg_id)
+        self.stats["lost"] += msg_id - self.last_delivered - 1 - counted
+        self.counted_lost = {m for m in self.counted_lost if m > msg_id}
+        self.last_delivered = msg_id
+        self.stats["delivered"] += 1
+        return b"".join(pending.chunks[i] for i in range(pending.count))
+
+
+class DatagramEndpoint(asyncio.DatagramProtocol):
+    """
+    Ponta UDP (broker ou cliente)
+
+    Os callbacks recebem o token do canal, o conteúdo e o endereço de
+    origem; quem usa decide se o token e o endereço são válidos. Com
+    accept, essa decisão vem antes da remontagem: datagramas de canais
+    desconhecidos são descartados sem criar estado.
+    """
+
+    def __init__(
+        self,
+        on_message: Callable[[bytes, bytes, tuple], None],
+        on_hello: Optional[Callable[[bytes, tuple, bool], None]] = None,
+        accept: Optional[Callable[[bytes, tuple], bool]] = None,
+        mtu: int = UDP_MTU,
+        fec_group: int = UDP_FEC_GROUP,
+        loss_rate: float = UDP_SIMULATED_LOSS
+    ):
+        """
+        Args:
+            on_message: Mensagem completa recebida (token, dados, endereço)
+            on_hello: Hello recebido (token, endereço, é resposta)
+            accept: Canal (token, endereço) aceito? Consultado antes de criar
+                um remontador (None = aceita qualquer um)
+            mtu: Tamanho máximo de cada datagrama
+            fec_group: Fragmentos por paridade (0 = sem FEC)
+            loss_rate: Fração de datagramas recebidos descartados (simulação)
+        """
+        self.on_message = on_message
+        self.on_hello = on_hello
+        self.accept = accept
+        self.mtu = mtu
+        self.fec_group = fec_group
+        self.loss_rate = loss_rate
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.next_id: Dict[bytes, int] = {}
+        self.reassemblers: Dict[Tuple[bytes, tuple], Reassembler] = {}
+        self.sent = {"messages": 0, "datagrams": 0, "bytes": 0}
+        self.received_datagrams = 0
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+        # Um keyframe vira centenas de datagramas de uma vez: buffer padrão do SO transborda
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_SOCKET_BUFFER)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SOCKET_BUFFER)
+            except OSError as e:
+                logger.debug(f"Buffer UDP mantido no padrão: {e}")
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"Erro no canal UDP: {exc}")
+
+    def datagram_received(self, data: bytes, addr: tuple):
+        if self.loss_rate and random.random() < self.loss_rate:
+            return
+        if len(data) < HEADER.size:
+            return
+        magic, kind, token, msg_id, index, count, total = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return
+        self.received_datagrams += 1
+
+        if kind in (KIND_HELLO, KIND_HELLO_ACK):
+            if self.on_hello:
+                self.on_hello(token, addr, kind == KIND_HELLO_ACK)
+            return
+
+        key = (token, addr)
+        reassembler = self.reassemblers.get(key)
+        if reassembler is None:
+            # Token forjado ou endereço trocado: nada de memória por remetente desconhecido
+            if self.accept and not self.accept(token, addr):
+                return
+            reassembler = self.reassemblers[key] = Reassembler(self.mtu, self.fec_group)
+        message = reassembler.add(kind, msg_id, index, count, total, data[HEADER.size:])
+        if message is not None:
+            self.on_message(token, message, addr)
+
+    def send_hello(self, token: bytes, addr: tuple, ack: bool = False):
+        """Envia hello (cliente) ou a resposta dele (broker)"""
+        if self.transport:
+            kind = KIND_HELLO_ACK if ack else KIND_HELLO
+            self.transport.sendto(HEADER.pack(MAGIC, kind, token, 0, 0, 0, 0), addr)
+
+    def send_message(self, token: bytes, payload: bytes, addr: tuple) -> int:
+        """
+        Envia uma mensagem fragmentada
+
+        Returns:
+            int: Bytes enviados (0 se o endpoint está fechado)
+        """
+        if not self.transport or self.transport.is_closing():
+            return 0
+        msg_id = self.next_id.get(token, 0)
+        self.next_id[token] = (msg_id + 1) & 0xFFFFFFFF
+
+        sent = 0
+        for datagram in fragment(token, msg_id, payload, self.mtu, self.fec_group):
+            self.transport.sendto(datagram, addr)
+            sent += len(datagram)
+            self.sent["datagrams"] += 1
+        self.sent["messages"] += 1
+        self.sent["bytes"] += sent
+        return sent
+
+    def forget(self, token: bytes):
+        """Descarta o estado de um canal encerrado"""
+        self.next_id.pop(token, None)
+        for key in [k for k in self.reassemblers if k[0] == token]:
+            del self.reassemblers[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Envio e recepção somados de todos os canais"""
+        stats = {"sent_" + k: v for k, v in self.sent.items()}
+        stats["received_datagrams"] = self.received_datagrams
+        for reassembler in self.reassemblers.values():
+            for name, value in reassembler.stats.items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+async def open_endpoint(
+    host: str,
+    port: int,
+    on_message: Callable[[bytes, bytes, tuple], None],
+    on_hello: Optional[Callable[[bytes, tuple, bool], None]] = None,
+    **kwargs
+) -> DatagramEndpoint:
+    """
+    Abre um endpoint UDP local
+
+    Args:
+        host: Endereço local
+        port: Porta local (0 = qualquer)
+        on_message / on_hello / kwargs: Repassados a DatagramEndpoint
+
+    Returns:
+        DatagramEndpoint: Endpoint pronto para enviar
+    """
+    loop = asyncio.get_running_loop()
+    _, endpoint = await loop.create_datagram_endpoint(
+        lambda: DatagramEndpoint(on_message, on_hello, **kwargs),
+        local_addr=(host, port)
+    )
+    return endpoint
+
+
+# Exemplo de uso: perda simulada em localhost, com e sem FEC
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def demo(loss: float, fec_group: int, messages: int = 300, size: int = 20_000):
+        received = []
+        receiver = await open_endpoint(
+            "127.0.0.1", 0, lambda token, data, addr: received.append(len(data)),
+            fec_group=fec_group, loss_rate=loss
+        )
+        sender = await open_endpoint("127.0.0.1", 0, lambda *args: None, fec_group=fec_group)
+        addr = receiver.transport.get_extra_info("sockname")
+
+        payload = bytes(random.getrandbits(8) for _ in range(size))
+        for _ in range(messages):
+            sender.send_message(b"demo0001", payload, addr)
+            await asyncio.sleep(0.002)
+        await asyncio.sleep(0.2)
+
+        stats = receiver.get_stats()
+        print(
+            f"perda {loss:>4.0%} FEC {fec_group or '-':>2}: {len(received):>3}/{messages} mensagens, "
+            f"{stats.get('recovered', 0):>4} fragmentos recuperados, "
+            f"overhead {sender.sent['bytes'] / (messages * size) - 1:.0%}"
+        )
+        sender.close()
+        receiver.close()
+
+    async def main():
+        for loss in (0.0, 0.01, 0.05):
+            for fec_group in (0, 4):
+                await demo(loss, fec_group)
+
+    asyncio.run(main())
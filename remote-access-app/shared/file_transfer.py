@@ -0,0 +1,626 @@
+"""
+Transferência de arquivos e da área de transferência
+Pedaços binários fora do JSON (sem base64), CRC32 em cada pedaço, janela de
+bytes não confirmados por transferência e retomada a partir do que o
+receptor já gravou. O emissor confere o CRC por mmap e envia com
+loop.sendfile (sem passar os dados pelo processo); memória constante para
+arquivos de qualquer tamanho
+"""
+
+import os
+import mmap
+import zlib
+import asyncio
+import hashlib
+import logging
+import shutil
+import secrets
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+from config.settings import (
+    FILE_TRANSFER_DIR, FILE_SERVE_ROOT, FILE_CHUNK_SIZE, FILE_WINDOW,
+    FILE_ACK_INTERVAL, FILE_CLIPBOARD_MAX, FILE_RECEIVE_MAX
+)
+from shared.protocol import ProtocolHandler, Message
+
+logger = logging.getLogger(__name__)
+
+# Tipos tratados pelo TransferManager (e roteados pelo broker)
+FILE_MESSAGE_TYPES = ("file_req", "file_offer", "file_accept", "file_chunk", "file_ack", "file_cancel")
+
+
+class FileSource:
+    """Arquivo a enviar (aberto enquanto a transferência existir)"""
+
+    def __init__(self, path: Path):
+        """
+        Abre o arquivo
+
+        Args:
+            path: Caminho do arquivo
+
+        Raises:
+            OSError: Arquivo inexistente ou sem permissão de leitura
+        """
+        self.path = Path(path)
+        self.name = self.path.name
+        self.file = open(self.path, "rb")
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        # Mesmo caminho, tamanho e data de modificação: o receptor retoma o .part
+        self.version = hashlib.sha1(
+            f"{self.path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
+
+    def checksum(self, offset: int, length: int) -> int:
+        """CRC32 de um trecho lido por mmap (páginas do cache, sem cópia para o processo)"""
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(self.file.fileno(), offset + length - start, access=mmap.ACCESS_READ, offset=start) as view:
+            with memoryview(view) as data:
+                return zlib.crc32(data[offset - start:])
+
+    async def write_to(self, writer: asyncio.StreamWriter, offset: int, length: int):
+        """
+        Trecho do arquivo direto para o socket
+
+        loop.sendfile usa os.sendfile/TransmitFile quando o transporte
+        permite; senão (ex: TLS) copia em blocos, ainda sem carregar o arquivo.
+        """
+        await asyncio.get_running_loop().sendfile(writer.transport, self.file, offset, length)
+
+    def close(self):
+        self.file.close()
+
+
+class MemorySource:
+    """Conteúdo da área de transferência (até FILE_CLIPBOARD_MAX, já em memória)"""
+
+    def __init__(self, data: bytes, name: str = "clipboard"):
+        self.data = data
+        self.name = name
+        self.size = len(data)
+        self.version = hashlib.sha1(data).hexdigest()[:16]
+
+    def checksum(self, offset: int, length: int) -> int:
+        return zlib.crc32(memoryview(self.data)[offset:offset + length])
+
+    async def write_to(self, writer: asyncio.StreamWriter, offset: int, length: int):
+        writer.write(self.data[offset:offset + length])
+        await writer.drain()
+
+    def close(self):
+        pass
+
+
+class OutgoingTransfer:
+    """Estado do emissor: janela entre o confirmado e o próximo byte a enviar"""
+
+    def __init__(self, source: Union[FileSource, MemorySource], kind: str, request_id: str = None):
+        self.transfer_id = secrets.token_hex(8)  # Mantido ao reoferecer após queda
+        self.source = source
+        self.kind = kind
+        self.request_id = request_id
+        self.accepted = False  # Só envia pedaços depois do file_accept (com o offset inicial)
+        self.acked = 0
+        self.next_offset = 0
+        self.retransmissions = 0
+
+    def sendable(self, window: int) -> bool:
+        """Aceita, com bytes a enviar e janela livre"""
+        return (
+            self.accepted
+            and self.next_offset < self.source.size
+            and self.next_offset - self.acked < window
+        )
+
+
+class IncomingTransfer:
+    """Estado do receptor: .part em disco (arquivo) ou buffer (área de transferência)"""
+
+    def __init__(self, transfer_id: str, name: str, size: int, version: str, kind: str, directory: Path):
+        """
+        Abre o destino, retomando um .part da mesma versão
+
+        Raises:
+            OSError: Diretório de destino sem permissão de escrita
+        """
+        self.transfer_id = transfer_id
+        self.name = Path(name or "").name or "arquivo"  # Sem diretórios vindos do outro lado
+        self.size = size
+        self.version = version
+        self.kind = kind
+        self.directory = directory
+        self.unacked = 0
+        self.crc_errors = 0
+
+        if kind == "clipboard":
+            self.buffer: Optional[bytearray] = bytearray()
+            self.part_path = None
+            self.file = None
+            self.written = 0
+            return
+
+        self.buffer = None
+        directory.mkdir(parents=True, exist_ok=True)
+        self.part_path = directory / f"{Path(version).name}.part"
+        self.file = open(self.part_path, "ab")
+        self.written = self.file.seek(0, os.SEEK_END)
+        if self.written > size:
+            self.file.truncate(0)
+            self.written = 0
+
+    def write(self, data: bytes):
+        """Acrescenta um pedaço já conferido"""
+        if self.file is not None:
+            self.file.write(data)
+        else:
+            self.buffer += data
+        self.written += len(data)
+        self.unacked += len(data)
+
+    def finish(self) -> Path:
+        """Grava no disco e troca o .part pelo nome final (chamado fora do loop)"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        target = self.directory / self.name
+        counter = 1
+        while target.exists():
+            target = self.directory / f"{Path(self.name).stem} ({counter}){Path(self.name).suffix}"
+            counter += 1
+        os.replace(self.part_path, target)
+        return target
+
+    def close(self):
+        """Interrompida: o .part fica para retomar depois"""
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+
+
+class TransferManager:
+    """
+    Transferências de arquivo e área de transferência de um cliente
+
+    Os pedaços saem por uma única task, um por vez, alternando entre as
+    transferências com janela livre e cedendo o loop entre pedaços: input
+    e vídeo do cliente passam na frente, e no broker os pedaços são a
+    classe "bulk" do FairScheduler. Cada transferência tem no máximo
+    FILE_WINDOW bytes em trânsito; o receptor confirma a cada
+    FILE_ACK_INTERVAL bytes gravados.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Message], Awaitable[None]],
+        send_chunk: Callable[[Message, Union[FileSource, MemorySource], int, int], Awaitable[bool]],
+        directory: Path = FILE_TRANSFER_DIR,
+        serve_root: Optional[Path] = FILE_SERVE_ROOT,
+        clipboard_source: Optional[Callable[[], Optional[bytes]]] = None,
+        on_clipboard: Optional[Callable[[bytes], None]] = None,
+        on_offer: Optional[Callable[[str, int], bool]] = None,
+        receive_max: Optional[int] = FILE_RECEIVE_MAX,
+        chunk_size: int = FILE_CHUNK_SIZE,
+        window: int = FILE_WINDOW,
+        ack_interval: int = FILE_ACK_INTERVAL
+    ):
+        """
+        Inicializa o gerenciador
+
+        Args:
+            send: Envia uma mensagem de controle (offer, accept, ack, cancel)
+            send_chunk: Envia um pedaço (mensagem sem payload + origem, offset,
+                tamanho); retorna False se a conexão caiu
+            directory: Onde os arquivos recebidos são gravados
+            serve_root: Pasta da qual o outro lado pode pedir arquivos (None = nenhuma)
+            clipboard_source: Conteúdo local enviado quando o outro lado pede a área de transferência
+            on_clipboard: Chamado com o conteúdo recebido da área de transferência
+            on_offer: Consulta (nome, tamanho) antes de aceitar um arquivo; False recusa
+            receive_max: Maior arquivo aceito (None = só o espaço livre limita)
+            chunk_size: Bytes por pedaço
+            window: Bytes não confirmados por transferência
+            ack_interval: Receptor confirma a cada N bytes
+        """
+        self.send = send
+        self.send_chunk = send_chunk
+        self.directory = Path(directory)
+        self.serve_root = Path(serve_root).resolve() if serve_root else None
+        self.clipboard_source = clipboard_source
+        self.on_clipboard = on_clipboard
+        self.on_offer = on_offer
+        self.receive_max = receive_max
+        self.chunk_size = chunk_size
+        self.window = window
+        self.ack_interval = ack_interval
+
+        self.outgoing: Dict[str, OutgoingTransfer] = {}
+        self.incoming: Dict[str, IncomingTransfer] = {}
+        self._wakeup = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+
+        self.stats = {"bytes_sent": 0, "bytes_received": 0, "completed": 0, "crc_errors": 0}
+
+    # ---- Emissor ----
+
+    async def send_file(self, path: Union[str, Path], request_id: str = None) -> Optional[str]:
+        """
+        Oferece um arquivo ao outro lado
+
+        Returns:
+            str: transfer_id (None se o arquivo não pôde ser aberto)
+        """
+        try:
+            source = FileSource(Path(path))
+        except OSError as e:
+            logger.error(f"Erro ao abrir {path} para envio: {e}")
+            return None
+        return await self._offer(OutgoingTransfer(source, "file", request_id))
+
+    async def send_clipboard(self, data: bytes, request_id: str = None) -> Optional[str]:
+        """Oferece o conteúdo da área de transferência (None se maior que FILE_CLIPBOARD_MAX)"""
+        if len(data) > FILE_CLIPBOARD_MAX:
+            logger.warning(f"Área de transferência grande demais para enviar: {len(data)} bytes")
+            return None
+        return await self._offer(OutgoingTransfer(MemorySource(data), "clipboard", request_id))
+
+    async def request_file(self, path: str) -> str:
+        """Viewer: pede um arquivo do host (chega como file_offer com o mesmo request_id)"""
+        request_id = secrets.token_hex(8)
+        await self.send(ProtocolHandler.create_file_request(None, request_id, "file", path))
+        return request_id
+
+    async def request_clipboard(self) -> str:
+        """Viewer: pede a área de transferência do host"""
+        request_id = secrets.token_hex(8)
+        await self.send(ProtocolHandler.create_file_request(None, request_id, "clipboard"))
+        return request_id
+
+    async def _offer(self, transfer: OutgoingTransfer) -> str:
+        self.outgoing[transfer.transfer_id] = transfer
+        await self._send_offer(transfer)
+        logger.info(f"Transferência {transfer.transfer_id} oferecida: {transfer.source.name} ({transfer.source.size} bytes)")
+        return transfer.transfer_id
+
+    async def _send_offer(self, transfer: OutgoingTransfer):
+        transfer.accepted = False
+        source = transfer.source
+        await self.send(ProtocolHandler.create_file_offer(
+            None, transfer.transfer_id, source.name, source.size, source.version,
+            transfer.kind, transfer.request_id
+        ))
+
+    async def resume(self):
+        """Após retomar a sessão: reoferece o que estava saindo (o receptor responde com o offset gravado)"""
+        for transfer in list(self.outgoing.values()):
+            await self._send_offer(transfer)
+
+    def _ensure_pump(self):
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.ensure_future(self._pump())
+        self._wakeup.set()
+
+    async def _pump(self):
+        """Envia pedaços enquanto alguma transferência tiver janela livre"""
+        while self.outgoing:
+            self._wakeup.clear()
+            progressed = False
+
+            for transfer in list(self.outgoing.values()):
+                if transfer.transfer_id not in self.outgoing or not transfer.sendable(self.window):
+                    continue
+
+                offset = transfer.next_offset
+                length = min(self.chunk_size, transfer.source.size - offset)
+                try:
+                    crc = transfer.source.checksum(offset, length)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Erro ao ler {transfer.source.name}: {e}")
+                    await self.cancel(transfer.transfer_id, "Erro de leitura no emissor")
+                    continue
+
+                # Avança antes de enviar: um ack de erro tratado durante o envio volta o offset
+                transfer.next_offset = offset + length
+                msg = ProtocolHandler.create_file_chunk(None, transfer.transfer_id, offset, crc)
+                if not await self.send_chunk(msg, transfer.source, offset, length):
+                    return  # Conexão caiu: resume() reoferece e o aceite religa o envio
+
+                self.stats["bytes_sent"] += length
+                progressed = True
+                await asyncio.sleep(0)  # Input e vídeo antes do próximo pedaço
+
+            if not progressed:
+                await self._wakeup.wait()  # Janela cheia: espera confirmação ou aceite
+
+    def _finish_outgoing(self, transfer: OutgoingTransfer):
+        self.outgoing.pop(transfer.transfer_id, None)
+        transfer.source.close()
+        self.stats["completed"] += 1
+        logger.info(
+            f"Transferência {transfer.transfer_id} concluída: {transfer.source.name} "
+            f"({transfer.source.size} bytes, {transfer.retransmissions} reenvios)"
+        )
+
+    # ---- Receptor ----
+
+    async def _on_offer(self, msg: Message):
+        """
+        Aceita (retomando do que já foi gravado) ou recusa uma oferta
+
+        Arquivos maiores que receive_max, que não cabem no espaço livre do
+        diretório de destino ou recusados por on_offer não são aceitos.
+        """
+        transfer_id = msg.data.get("transfer")
+        kind = msg.data.get("kind", "file")
+        size = msg.data.get("size") or 0
+        version = msg.data.get("version") or transfer_id
+        name = msg.data.get("name")
+
+        incoming = self.incoming.get(transfer_id)
+        if incoming is None:
+            error = None
+            if not isinstance(size, int) or size < 0:
+                error = "Tamanho inválido"
+            elif kind == "clipboard" and size > FILE_CLIPBOARD_MAX:
+                error = "Área de transferência grande demais"
+            elif kind != "clipboard" and self.receive_max is not None and size > self.receive_max:
+                error = f"Arquivo maior que o limite de {self.receive_max} bytes"
+            elif any(other.version == version for other in self.incoming.values()):
+                error = "Mesmo arquivo já em recebimento"
+            elif kind != "clipboard" and self.on_offer and not self.on_offer(Path(name or "").name, size):
+                error = "Recusado pelo usuário"
+            else:
+                try:
+                    incoming = IncomingTransfer(transfer_id, name, size, version, kind, self.directory)
+                    if kind != "clipboard":
+                        free = shutil.disk_usage(self.directory).free
+                        if size - incoming.written > free:
+                            incoming.close()
+                            if not incoming.written:
+                                incoming.part_path.unlink()  # .part vazio criado só para esta oferta
+                            incoming = None
+                            error = f"Espaço insuficiente ({free} bytes livres)"
+                except OSError as e:
+                    error = f"Não foi possível gravar: {e}"
+
+            if error:
+                logger.warning(f"Transferência {transfer_id} recusada: {error}")
+                await self.send(ProtocolHandler.create_file_accept(None, transfer_id, 0, error))
+                return
+            self.incoming[transfer_id] = incoming
+            logger.info(
+                f"Recebendo {kind} '{incoming.name}' ({size} bytes)"
+                f"{f', retomando em {incoming.written}' if incoming.written else ''}"
+            )
+
+        incoming.unacked = 0
+        await self.send(ProtocolHandler.create_file_accept(None, transfer_id, incoming.written))
+        if incoming.written >= incoming.size:
+            await self._complete(incoming)
+
+    async def _on_chunk(self, msg: Message):
+        """Confere e grava um pedaço (só o próximo esperado; os demais são descartados)"""
+        incoming = self.incoming.get(msg.data.get("transfer"))
+        data = msg.payload
+        if incoming is None or data is None:
+            return
+
+        # Duplicata ou lacuna: o emissor volta ao offset certo pelo ack de erro ou pela reoferta
+        if msg.data.get("offset") != incoming.written or incoming.written + len(data) > incoming.size:
+            return
+
+        if zlib.crc32(data) != msg.data.get("crc"):
+            incoming.crc_errors += 1
+            self.stats["crc_errors"] += 1
+            logger.warning(f"CRC inválido em {incoming.name} no offset {incoming.written}; pedindo reenvio")
+            await self.send(ProtocolHandler.create_file_ack(None, incoming.transfer_id, incoming.written, "crc"))
+            return
+
+        incoming.write(data)
+        self.stats["bytes_received"] += len(data)
+
+        if incoming.written >= incoming.size:
+            await self.send(ProtocolHandler.create_file_ack(None, incoming.transfer_id, incoming.written))
+            await self._complete(incoming)
+        elif incoming.unacked >= self.ack_interval:
+            incoming.unacked = 0
+            await self.send(ProtocolHandler.create_file_ack(None, incoming.transfer_id, incoming.written))
+
+    async def _complete(self, incoming: IncomingTransfer):
+        """Recebimento concluído: arquivo no nome final ou conteúdo entregue a on_clipboard"""
+        self.incoming.pop(incoming.transfer_id, None)
+        self.stats["completed"] += 1
+
+        if incoming.kind == "clipboard":
+            logger.info(f"Área de transferência recebida ({incoming.size} bytes)")
+            if self.on_clipboard:
+                self.on_clipboard(bytes(incoming.buffer))
+            return
+
+        try:
+            # fsync de um arquivo grande pode demorar: fora do loop
+            target = await asyncio.get_running_loop().run_in_executor(None, incoming.finish)
+            logger.info(f"Arquivo recebido: {target} ({incoming.size} bytes)")
+        except OSError as e:
+            logger.error(f"Erro ao finalizar {incoming.name}: {e}")
+
+    # ---- Mensagens ----
+
+    async def handle(self, msg: Message):
+        """Trata uma mensagem de FILE_MESSAGE_TYPES"""
+        msg_type = msg.msg_type
+        transfer_id = msg.data.get("transfer")
+
+        if msg_type == "file_chunk":
+            await self._on_chunk(msg)
+
+        elif msg_type == "file_ack":
+            transfer = self.outgoing.get(transfer_id)
+            if transfer is None:
+                return
+            offset = msg.data.get("offset") or 0
+            if msg.data.get("error") == "crc":
+                # Volta ao último byte conferido (go-back-N: os pedaços seguintes são descartados)
+                transfer.acked = transfer.next_offset = offset
+                transfer.retransmissions += 1
+            else:
+                transfer.acked = max(transfer.acked, offset)
+            if transfer.acked >= transfer.source.size:
+                self._finish_outgoing(transfer)
+            self._wakeup.set()
+
+        elif msg_type == "file_accept":
+            transfer = self.outgoing.get(transfer_id)
+            if transfer is None:
+                return
+            if msg.data.get("error"):
+                logger.warning(f"Transferência {transfer_id} recusada: {msg.data['error']}")
+                self.outgoing.pop(transfer_id, None)
+                transfer.source.close()
+                return
+            transfer.acked = transfer.next_offset = min(msg.data.get("offset") or 0, transfer.source.size)
+            transfer.accepted = True
+            if transfer.acked >= transfer.source.size:
+                self._finish_outgoing(transfer)
+            else:
+                self._ensure_pump()
+
+        elif msg_type == "file_offer":
+            await self._on_offer(msg)
+
+        elif msg_type == "file_req":
+            await self._on_request(msg)
+
+        elif msg_type == "file_cancel":
+            reason = msg.data.get("reason")
+            if transfer_id is None:
+                logger.warning(f"Pedido {msg.data.get('request')} recusado: {reason}")
+                return
+            logger.warning(f"Transferência {transfer_id} cancelada: {reason}")
+            self._drop(transfer_id)
+
+    async def _on_request(self, msg: Message):
+        """Host: atende um pedido de arquivo (dentro de serve_root) ou da área de transferência"""
+        request_id = msg.data.get("request")
+
+        if msg.data.get("kind") == "clipboard":
+            data = self.clipboard_source() if self.clipboard_source else None
+            if data is not None and await self.send_clipboard(data, request_id):
+                return
+            reason = "Área de transferência vazia ou grande demais"
+        elif self.serve_root is None:
+            reason = "Host não compartilha arquivos"
+        else:
+            path = self._served_path(msg.data.get("path"))
+            if path is not None and await self.send_file(path, request_id):
+                return
+            reason = "Arquivo inexistente ou fora da pasta compartilhada"
+
+        await self.send(ProtocolHandler.create_file_cancel(None, None, reason, request_id))
+
+    def _served_path(self, path: Optional[str]) -> Optional[Path]:
+        """Caminho pedido, se for um arquivo dentro de serve_root (relativo a ela ou absoluto)"""
+        if not path or self.serve_root is None:
+            return None
+        try:
+            resolved = (self.serve_root / path).resolve()
+        except (OSError, RuntimeError):
+            return None
+        if not resolved.is_relative_to(self.serve_root) or not resolved.is_file():
+            return None
+        return resolved
+
+    # ---- Encerramento ----
+
+    async def cancel(self, transfer_id: str, reason: str = "Cancelada"):
+        """Cancela uma transferência (de saída ou de entrada) e avisa o outro lado"""
+        if self._drop(transfer_id):
+            await self.send(ProtocolHandler.create_file_cancel(None, transfer_id, reason))
+
+    def _drop(self, transfer_id: str) -> bool:
+        """Descarta o estado local (o .part de um recebimento fica para retomar)"""
+        transfer = self.outgoing.pop(transfer_id, None)
+        if transfer:
+            transfer.source.close()
+        incoming = self.incoming.pop(transfer_id, None)
+        if incoming:
+            incoming.close()
+        return bool(transfer or incoming)
+
+    def abort_all(self):
+        """Sessão nova no broker: as rotas antigas não existem mais"""
+        for transfer_id in list(self.outgoing) + list(self.incoming):
+            self._drop(transfer_id)
+
+    def close(self):
+        """Encerra o envio e fecha arquivos"""
+        if self._pump_task:
+            self._pump_task.cancel()
+        self.abort_all()
+
+    def get_stats(self) -> Dict[str, object]:
+        """Bytes, concluídas, erros de CRC e progresso das transferências em andamento"""
+        return {
+            **self.stats,
+            "outgoing": {
+                transfer_id: {"name": t.source.name, "acked": t.acked, "size": t.source.size}
+                for transfer_id, t in self.outgoing.items()
+            },
+            "incoming": {
+                transfer_id: {"name": t.name, "written": t.written, "size": t.size}
+                for transfer_id, t in self.incoming.items()
+            }
+        }
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def demo():
+        """Dois gerenciadores ligados diretamente (sem broker), com um pedaço corrompido"""
+        workdir = Path(tempfile.mkdtemp(prefix="transfer-demo-"))
+        source_path = workdir / "dados.bin"
+        source_path.write_bytes(os.urandom(3 * FILE_CHUNK_SIZE + 1234))
+        corrupt = {"next": True}
+
+        async def to_receiver(msg: Message):
+            await receiver.handle(msg)
+
+        async def to_sender(msg: Message):
+            await sender.handle(msg)
+
+        async def chunk_to_receiver(msg: Message, source, offset: int, length: int) -> bool:
+            """Entrega o pedaço direto ao receptor (no cliente: writer + sendfile)"""
+            if isinstance(source, MemorySource):
+                data = bytearray(source.data[offset:offset + length])
+            else:
+                with open(source.path, "rb") as f:
+                    f.seek(offset)
+                    data = bytearray(f.read(length))
+            if corrupt["next"] and offset == FILE_CHUNK_SIZE:
+                corrupt["next"] = False
+                data[0] ^= 0xFF
+            msg.payload = bytes(data)
+            await receiver.handle(msg)
+            return True
+
+        sender = TransferManager(to_receiver, chunk_to_receiver, directory=workdir / "enviados")
+        receiver = TransferManager(
+            to_sender, None, directory=workdir / "recebidos",
+            on_clipboard=lambda data: print(f"Área de transferência: {data.decode()}")
+        )
+
+        await sender.send_file(source_path)
+        await sender.send_clipboard("olá do outro lado".encode())
+        while sender.outgoing:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+
+        received = workdir / "recebidos" / "dados.bin"
+        print(f"Idêntico: {received.read_bytes() == source_path.read_bytes()}")
+        print(f"Emissor: {sender.get_stats()}")
+        print(f"Receptor: {receiver.get_stats()}")
+
+    asyncio.run(demo())
@@ -0,0 +1,140 @@
+"""
+Cadência de captura
+Prazos de frame em relógio monotônico, numa grade fixa a partir do FPS
+alvo: prazos perdidos são pulados (sem rajada para compensar), a tela
+parada espaça as capturas exponencialmente e uma entrada do usuário
+traz o stream de volta ao FPS normal na hora
+"""
+
+import time
+from typing import Dict
+
+from config.settings import PACER_IDLE_AFTER, PACER_IDLE_MAX_INTERVAL
+
+
+class FramePacer:
+    """
+    Prazos de captura de um stream
+
+    Uso: begin() no laço de captura (True quando o prazo venceu; o próximo
+    prazo já fica agendado), depois mark_active() ou mark_idle() conforme o
+    frame mudou ou não. time_until() diz quanto o laço pode dormir.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        idle_after: int = PACER_IDLE_AFTER,
+        idle_max_interval: float = PACER_IDLE_MAX_INTERVAL
+    ):
+        """
+        Inicializa o pacer (primeiro prazo: imediato)
+
+        Args:
+            fps (float): FPS alvo
+            idle_after (int): Frames sem mudança seguidos antes de espaçar
+            idle_max_interval (float): Intervalo máximo com a tela parada (segundos)
+        """
+        self.interval = 1.0 / fps
+        self.current_interval = self.interval
+        self.idle_after = idle_after
+        self.idle_max_interval = max(idle_max_interval, self.interval)
+        self.deadline = time.monotonic()  # Próximo prazo
+        self.frame_deadline = self.deadline  # Prazo do frame em andamento
+        self.idle_frames = 0
+
+        self.frames = 0
+        self.skipped = 0  # Prazos perdidos (captura atrasada) e não compensados
+        self.wakeups = 0  # Esperas espaçadas interrompidas por entrada
+
+    def set_fps(self, fps: float):
+        """Altera o FPS alvo (vale a partir do frame em andamento)"""
+        self.interval = 1.0 / fps
+        self.idle_max_interval = max(self.idle_max_interval, self.interval)
+        self.current_interval = self.interval
+        self.idle_frames = 0
+        self.deadline = min(self.deadline, max(time.monotonic(), self.frame_deadline + self.interval))
+
+    def time_until(self, now: float = None) -> float:
+        """Segundos até o próximo prazo (0 se já venceu)"""
+        return max(0.0, self.deadline - (time.monotonic() if now is None else now))
+
+    def begin(self, now: float = None) -> bool:
+        """
+        Inicia um frame se o prazo venceu
+
+        Returns:
+            bool: True se é hora de capturar (o prazo seguinte já foi agendado)
+        """
+        now = time.monotonic() if now is None else now
+        if now < self.deadline:
+            return False
+        self.frame_deadline = self.deadline
+        self._schedule(now)
+        self.frames += 1
+        return True
+
+    def _schedule(self, now: float):
+        """Próximo prazo na grade do frame atual, pulando os que já passaram"""
+        deadline = self.frame_deadline + self.current_interval
+        if deadline <= now:
+            missed = int((now - deadline) / self.current_interval) + 1
+            deadline += missed * self.current_interval
+            self.skipped += missed
+        self.deadline = deadline
+
+    def mark_idle(self, now: float = None):
+        """Frame sem mudança: depois de idle_after seguidos, dobra o intervalo"""
+        self.idle_frames += 1
+        if self.idle_frames >= self.idle_after and self.current_interval < self.idle_max_interval:
+            self.current_interval = min(self.current_interval * 2, self.idle_max_interval)
+            self._schedule(time.monotonic() if now is None else now)
+
+    def mark_active(self, now: float = None):
+        """Frame com mudança: volta ao intervalo do FPS alvo"""
+        self.idle_frames = 0
+        if self.current_interval != self.interval:
+            self.current_interval = self.interval
+            self._schedule(time.monotonic() if now is None else now)
+
+    def wake(self, now: float = None):
+        """
+        Entrada do usuário (ou pedido de keyframe): desfaz o espaçamento
+
+        O próximo frame sai assim que o intervalo do FPS alvo desde o último
+        permitir (na hora, se o stream estava parado), nunca acima do FPS alvo.
+        """
+        now = time.monotonic() if now is None else now
+        self.idle_frames = 0
+        self.current_interval = self.interval
+        deadline = max(now, self.frame_deadline + self.interval)
+        if deadline < self.deadline:
+            self.deadline = deadline
+            self.wakeups += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """Frames iniciados, prazos pulados, despertares e intervalo atual"""
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "wakeups": self.wakeups,
+            "interval_ms": round(self.current_interval * 1000, 1)
+        }
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    pacer = FramePacer(fps=20, idle_after=2, idle_max_interval=0.4)
+    start = time.monotonic()
+    for frame in range(12):
+        time.sleep(pacer.time_until())
+        pacer.begin()
+        changed = frame < 3 or frame == 9
+        (pacer.mark_active if changed else pacer.mark_idle)()
+        if frame == 7:
+            pacer.wake()  # Entrada: próximo frame sem esperar o intervalo espaçado
+        print(
+            f"Frame {frame:2d} em {(time.monotonic() - start) * 1000:6.1f} ms "
+            f"{'mudou' if changed else 'parado'} -> próximo em {pacer.time_until() * 1000:5.1f} ms"
+        )
+    print(f"Estatísticas: {pacer.get_stats()}")
@@ -0,0 +1,215 @@
+"""
+Codificação paralela de tiles
+O frame é copiado uma vez para memória compartilhada e workers de um pool
+de processos codificam conjuntos disjuntos de tiles lendo direto dela;
+só os bytes codificados voltam pelo pipe do pool
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import ENCODER_WORKERS, PARALLEL_ENCODE_MIN_PIXELS
+
+logger = logging.getLogger(__name__)
+
+# Resultado por tile: (dados, formato, classe de conteúdo, tempo de codificação)
+EncodeResult = Tuple[bytes, str, str, float]
+
+# Worker: segmento de memória compartilhada atualmente mapeado
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Worker: mapeia o segmento pelo nome, liberando segmentos anteriores"""
+    shm = _attached.get(name)
+    if shm is None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm
+
+
+def _encode_tiles(
+    shm_name: str,
+    shape: Tuple[int, int, int],
+    rects: List[Tuple[int, int, int, int]],
+    method: str,
+    quality: int
+) -> List[EncodeResult]:
+    """
+    Worker: codifica tiles do frame que está na memória compartilhada
+
+    Args:
+        shm_name: Nome do segmento com o frame RGB
+        shape: Shape do frame (altura, largura, 3)
+        rects: Tiles (x, y, w, h) deste worker
+        method: "adaptive", "png" ou "jpeg"
+        quality: Qualidade JPEG
+
+    Returns:
+        List[EncodeResult]: Um resultado por tile, na ordem de rects
+    """
+    from shared.screen_capture import encode_image
+
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=_attach(shm_name).buf)
+    results = []
+    for x, y, w, h in rects:
+        start = time.perf_counter()
+        data, image_format, content_class = encode_image(frame[y:y + h, x:x + w], method, quality)
+        results.append((data, image_format, content_class, time.perf_counter() - start))
+    return results
+
+
+class ParallelTileEncoder:
+    """
+    Pool de processos para codificar tiles de um frame em paralelo
+
+    Compartilhado pelos streams de MultiMonitorCapture (usado de forma
+    síncrona, um frame por vez). O segmento de memória compartilhada só é
+    recriado quando um frame maior que o atual aparece.
+    """
+
+    def __init__(
+        self,
+        workers: int = ENCODER_WORKERS,
+        min_pixels: int = PARALLEL_ENCODE_MIN_PIXELS
+    ):
+        """
+        Inicializa o codificador (o pool é criado no primeiro uso)
+
+        Args:
+            workers (int): Processos do pool (0 = automático; 1 = desativado)
+            min_pixels (int): Área mínima de trabalho para usar o pool
+        """
+        if workers <= 0:
+            workers = max(1, min(4, (os.cpu_count() or 1) - 1))
+        self.workers = workers
+        self.min_pixels = min_pixels
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.shm: Optional[shared_memory.SharedMemory] = None
+
+        logger.info(f"ParallelTileEncoder: {workers} worker(s)")
+
+    def should_parallelize(self, pixels: int) -> bool:
+        """Verifica se o trabalho compensa o custo de despachar para o pool"""
+        return self.workers > 1 and pixels >= self.min_pixels
+
+    @staticmethod
+    def bands(width: int, height: int, count: int) -> List[Tuple[int, int, int, int]]:
+        """
+        Divide um frame inteiro em faixas horizontais (keyframe em paralelo)
+
+        As alturas são múltiplas de 16 para não quebrar blocos JPEG.
+
+        Returns:
+            List[Tuple[x, y, w, h]]: Faixas cobrindo o frame, de cima para baixo
+        """
+        band_height = max(16, (-(-height // count) + 15) // 16 * 16)
+        return [
+            (0, y, width, min(band_height, height - y))
+            for y in range(0, height, band_height)
+        ]
+
+    def _partition(self, rects: List[Tuple[int, int, int, int]]) -> List[List[int]]:
+        """Distribui os tiles entre os workers equilibrando a área (maior primeiro)"""
+        chunks: List[List[int]] = [[] for _ in range(self.workers)]
+        loads = [0] * self.workers
+        for index in sorted(range(len(rects)), key=lambda i: -rects[i][2] * rects[i][3]):
+            worker = loads.index(min(loads))
+            chunks[worker].append(index)
+            loads[worker] += rects[index][2] * rects[index][3]
+        return [chunk for chunk in chunks if chunk]
+
+    def _publish(self, frame: np.ndarray):
+        """Copia o frame para a memória compartilhada (recriando se não couber)"""
+        if self.shm is None or self.shm.size < frame.nbytes:
+            self._release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+
+        np.copyto(np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf), frame)
+
+    def encode(
+        self,
+        frame: np.ndarray,
+        rects: List[Tuple[int, int, int, int]],
+        method: str,
+        quality: int
+    ) -> Optional[List[EncodeResult]]:
+        """
+        Codifica os tiles de um frame em paralelo
+
+        Args:
+            frame: Frame RGB
+            rects: Tiles (x, y, w, h)
+            method: "adaptive", "png" ou "jpeg"
+            quality: Qualidade JPEG
+
+        Returns:
+            List[EncodeResult]: Resultados na mesma ordem de rects
+            None: Falha no pool (o chamador codifica no próprio processo)
+        """
+        try:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+            self._publish(frame)
+
+            chunks = self._partition(rects)
+            futures = [
+                self.executor.submit(
+                    _encode_tiles, self.shm.name, frame.shape,
+                    [rects[i] for i in chunk], method, quality
+                )
+                for chunk in chunks
+            ]
+
+            results: List[Optional[EncodeResult]] = [None] * len(rects)
+            for chunk, future in zip(chunks, futures):
+                for index, result in zip(chunk, future.result()):
+                    results[index] = result
+            return results
+
+        except Exception as e:
+            logger.error(f"Erro na codificação paralela: {e}")
+            self._shutdown_executor()
+            return None
+
+    def _release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _shutdown_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def close(self):
+        """Encerra o pool e libera a memória compartilhada"""
+        self._shutdown_executor()
+        self._release_shm()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    frame = np.random.default_rng(0).integers(0, 256, (2160, 3840, 3), dtype=np.uint8)
+    encoder = ParallelTileEncoder()
+    rects = encoder.bands(3840, 2160, encoder.workers)
+
+    start = time.perf_counter()
+    results = encoder.encode(frame, rects, "jpeg", 80)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(rects)} faixas em {elapsed * 1000:.1f} ms: {sum(len(r[0]) for r in results)} bytes")
+    encoder.close()
@@ -0,0 +1,343 @@
+"""
+Perfilamento sob demanda
+Ligado em produção sem reiniciar o processo (sinal ou mensagem de admin)
+por N segundos: amostras de pilha do thread do loop (ou cProfile), atraso
+do loop asyncio, callbacks lentos e tempo por tipo de mensagem. O
+resultado vai para arquivos em formatos padrão de flame graph
+"""
+
+import sys
+import json
+import time
+import signal
+import asyncio
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Deque, Dict, List, Optional
+
+from config.settings import (
+    PROFILE_DIR, PROFILE_SIGNAL, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS,
+    PROFILE_SAMPLE_INTERVAL, PROFILE_LAG_INTERVAL, PROFILE_SLOW_CALLBACK_MS,
+    PROFILE_HANDLER_SAMPLES
+)
+
+logger = logging.getLogger(__name__)
+
+# "sample": pilhas amostradas (.folded, para flamegraph.pl/speedscope/inferno)
+# "cprofile": chamadas determinísticas (.pstats, para snakeviz/flameprof/gprof2dot)
+PROFILE_MODES = ["sample", "cprofile"]
+
+MAX_SLOW_CALLBACKS = 200  # Callbacks lentos guardados por perfil
+
+
+def collapse_stack(frame) -> str:
+    """Pilha no formato "collapsed" (raiz primeiro, quadros separados por ;)"""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def summarize(values) -> Dict[str, float]:
+    """Média, p50, p95 e máximo (ms) de uma lista de amostras"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(ordered[min(len(ordered) - 1, int(0.50 * len(ordered)))], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max": round(ordered[-1], 3)
+    }
+
+
+class Profiler:
+    """
+    Perfilador do processo (um por broker/cliente)
+
+    Desligado, o custo é uma checagem de atributo por mensagem. Ligado,
+    um thread amostra a pilha do thread do loop a cada
+    PROFILE_SAMPLE_INTERVAL e uma task mede o atraso do loop; quando o
+    loop passa de PROFILE_SLOW_CALLBACK_MS sem rodar, a pilha que o
+    segurava é registrada como callback lento.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: Path = PROFILE_DIR,
+        sample_interval: float = PROFILE_SAMPLE_INTERVAL,
+        lag_interval: float = PROFILE_LAG_INTERVAL,
+        slow_callback_ms: float = PROFILE_SLOW_CALLBACK_MS
+    ):
+        """
+        Inicializa o perfilador (desligado)
+
+        Args:
+            name (str): Prefixo dos arquivos gerados (ex: "broker")
+            output_dir (Path): Diretório dos perfis
+            sample_interval (float): Período de amostragem de pilhas (segundos)
+            lag_interval (float): Período da medição de atraso do loop (segundos)
+            slow_callback_ms (float): Bloqueio do loop registrado como callback lento
+        """
+        self.name = name
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.lag_interval = lag_interval
+        self.slow_callback_ms = slow_callback_ms
+
+        self.active = False
+        self.mode: Optional[str] = None
+        self.seconds = 0.0
+        self.started_at = 0.0
+        self.last_files: List[str] = []
+
+        self.stacks: Counter = Counter()
+        self.lag_ms: Deque[float] = deque(maxlen=PROFILE_HANDLER_SAMPLES)
+        self.slow_callbacks: List[Dict] = []
+        self.handlers: Dict[str, Dict] = {}
+
+        self._thread_id: Optional[int] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._last_beat = 0.0
+        self._stall_stack: Optional[str] = None
+
+    def install_signal(self) -> bool:
+        """
+        Liga/desliga o perfil com PROFILE_SIGNAL (ex: kill -USR1 <pid>)
+
+        Returns:
+            bool: False onde o sinal não existe (Windows) ou o loop não aceita
+        """
+        sig = getattr(signal, PROFILE_SIGNAL, None)
+        if sig is None:
+            return False
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, self.toggle)
+        except (NotImplementedError, RuntimeError, ValueError):
+            return False
+        logger.info(f"Perfilador '{self.name}': {PROFILE_SIGNAL} liga/desliga por {PROFILE_DEFAULT_SECONDS}s")
+        return True
+
+    def toggle(self):
+        """Inicia um perfil com os padrões, ou encerra o atual"""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self, seconds: float = PROFILE_DEFAULT_SECONDS, mode: str = "sample") -> bool:
+        """
+        Inicia um perfil (chamar do thread do loop)
+
+        Args:
+            seconds (float): Duração (limitada a PROFILE_MAX_SECONDS)
+            mode (str): "sample" ou "cprofile"
+
+        Returns:
+            bool: False se já há um perfil ativo ou o modo é inválido
+        """
+        if self.active or mode not in PROFILE_MODES:
+            return False
+
+        loop = asyncio.get_running_loop()
+        self.mode = mode
+        self.seconds = min(max(float(seconds), 1.0), PROFILE_MAX_SECONDS)
+        self.stacks.clear()
+        self.lag_ms.clear()
+        self.slow_callbacks.clear()
+        self.handlers.clear()
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stall_stack = None
+        self.started_at = time.time()
+        self.active = True
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.name}", daemon=True)
+        self._sampler.start()
+        self._heartbeat = loop.create_task(self._beat())
+        self._timer = loop.call_later(self.seconds, self.stop)
+
+        logger.info(f"Perfil '{self.name}' iniciado: {mode} por {self.seconds:.0f}s")
+        return True
+
+    async def _beat(self):
+        """Mede o atraso do loop; atraso acima do limite vira callback lento"""
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            now = time.perf_counter()
+            lag = max(0.0, (now - expected) * 1000)
+            self._last_beat = now
+            self.lag_ms.append(lag)
+
+            if lag >= self.slow_callback_ms and len(self.slow_callbacks) < MAX_SLOW_CALLBACKS:
+                self.slow_callbacks.append({
+                    "at": round(time.time() - self.started_at, 3),
+                    "duration_ms": round(lag, 3),
+                    "stack": self._stall_stack
+                })
+            self._stall_stack = None
+
+    def _sample_loop(self):
+        """Thread de amostragem: pilhas do loop e pilha de cada bloqueio"""
+        stall_limit = self.slow_callback_ms / 1000 + self.lag_interval
+        while not self._stop_event.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            stack = None
+            if self.mode == "sample":
+                stack = collapse_stack(frame)
+                self.stacks[stack] += 1
+
+            # Loop sem batimento há mais que o limite: alguém está segurando o thread
+            if self._stall_stack is None and time.perf_counter() - self._last_beat > stall_limit:
+                self._stall_stack = stack or collapse_stack(frame)
+            del frame
+
+    def record(self, label: str, elapsed: float):
+        """Acumula o tempo (segundos) de um handler, se houver perfil ativo"""
+        if not self.active:
+            return
+        stats = self.handlers.get(label)
+        if stats is None:
+            stats = self.handlers[label] = {
+                "count": 0, "total_ms": 0.0, "samples": deque(maxlen=PROFILE_HANDLER_SAMPLES)
+            }
+        elapsed_ms = elapsed * 1000
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["samples"].append(elapsed_ms)
+
+    async def timed(self, label: str, awaitable: Awaitable):
+        """Aguarda um handler medindo seu tempo por label (tipo de mensagem)"""
+        if not self.active:
+            return await awaitable
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(label, time.perf_counter() - start)
+
+    def summary(self) -> Dict:
+        """Resumo do perfil atual (ou do último): atraso do loop, callbacks lentos e handlers"""
+        handlers = {
+            label: {"count": stats["count"], "total_ms": round(stats["total_ms"], 3), **summarize(stats["samples"])}
+            for label, stats in sorted(self.handlers.items(), key=lambda item: -item[1]["total_ms"])
+        }
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            "seconds": round(time.time() - self.started_at, 3) if self.active else self.seconds,
+            "stack_samples": sum(self.stacks.values()),
+            "loop_lag_ms": summarize(self.lag_ms),
+            "slow_callbacks": self.slow_callbacks,
+            "handlers": handlers
+        }
+
+    def status(self) -> Dict:
+        """Estado do perfilador (para a resposta ao admin)"""
+        remaining = max(0.0, self.started_at + self.seconds - time.time()) if self.active else 0.0
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "remaining": round(remaining, 1),
+            "files": self.last_files
+        }
+
+    def stop(self) -> List[str]:
+        """
+        Encerra o perfil ativo e grava os arquivos
+
+        Returns:
+            List[str]: Arquivos gerados (vazia se não havia perfil ativo)
+        """
+        if not self.active:
+            return []
+        self.active = False
+
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+        if self._profile:
+            self._profile.disable()
+        self.seconds = round(time.time() - self.started_at, 3)
+
+        try:
+            self.last_files = self._dump()
+            logger.info(f"Perfil '{self.name}' gravado: {', '.join(self.last_files)}")
+        except Exception as e:
+            logger.error(f"Erro ao gravar perfil '{self.name}': {e}")
+            self.last_files = []
+        finally:
+            self._profile = None
+        return self.last_files
+
+    def _dump(self) -> List[str]:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / f"{self.name}-{datetime.fromtimestamp(self.started_at):%Y%m%d-%H%M%S}"
+        files = []
+
+        if self._profile:
+            path = base.with_suffix(".pstats")
+            self._profile.dump_stats(str(path))
+            files.append(str(path))
+        else:
+            path = base.with_suffix(".folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            files.append(str(path))
+
+        path = base.with_suffix(".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+        files.append(str(path))
+        return files
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def handler(kind: str):
+        await asyncio.sleep(0.001)
+        if kind == "blocking":
+            time.sleep(0.15)  # Segura o loop: aparece em slow_callbacks
+
+    async def demo():
+        profiler = Profiler("demo")
+        profiler.start(seconds=2)
+        for i in range(40):
+            await profiler.timed("ping", handler("ping"))
+            if i % 10 == 0:
+                await profiler.timed("blocking", handler("blocking"))
+        print(f"Arquivos: {profiler.stop()}")
+        print(json.dumps(profiler.summary(), indent=2, ensure_ascii=False)[:1500])
+
+    asyncio.run(demo())
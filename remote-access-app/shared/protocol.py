@@ -6,10 +6,13 @@ Define o formato de mensagens trocadas entre cliente e servidor
 import json
 import struct
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
 from datetime import datetime
 from config.settings import MESSAGE_TYPES, PROTOCOL_VERSION
 
+if TYPE_CHECKING:
+    from shared.stream_compression import StreamCompressor
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,7 +26,8 @@ class Message:
         msg_type: str,
         session_id: str = None,
         data: Dict[str, Any] = None,
-        timestamp: str = None
+        timestamp: str = None,
+        payload: bytes = None
     ):
         """
         Inicializa uma mensagem
@@ -33,12 +37,14 @@ class Message:
             session_id (str): ID da sessão (opcional)
             data (Dict): Dados da mensagem
             timestamp (str): Timestamp da mensagem (auto-gerado se não fornecido)
+            payload (bytes): Dados binários anexados fora do JSON (pacote binário)
         """
         self.msg_type = msg_type
         self.session_id = session_id
         self.data = data or {}
         self.timestamp = timestamp or datetime.utcnow().isoformat()
         self.protocol_version = PROTOCOL_VERSION
+        self.payload = payload
 
     def to_dict(self) -> Dict[str, Any]:
         """Converte mensagem para dicionário"""
@@ -82,20 +88,29 @@ class ProtocolHandler:
 
     HEADER_FORMAT = "!I"  # Unsigned int de 4 bytes para tamanho
     HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    COMPRESSED_FLAG = 0x80000000  # Bit alto do header: payload comprimido
+    BINARY_FLAG = 0x40000000  # JSON seguido de dados binários (ex: pedaço de arquivo)
+    SIZE_MASK = 0x3FFFFFFF
+    JSON_SIZE_FORMAT = "!I"  # Pacote binário: tamanho do JSON antes dele
+    JSON_SIZE_SIZE = struct.calcsize(JSON_SIZE_FORMAT)
 
     @staticmethod
     def create_auth_request(
         username: str,
         password_hash: str,
-        device_name: str = None
+        device_name: str = None,
+        compression: List[str] = None,
+        role: str = "host"
     ) -> Message:
-        """Cria mensagem de autenticação"""
+        """Cria mensagem de autenticação (com métodos de compressão oferecidos)"""
         return Message(
             msg_type=MESSAGE_TYPES["AUTH_REQUEST"],
             data={
                 "username": username,
                 "password": password_hash,
-                "device_name": device_name or "Unknown Device"
+                "device_name": device_name or "Unknown Device",
+                "compression": compression or [],
+                "role": role
             }
         )
 
@@ -104,16 +119,55 @@ class ProtocolHandler:
         success: bool,
         session_id: str = None,
         message: str = None,
-        server_nonce: str = None
+        server_nonce: str = None,
+        compression: str = None,
+        resume_token: str = None,
+        last_seq: Dict[str, int] = None,
+        retry_after: int = None
     ) -> Message:
-        """Cria resposta de autenticação"""
+        """
+        Cria resposta de autenticação (com método de compressão escolhido)
+
+        Args:
+            resume_token: Token de uso único para retomar a sessão após queda
+            last_seq: Retomada de host: último seq recebido pelo broker por monitor
+            retry_after: Recusa por sobrecarga: segundos até tentar de novo
+        """
         return Message(
             msg_type=MESSAGE_TYPES["AUTH_RESPONSE"],
             session_id=session_id,
             data={
                 "success": success,
                 "message": message or ("Autenticado com sucesso!" if success else "Falha na autenticação"),
-                "server_nonce": server_nonce
+                "server_nonce": server_nonce,
+                "compression": compression,
+                "resume_token": resume_token,
+                "last_seq": last_seq,
+                "retry_after": retry_after
+            }
+        )
+
+    @staticmethod
+    def create_resume_request(
+        resume_token: str,
+        last_seq: Dict[int, int] = None,
+        compression: List[str] = None
+    ) -> Message:
+        """
+        Cria pedido de retomada de sessão (substitui auth_req após queda)
+
+        Args:
+            resume_token: Token recebido no último auth_res
+            last_seq: Viewer: último seq aplicado por monitor (o broker
+                reenvia só o que veio depois)
+            compression: Métodos de compressão oferecidos (contexto novo)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["RESUME"],
+            data={
+                "resume_token": resume_token,
+                "last_seq": {str(monitor): seq for monitor, seq in (last_seq or {}).items()},
+                "compression": compression or []
             }
         )
 
@@ -123,21 +177,208 @@ class ProtocolHandler:
         image_data: bytes,
         compression_type: str = "jpeg",
         width: int = None,
-        height: int = None
+        height: int = None,
+        monitor: int = 1,
+        region: Dict[str, int] = None,
+        seq: int = None,
+        keyframe: bool = True,
+        tiles: List[Dict[str, Any]] = None,
+        copy_rects: List[Dict[str, int]] = None,
+        cache_reset: bool = True,
+        timestamps: Dict[str, int] = None
     ) -> Message:
-        """Cria mensagem de captura de tela"""
+        """
+        Cria mensagem de captura de tela (de um monitor do host)
+
+        Keyframes levam a imagem inteira em "image"; deltas levam apenas os
+        tiles alterados em "tiles" e dependem do frame de seq anterior.
+        Cópias em "copy_rects" (rolagem/arraste) são aplicadas antes dos tiles.
+        Tiles com "slot" são guardados no cache de tiles do viewer; tiles com
+        compression "cache" apenas referenciam um slot já preenchido.
+
+        Args:
+            region: Área capturada em coordenadas do monitor
+                ({"left", "top", "width", "height"}; None = monitor inteiro)
+            seq: Número de sequência do frame no stream do monitor
+            keyframe: True se o frame é independente dos anteriores
+            tiles: Deltas: [{"x", "y", "w", "h", "compression", "data": bytes, "slot"}]
+            copy_rects: [{"src_x", "src_y", "dst_x", "dst_y", "w", "h"}]
+            cache_reset: Keyframe que esvazia o cache de tiles (ressincronização)
+            timestamps: Carimbos por estágio em µs, base de tempo do broker
+                ({"grab", "enc", "sent"}; broker e viewer acrescentam os seus)
+        """
         import base64
         return Message(
             msg_type=MESSAGE_TYPES["SCREEN_CAPTURE"],
             session_id=session_id,
             data={
-                "image": base64.b64encode(image_data).decode(),
+                "image": base64.b64encode(image_data).decode() if image_data else None,
                 "compression": compression_type,
                 "width": width,
-                "height": height
+                "height": height,
+                "monitor": monitor,
+                "region": region,
+                "seq": seq,
+                "keyframe": keyframe,
+                "tiles": [
+                    {
+                        "x": tile["x"],
+                        "y": tile["y"],
+                        "w": tile["w"],
+                        "h": tile["h"],
+                        "compression": tile["compression"],
+                        "image": base64.b64encode(tile["data"]).decode() if tile["data"] else None,
+                        "slot": tile.get("slot")
+                    }
+                    for tile in tiles or []
+                ],
+                "copy_rects": copy_rects or [],
+                "cache_reset": keyframe and cache_reset,
+                "ts": timestamps
+            }
+        )
+
+    @staticmethod
+    def create_keyframe_request(session_id: str, monitor: int, last_seq: int = None) -> Message:
+        """
+        Cria pedido de keyframe (viewer -> host), enviado ao detectar perda de frames
+
+        Args:
+            session_id: ID da sessão
+            monitor: Índice do monitor
+            last_seq: Último seq aplicado pelo viewer (informativo)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["REQUEST_KEYFRAME"],
+            session_id=session_id,
+            data={"monitor": monitor, "last_seq": last_seq}
+        )
+
+    @staticmethod
+    def create_attach(session_id: str, device_name: str) -> Message:
+        """Cria pedido de um viewer para assistir o host com o nome de dispositivo dado"""
+        return Message(
+            msg_type=MESSAGE_TYPES["ATTACH"],
+            session_id=session_id,
+            data={"device_name": device_name}
+        )
+
+    @staticmethod
+    def create_monitor_info(session_id: str, monitors: List[Dict[str, Any]]) -> Message:
+        """
+        Cria mensagem com os monitores disponíveis no host
+
+        Args:
+            session_id: ID da sessão
+            monitors: Lista de {"index", "width", "height", "top", "left"}
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["MONITOR_INFO"],
+            session_id=session_id,
+            data={"monitors": monitors}
+        )
+
+    @staticmethod
+    def create_monitor_select(
+        session_id: str,
+        monitors: List[int],
+        fps: int = None
+    ) -> Message:
+        """
+        Cria seleção de monitores (viewer -> host)
+
+        Args:
+            session_id: ID da sessão
+            monitors: Índices dos monitores a receber (vazio = nenhum)
+            fps: FPS desejado (opcional)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["MONITOR_SELECT"],
+            session_id=session_id,
+            data={"monitors": monitors, "fps": fps}
+        )
+
+    @staticmethod
+    def create_region_select(
+        session_id: str,
+        monitor: int,
+        region: Dict[str, int] = None,
+        window: str = None
+    ) -> Message:
+        """
+        Cria pedido de região de interesse (viewer -> host)
+
+        Args:
+            session_id: ID da sessão
+            monitor: Índice do monitor
+            region: {"left", "top", "width", "height"} em coordenadas do monitor
+                (None = monitor inteiro)
+            window: Título de uma janela a acompanhar (tem prioridade sobre region)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["REGION_SELECT"],
+            session_id=session_id,
+            data={"monitor": monitor, "region": region, "window": window}
+        )
+
+    @staticmethod
+    def create_cursor_position(
+        session_id: str,
+        monitor: int,
+        x: int,
+        y: int,
+        visible: bool = True,
+        shape_id: int = None
+    ) -> Message:
+        """
+        Cria atualização de posição do cursor (host -> viewers)
+
+        Args:
+            monitor: Monitor onde o cursor está
+            x, y: Coordenadas relativas ao monitor
+            visible: False quando o cursor está oculto ou fora dos monitores assinados
+            shape_id: Formato atual (imagem enviada uma vez via cursor_shape)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["CURSOR_POSITION"],
+            session_id=session_id,
+            data={"monitor": monitor, "x": x, "y": y, "visible": visible, "shape_id": shape_id}
+        )
+
+    @staticmethod
+    def create_cursor_shape(
+        session_id: str,
+        shape_id: int,
+        image_data: bytes,
+        width: int,
+        height: int,
+        hotspot_x: int,
+        hotspot_y: int
+    ) -> Message:
+        """Cria mensagem com a imagem (PNG RGBA) de um formato de cursor"""
+        import base64
+        return Message(
+            msg_type=MESSAGE_TYPES["CURSOR_SHAPE"],
+            session_id=session_id,
+            data={
+                "shape_id": shape_id,
+                "image": base64.b64encode(image_data).decode(),
+                "width": width,
+                "height": height,
+                "hotspot_x": hotspot_x,
+                "hotspot_y": hotspot_y
             }
         )
 
+    @staticmethod
+    def create_notification(session_id: str, event: str, **details) -> Message:
+        """Cria notificação (ex: viewer conectado, host desconectado)"""
+        return Message(
+            msg_type=MESSAGE_TYPES["NOTIFICATION"],
+            session_id=session_id,
+            data=dict(details, event=event)
+        )
+
     @staticmethod
     def create_mouse_event(
         session_id: str,
@@ -191,21 +432,297 @@ class ProtocolHandler:
         )
 
     @staticmethod
-    def create_ping(session_id: str = None) -> Message:
-        """Cria ping"""
+    def create_ping(session_id: str = None, sent_at: int = None) -> Message:
+        """
+        Cria ping
+
+        Args:
+            session_id: ID da sessão
+            sent_at: Relógio monotônico local em µs (devolvido no pong)
+        """
         return Message(
             msg_type=MESSAGE_TYPES["PING"],
             session_id=session_id,
-            data={"timestamp": datetime.utcnow().isoformat()}
+            data={"timestamp": datetime.utcnow().isoformat(), "sent_at": sent_at}
         )
 
     @staticmethod
-    def create_pong(session_id: str = None) -> Message:
-        """Cria pong (resposta de ping)"""
+    def create_pong(session_id: str = None, echo: int = None, server_time: int = None) -> Message:
+        """
+        Cria pong (resposta de ping)
+
+        Args:
+            session_id: ID da sessão
+            echo: sent_at do ping respondido
+            server_time: Relógio monotônico de quem responde, em µs
+                (com echo, permite estimar RTT e offset de relógio)
+        """
         return Message(
             msg_type=MESSAGE_TYPES["PONG"],
             session_id=session_id,
-            data={"timestamp": datetime.utcnow().isoformat()}
+            data={
+                "timestamp": datetime.utcnow().isoformat(),
+                "echo": echo,
+                "server_time": server_time
+            }
+        )
+
+    @staticmethod
+    def create_udp_offer(session_id: str, port: int = None, token: str = None) -> Message:
+        """
+        Cria oferta do canal UDP de vídeo
+
+        Cliente -> broker sem campos (pedido); broker -> cliente com a porta
+        UDP e o token do canal, ou port None se o broker não tem UDP.
+
+        Args:
+            session_id: ID da sessão
+            port: Porta UDP do broker
+            token: Token do canal (hex, 8 bytes) enviado em cada datagrama
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["UDP_OFFER"],
+            session_id=session_id,
+            data={"port": port, "token": token}
+        )
+
+    @staticmethod
+    def create_udp_ready(session_id: str) -> Message:
+        """Cria confirmação do cliente: o caminho UDP funciona nos dois sentidos"""
+        return Message(
+            msg_type=MESSAGE_TYPES["UDP_READY"],
+            session_id=session_id,
+            data={}
+        )
+
+    @staticmethod
+    def create_udp_close(session_id: str, reason: str = None) -> Message:
+        """Cria pedido de volta ao TCP (perda alta no canal UDP)"""
+        return Message(
+            msg_type=MESSAGE_TYPES["UDP_CLOSE"],
+            session_id=session_id,
+            data={"reason": reason}
+        )
+
+    @staticmethod
+    def create_peer_hello(broker_id: str, nonce: str = "", signature: str = "") -> Message:
+        """
+        Cria hello de link entre brokers (abertura, resposta e prova final)
+
+        Args:
+            broker_id: Identificador de quem envia
+            nonce: Desafio deste lado para o outro (vazio na prova final)
+            signature: HMAC-SHA256 de "papel:broker_id:nonce do outro lado" com
+                PEER_SECRET (hex; vazio na abertura)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["PEER_HELLO"],
+            session_id=broker_id,
+            data={"broker_id": broker_id, "nonce": nonce, "signature": signature}
+        )
+
+    @staticmethod
+    def create_peer_attach(relay_id: str, username: str, device_name: str) -> Message:
+        """
+        Cria pedido de relay (broker do viewer -> broker do host)
+
+        Args:
+            relay_id: ID do relay; vira o session_id das mensagens dele no link
+            username: Usuário autenticado do viewer; o broker do host exige um
+                host desse usuário e aplica as permissões dele no seu cadastro
+            device_name: Nome do dispositivo do host
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["PEER_ATTACH"],
+            session_id=relay_id,
+            data={"relay_id": relay_id, "username": username, "device_name": device_name}
+        )
+
+    @staticmethod
+    def create_peer_attach_result(relay_id: str, success: bool, monitors: List[Dict[str, Any]] = None) -> Message:
+        """Cria resposta a um pedido de relay (com os monitores do host)"""
+        return Message(
+            msg_type=MESSAGE_TYPES["PEER_ATTACH_RESULT"],
+            session_id=relay_id,
+            data={"relay_id": relay_id, "success": success, "monitors": monitors or []}
+        )
+
+    @staticmethod
+    def create_peer_detach(relay_id: str) -> Message:
+        """Cria encerramento de relay (qualquer um dos dois brokers)"""
+        return Message(
+            msg_type=MESSAGE_TYPES["PEER_DETACH"],
+            session_id=relay_id,
+            data={"relay_id": relay_id}
+        )
+
+    @staticmethod
+    def create_profile_request(session_id: str, action: str, seconds: float = None, mode: str = None) -> Message:
+        """
+        Cria pedido de perfilamento ao broker (requer permissão admin)
+
+        Args:
+            session_id: ID da sessão
+            action: "start", "stop" ou "status"
+            seconds: Duração do perfil (start; padrão PROFILE_DEFAULT_SECONDS)
+            mode: "sample" ou "cprofile" (start)
+        """
+        data = {"action": action}
+        if seconds is not None:
+            data["seconds"] = seconds
+        if mode is not None:
+            data["mode"] = mode
+        return Message(msg_type=MESSAGE_TYPES["PROFILE"], session_id=session_id, data=data)
+
+    @staticmethod
+    def create_profile_result(
+        session_id: str,
+        success: bool,
+        status: Dict[str, Any],
+        summary: Dict[str, Any] = None,
+        message: str = None
+    ) -> Message:
+        """
+        Cria resposta a um pedido de perfilamento
+
+        Args:
+            session_id: ID da sessão
+            success: Ação executada
+            status: Estado do perfilador (active, mode, remaining, files)
+            summary: Resumo do perfil encerrado (stop)
+            message: Motivo da falha
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["PROFILE_RESULT"],
+            session_id=session_id,
+            data={"success": success, "status": status, "summary": summary, "message": message}
+        )
+
+    @staticmethod
+    def create_file_request(session_id: str, request_id: str, kind: str = "file", path: str = None) -> Message:
+        """
+        Cria pedido do viewer para o host enviar um arquivo ou a área de transferência
+
+        Args:
+            session_id: ID da sessão
+            request_id: ID do pedido (o host o devolve no file_offer)
+            kind: "file" ou "clipboard"
+            path: Caminho do arquivo no host (kind "file")
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_REQUEST"],
+            session_id=session_id,
+            data={"request": request_id, "kind": kind, "path": path}
+        )
+
+    @staticmethod
+    def create_file_offer(
+        session_id: str,
+        transfer_id: str,
+        name: str,
+        size: int,
+        version: str,
+        kind: str = "file",
+        request_id: str = None
+    ) -> Message:
+        """
+        Cria oferta de transferência (também reenviada para retomar após queda)
+
+        Args:
+            session_id: ID da sessão
+            transfer_id: ID da transferência (rota no broker)
+            name: Nome do arquivo (sem diretórios)
+            size: Tamanho total em bytes
+            version: Identidade do conteúdo (mesma versão: o receptor retoma o que já gravou)
+            kind: "file" ou "clipboard"
+            request_id: Pedido atendido (host respondendo a file_req)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_OFFER"],
+            session_id=session_id,
+            data={
+                "transfer": transfer_id,
+                "name": name,
+                "size": size,
+                "version": version,
+                "kind": kind,
+                "request": request_id
+            }
+        )
+
+    @staticmethod
+    def create_file_accept(session_id: str, transfer_id: str, offset: int = 0, error: str = None) -> Message:
+        """
+        Cria resposta do receptor a uma oferta
+
+        Args:
+            session_id: ID da sessão
+            transfer_id: ID da transferência
+            offset: Byte a partir do qual enviar (o que já foi recebido antes)
+            error: Motivo da recusa (None = aceita)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_ACCEPT"],
+            session_id=session_id,
+            data={"transfer": transfer_id, "offset": offset, "error": error}
+        )
+
+    @staticmethod
+    def create_file_chunk(session_id: str, transfer_id: str, offset: int, crc: int, data: bytes = None) -> Message:
+        """
+        Cria pedaço de arquivo (pacote binário: os bytes vão fora do JSON)
+
+        Args:
+            session_id: ID da sessão
+            transfer_id: ID da transferência
+            offset: Posição do pedaço no arquivo
+            crc: CRC32 dos bytes do pedaço
+            data: Bytes do pedaço (None: enviados à parte, ex: loop.sendfile)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_CHUNK"],
+            session_id=session_id,
+            data={"transfer": transfer_id, "offset": offset, "crc": crc},
+            payload=data
+        )
+
+    @staticmethod
+    def create_file_ack(session_id: str, transfer_id: str, offset: int, error: str = None) -> Message:
+        """
+        Cria confirmação do receptor (libera a janela do emissor)
+
+        Args:
+            session_id: ID da sessão
+            transfer_id: ID da transferência
+            offset: Bytes gravados e conferidos (offset == tamanho: concluída)
+            error: "crc" (pedaço corrompido: reenviar a partir de offset)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_ACK"],
+            session_id=session_id,
+            data={"transfer": transfer_id, "offset": offset, "error": error}
+        )
+
+    @staticmethod
+    def create_file_cancel(
+        session_id: str,
+        transfer_id: str,
+        reason: str = None,
+        request_id: str = None
+    ) -> Message:
+        """
+        Cria cancelamento de transferência (qualquer um dos lados ou o broker)
+
+        Args:
+            session_id: ID da sessão
+            transfer_id: ID da transferência (None: pedido recusado pelo host)
+            reason: Motivo
+            request_id: Pedido recusado (host respondendo a file_req)
+        """
+        return Message(
+            msg_type=MESSAGE_TYPES["FILE_CANCEL"],
+            session_id=session_id,
+            data={"transfer": transfer_id, "reason": reason, "request": request_id}
         )
 
     @staticmethod
@@ -236,30 +753,115 @@ class ProtocolHandler:
         )
 
     @staticmethod
-    def serialize_message(msg: Message) -> bytes:
+    def serialize_message(
+        msg: Message,
+        compressor: "StreamCompressor" = None
+    ) -> bytes:
         """
         Serializa mensagem para bytes com header de tamanho
 
         Formato:
         [4 bytes: tamanho da mensagem JSON] [JSON]
 
+        Se um compressor for informado e o tipo da mensagem for compressível,
+        o JSON é comprimido e o bit alto do header é ligado.
+
+        Mensagens com payload binário saem como pacote binário (ver
+        frame_binary_header), sem compressão.
+
         Args:
             msg (Message): Mensagem a serializar
+            compressor (StreamCompressor): Contexto de compressão da conexão (opcional)
 
         Returns:
             bytes: Dados serializados
         """
-        json_data = msg.to_json().encode()
-        size = struct.pack(ProtocolHandler.HEADER_FORMAT, len(json_data))
+        if msg.payload is not None:
+            header = ProtocolHandler.frame_binary_header(
+                msg.to_json().encode(), len(msg.payload), msg.msg_type, compressor
+            )
+            return header + msg.payload
+        return ProtocolHandler.frame_payload(msg.to_json().encode(), msg.msg_type, compressor)
+
+    @staticmethod
+    def frame_payload(
+        json_data: bytes,
+        msg_type: str,
+        compressor: "StreamCompressor" = None
+    ) -> bytes:
+        """
+        Monta o pacote a partir do JSON já gerado (comprimindo se aplicável)
+
+        Separado de serialize_message para quem gera o JSON antes de decidir
+        quando enviar: o contexto de compressão precisa ver as mensagens na
+        ordem em que vão para a rede.
+
+        Args:
+            json_data: Mensagem em JSON (Message.to_json().encode())
+            msg_type: Tipo da mensagem
+            compressor: Contexto de compressão da conexão (opcional)
+
+        Returns:
+            bytes: Header + payload
+        """
+        raw_size = len(json_data)
+        flags = 0
+
+        if compressor and compressor.should_compress(msg_type, raw_size):
+            json_data = compressor.compress(json_data)
+            flags = ProtocolHandler.COMPRESSED_FLAG
+
+        size = struct.pack(ProtocolHandler.HEADER_FORMAT, len(json_data) | flags)
+
+        if compressor:
+            compressor.record(
+                "sent", msg_type, raw_size,
+                ProtocolHandler.HEADER_SIZE + len(json_data)
+            )
+
         return size + json_data
 
     @staticmethod
-    def deserialize_message(data: bytes) -> Tuple[Optional[Message], bytes]:
+    def frame_binary_header(
+        json_data: bytes,
+        payload_size: int,
+        msg_type: str,
+        compressor: "StreamCompressor" = None
+    ) -> bytes:
+        """
+        Monta o início de um pacote binário; os payload_size bytes seguintes
+        são escritos à parte pelo chamador (direto do disco, sem cópia)
+
+        Formato:
+        [4 bytes: tamanho total | BINARY_FLAG] [4 bytes: tamanho do JSON] [JSON] [dados]
+
+        Args:
+            json_data: Mensagem em JSON (sem os dados binários)
+            payload_size: Tamanho dos dados que seguem o JSON
+            msg_type: Tipo da mensagem
+            compressor: Contexto de compressão da conexão (só estatísticas:
+                pacotes binários não são comprimidos)
+
+        Returns:
+            bytes: Header + tamanho do JSON + JSON
+        """
+        body_size = ProtocolHandler.JSON_SIZE_SIZE + len(json_data) + payload_size
+        header = struct.pack(ProtocolHandler.HEADER_FORMAT, body_size | ProtocolHandler.BINARY_FLAG)
+        if compressor:
+            compressor.record("sent", msg_type, body_size, ProtocolHandler.HEADER_SIZE + body_size)
+        return header + struct.pack(ProtocolHandler.JSON_SIZE_FORMAT, len(json_data)) + json_data
+
+    @staticmethod
+    def deserialize_message(
+        data: bytes,
+        compressor: "StreamCompressor" = None
+    ) -> Tuple[Optional[Message], bytes]:
         """
         Desserializa mensagem de bytes
 
         Args:
             data (bytes): Dados a desserializar
+            compressor (StreamCompressor): Contexto de compressão da conexão (opcional)
 
         Returns:
             Tuple[Message, remaining_bytes]: Mensagem (ou None se incompleta) e dados restantes
@@ -267,11 +869,14 @@ class ProtocolHandler:
         if len(data) < ProtocolHandler.HEADER_SIZE:
             return None, data
 
-        # Lê tamanho
-        msg_size = struct.unpack(
+        # Lê tamanho e flags (compressão, pacote binário)
+        header = struct.unpack(
             ProtocolHandler.HEADER_FORMAT,
             data[:ProtocolHandler.HEADER_SIZE]
         )[0]
+        compressed = bool(header & ProtocolHandler.COMPRESSED_FLAG)
+        binary = bool(header & ProtocolHandler.BINARY_FLAG)
+        msg_size = header & ProtocolHandler.SIZE_MASK
 
         # Verifica se tem dados suficientes
         total_needed = ProtocolHandler.HEADER_SIZE + msg_size
@@ -279,10 +884,31 @@ class ProtocolHandler:
             return None, data
 
         # Extrai JSON e desserializa
-        json_data = data[ProtocolHandler.HEADER_SIZE:total_needed]
+        start = ProtocolHandler.HEADER_SIZE
+        payload = None
 
         try:
+            if binary:
+                # Dados binários copiados uma vez, direto do buffer
+                json_size = struct.unpack_from(ProtocolHandler.JSON_SIZE_FORMAT, data, start)[0]
+                start += ProtocolHandler.JSON_SIZE_SIZE
+                payload = data[start + json_size:total_needed]
+                json_data = data[start:start + json_size]
+            else:
+                json_data = data[start:total_needed]
+
+            if compressed:
+                if compressor is None:
+                    raise ValueError("Mensagem comprimida sem compressão negociada")
+                json_data = compressor.decompress(json_data)
+
             msg = Message.from_json(json_data.decode())
+            msg.payload = payload
+
+            if compressor:
+                raw_size = len(json_data) + (len(payload) if payload is not None else 0)
+                compressor.record("received", msg.msg_type, raw_size, total_needed)
+
             remaining = data[total_needed:]
             return msg, remaining
         except Exception as e:
@@ -7,19 +7,215 @@ import mss
 import numpy as np
 from PIL import Image
 import io
+import sys
+import zlib
 import logging
-from typing import Tuple, Optional
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple, Optional
 import time
+from config.settings import (
+    COMPRESSION_METHOD, PNG_COMPRESS_LEVEL, ADAPTIVE_MAX_COLORS,
+    ADAPTIVE_ENTROPY_THRESHOLD, ADAPTIVE_SAMPLE_STEP, KEYFRAME_INTERVAL,
+    TILE_SIZE, DELTA_MAX_CHANGED_RATIO, SCROLL_DETECT_MIN_RATIO,
+    SCROLL_STRIP_WIDTH, SCROLL_MIN_ROWS, TILE_CACHE_SIZE,
+    SHM_RING_ENABLED, SHM_RING_NAME, SHM_RING_SLOTS
+)
+from shared.tile_cache import TileCache, tile_key
+from shared.parallel_encoder import ParallelTileEncoder
+from shared.shm_ring import FrameRing
+from shared.pacing import FramePacer
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class EncodedTile:
+    """Tile alterado de um delta (coordenadas no frame enviado)"""
+    x: int
+    y: int
+    width: int
+    height: int
+    image_format: str  # "cache": referência ao slot, sem pixels
+    data: bytes
+    cache_slot: Optional[int] = None  # Slot do cache de tiles do viewer
+
+
+@dataclass
+class CopyRect:
+    """Retângulo deslocado: o viewer copia src -> dst no próprio framebuffer"""
+    src_x: int
+    src_y: int
+    dst_x: int
+    dst_y: int
+    width: int
+    height: int
+
+
+@dataclass
+class CapturedFrame:
+    """Frame codificado de um monitor, pronto para envio"""
+    monitor: int
+    data: bytes  # Imagem inteira (keyframe); vazio em deltas
+    width: int
+    height: int
+    image_format: Optional[str]
+    region: Dict[str, int] = field(default_factory=dict)  # Área capturada (coords do monitor)
+    seq: int = 0
+    keyframe: bool = True
+    tiles: List[EncodedTile] = field(default_factory=list)  # Tiles alterados (deltas)
+    copy_rects: List[CopyRect] = field(default_factory=list)  # Aplicados antes dos tiles
+    cache_reset: bool = False  # Keyframe que esvazia o cache de tiles do viewer
+    grab_time: float = 0.0  # time.monotonic() ao capturar
+    encoded_time: float = 0.0  # time.monotonic() ao terminar a codificação
+
+
+def find_window_bounds(title: str) -> Optional[Dict[str, int]]:
+    """
+    Retorna o retângulo da janela com o título dado (coordenadas da área virtual)
+
+    Args:
+        title: Título exato da janela
+
+    Returns:
+        Dict: {"left", "top", "width", "height"}, ou None se não encontrada,
+        minimizada ou fora do Windows
+    """
+    if sys.platform != "win32":
+        return None
+
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    hwnd = user32.FindWindowW(None, title)
+    if not hwnd or user32.IsIconic(hwnd):
+        return None
+
+    rect = wintypes.RECT()
+    if not user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+        return None
+
+    return {
+        "left": rect.left,
+        "top": rect.top,
+        "width": rect.right - rect.left,
+        "height": rect.bottom - rect.top
+    }
+
+
+def bgra_view(raw, width: int, height: int) -> np.ndarray:
+    """
+    Cria view HxWx4 sobre o buffer BGRA do mss, sem cópia
+
+    Args:
+        raw: Buffer BGRA (ex: ScreenShot.raw)
+        width: Largura em pixels
+        height: Altura em pixels
+
+    Returns:
+        np.ndarray: View uint8 (B, G, R, A)
+    """
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 4)
+
+
+def bgra_to_rgb(bgra: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converte BGRA para RGB contíguo em uma única passada
+
+    Args:
+        bgra: Frame HxWx4 em BGRA
+        out: Buffer de saída reutilizável (alocado se None ou de shape diferente)
+
+    Returns:
+        np.ndarray: Frame HxWx3 em RGB (o próprio out quando fornecido)
+    """
+    shape = bgra.shape[:2] + (3,)
+    if out is None or out.shape != shape:
+        out = np.empty(shape, dtype=np.uint8)
+    np.copyto(out, bgra[..., 2::-1])
+    return out
+
+
+def encode_image(frame: np.ndarray, method: str, quality: int) -> Tuple[bytes, str, str]:
+    """
+    Codifica um frame (ou tile) RGB
+
+    No modo "adaptive" o conteúdo é classificado: telas sintéticas (texto,
+    UI) vão para PNG com paleta, conteúdo fotográfico vai para JPEG.
+    Função pura, usada tanto no processo de captura quanto nos workers
+    de shared/parallel_encoder.py.
+
+    Args:
+        frame: Pixels RGB (view não contígua aceita)
+        method: "adaptive", "png" ou "jpeg"
+        quality: Qualidade JPEG (0-100)
+
+    Returns:
+        Tuple[dados, formato ("png"/"jpeg"), classe de conteúdo]
+    """
+    if method == "adaptive":
+        content_class = FrameProcessor.classify_content(frame)
+    elif method == "png":
+        content_class = "synthetic"
+    else:
+        content_class = "photographic"
+
+    img = Image.fromarray(frame, "RGB")
+
+    if content_class == "synthetic":
+        return encode_palette_png(img), "png", content_class
+    return encode_jpeg(img, quality), "jpeg", content_class
+
+
+def encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    """Codifica imagem em JPEG"""
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def encode_palette_png(img: Image.Image) -> bytes:
+    """
+    Codifica imagem em PNG, com paleta quando cabe
+
+    Com até ADAPTIVE_MAX_COLORS cores usa paleta (median cut com uma caixa
+    por cor); acima disso grava RGB. Nos dois casos é sem perdas: quantizar
+    texto e UI com muitas cores borraria bordas e degradês.
+    """
+    colors = img.getcolors(maxcolors=ADAPTIVE_MAX_COLORS)
+
+    if colors is not None:
+        img = img.quantize(
+            colors=len(colors),
+            method=Image.Quantize.MEDIANCUT,
+            dither=Image.Dither.NONE
+        )
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
 class ScreenCapture:
     """
     Gerenciador de captura de tela
     """
 
-    def __init__(self, target_fps: int = 15, quality: int = 80, scale: float = 1.0):
+    def __init__(
+        self,
+        target_fps: int = 15,
+        quality: int = 80,
+        scale: float = 1.0,
+        method: str = COMPRESSION_METHOD,
+        monitor_index: int = 1,
+        sct: "mss.base.MSSBase" = None,
+        skip_unchanged: bool = True,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+        tile_size: int = TILE_SIZE,
+        tile_cache_size: int = TILE_CACHE_SIZE,
+        encoder: Optional[ParallelTileEncoder] = None,
+        publisher: Optional[FrameRing] = None
+    ):
         """
         Inicializa capturador de tela
 
@@ -27,19 +223,57 @@ class ScreenCapture:
             target_fps (int): FPS alvo para captura
             quality (int): Qualidade JPEG (0-100)
             scale (float): Escala de redimensionamento (1.0 = sem redimensionamento)
+            method (str): "adaptive", "png" ou "jpeg"
+            monitor_index (int): Índice do monitor no mss (1 = principal)
+            sct: Instância mss compartilhada (opcional; criada se None)
+            skip_unchanged (bool): Não recodifica frames idênticos ao anterior
+            keyframe_interval (int): Frames entre keyframes (capture_update)
+            tile_size (int): Lado dos tiles dos deltas, em pixels
+            tile_cache_size (int): Slots do cache de tiles (0 desativa)
+            encoder: Pool de codificação paralela (opcional; compartilhado)
+            publisher: Anel em memória compartilhada que recebe cada frame
+                RGB capturado (opcional; consumidores locais)
         """
         self.target_fps = target_fps
-        self.frame_delay = 1.0 / target_fps
+        self.pacer = FramePacer(target_fps)  # Prazos de captura (relógio monotônico)
         self.quality = quality
         self.scale = scale
-        self.last_frame_time = 0
-        self.sct = mss.mss()
-        self.monitor = self.sct.monitors[1]  # Monitor principal
+        self.method = method
+        self.last_format = "jpeg"  # Formato do último frame comprimido
+        self.encoder_stats: Dict[str, Dict[str, float]] = {
+            "synthetic": {"frames": 0, "bytes": 0, "encode_time": 0.0},
+            "photographic": {"frames": 0, "bytes": 0, "encode_time": 0.0}
+        }
+        self.resizer = FrameResizer()
+        self._rgb_buffer: Optional[np.ndarray] = None  # Reutilizado entre frames
+        self.skip_unchanged = skip_unchanged
+        self._last_checksum: Optional[int] = None
+        self._owns_sct = sct is None
+        self.sct = sct or mss.mss(with_cursor=False)
+        self.monitor_index = monitor_index
+        self.monitor = self.sct.monitors[monitor_index]
         self.width = self.monitor["width"]
         self.height = self.monitor["height"]
 
+        # Região de interesse (coords do monitor); None = monitor inteiro
+        self.region: Optional[Dict[str, int]] = None
+        self.window_provider: Optional[Callable[[], Optional[Dict[str, int]]]] = None
+        self.last_region: Dict[str, int] = self._full_region()
+
+        # Stream keyframe/delta (capture_update)
+        self.keyframe_interval = keyframe_interval
+        self.tile_size = tile_size
+        self.seq = 0
+        self._frames_since_keyframe = 0
+        self._force_keyframe = True
+        self._prev_frame: Optional[np.ndarray] = None
+        self.tile_cache = TileCache(tile_cache_size)
+        self.encoder = encoder
+        self.publisher = publisher
+
         logger.info(
-            f"ScreenCapture inicializado: {self.width}x{self.height} @ {target_fps}fps"
+            f"ScreenCapture inicializado: monitor {monitor_index} "
+            f"{self.width}x{self.height} @ {target_fps}fps"
         )
 
     def capture_frame(self) -> Optional[Tuple[bytes, Tuple[int, int]]]:
@@ -47,83 +281,370 @@ class ScreenCapture:
         Captura um frame da tela
 
         Returns:
-            Tuple[bytes, (width, height)]: Frame em JPEG comprimido e dimensões
-            None: Se ainda não passou o tempo mínimo entre frames
+            Tuple[bytes, (width, height)]: Frame comprimido e dimensões
+                (o formato usado fica em self.last_format e a área
+                capturada em self.last_region)
+            None: Se o prazo do próximo frame ainda não venceu,
+                se a tela não mudou desde o último frame ou se a janela
+                acompanhada não está visível
         """
         try:
-            now = time.time()
+            frame = self._grab_frame()
+            if frame is None:
+                return None
+
+            # Comprime (JPEG ou PNG paleta conforme o conteúdo)
+            jpeg_data = self._compress_frame(frame)
 
-            # Respeita FPS alvo
-            elapsed = now - self.last_frame_time
-            if elapsed < self.frame_delay:
+            height, width = frame.shape[:2]
+            return jpeg_data, (width, height)
+
+        except Exception as e:
+            logger.error(f"Erro ao capturar tela: {e}")
+            return None
+
+    def capture_update(self) -> Optional["CapturedFrame"]:
+        """
+        Captura um frame como atualização do stream (keyframe ou delta)
+
+        Keyframes levam a imagem inteira e são emitidos a cada
+        keyframe_interval frames, quando pedidos (request_keyframe), quando
+        a região/dimensão muda ou quando muitos tiles mudaram. Os demais
+        frames levam cópias de retângulos (rolagem/arraste detectados) e
+        os tiles que continuam diferentes após aplicá-las.
+
+        Returns:
+            CapturedFrame: Atualização com número de sequência
+            None: Sem frame a enviar (ver capture_frame)
+        """
+        try:
+            grab_time = time.monotonic()
+            frame = self._grab_frame()
+            if frame is None:
                 return None
 
-            self.last_frame_time = now
+            # Consumidores locais recebem todo frame capturado, mesmo sem delta a enviar
+            if self.publisher:
+                self.publisher.publish(frame, self.monitor_index, grab_time)
+
+            height, width = frame.shape[:2]
+            prev = self._prev_frame
+
+            # Viewer novo ou dessincronizado: o cache de tiles recomeça do zero
+            cache_reset = self._force_keyframe or prev is None or prev.shape != frame.shape
+            keyframe = cache_reset or self._frames_since_keyframe + 1 >= self.keyframe_interval
 
-            # Captura tela
-            screenshot = self.sct.grab(self.monitor)
+            tiles: List[EncodedTile] = []
+            copy_rects: List[CopyRect] = []
+            if not keyframe:
+                rects = FrameProcessor.changed_tiles(prev, frame, self.tile_size)
+                if not rects:
+                    return None
+                changed_area = sum(w * h for _, _, w, h in rects)
 
-            # Converte para NumPy array
-            frame = np.array(screenshot)
+                # Muita área alterada: pode ser rolagem/arraste (conteúdo deslocado)
+                if changed_area > SCROLL_DETECT_MIN_RATIO * width * height:
+                    copy_rects = FrameProcessor.detect_moves(prev, frame)
+                    if copy_rects:
+                        # Simula o viewer: aplica as cópias na base antes de calcular os tiles
+                        FrameProcessor.apply_copy_rects(prev, copy_rects)
+                        rects = FrameProcessor.changed_tiles(prev, frame, self.tile_size)
+                        changed_area = sum(w * h for _, _, w, h in rects)
 
-            # BGR to RGB (mss usa BGRA)
-            frame = frame[:, :, :3]  # Remove canal alfa
+                keyframe = changed_area > DELTA_MAX_CHANGED_RATIO * width * height
+                if keyframe:
+                    copy_rects = []
 
-            # Aplicar escala se necessário
-            if self.scale != 1.0:
-                new_width = int(self.width * self.scale)
-                new_height = int(self.height * self.scale)
-                frame = self._resize_frame(frame, new_width, new_height)
-                actual_width, actual_height = new_width, new_height
+            if keyframe:
+                data, image_format = b"", None
+                if self.encoder and self.encoder.should_parallelize(width * height):
+                    # Keyframe em faixas horizontais, uma por worker
+                    bands = self.encoder.bands(width, height, self.encoder.workers)
+                    tiles = self._encode_parallel(frame, bands)
+                if not tiles:
+                    data = self._compress_frame(frame)
+                    image_format = self.last_format
+                self._frames_since_keyframe = 0
+                self._force_keyframe = False
+                if cache_reset:
+                    self.tile_cache.reset()
             else:
-                actual_width, actual_height = self.width, self.height
+                data, image_format = b"", None
+                tiles = self._encode_tiles(frame, rects)
+                self._frames_since_keyframe += 1
 
-            # Comprime para JPEG
-            jpeg_data = self._compress_frame(frame)
+            # Guarda o frame como base do próximo delta
+            if prev is None or prev.shape != frame.shape:
+                self._prev_frame = frame.copy()
+            else:
+                np.copyto(prev, frame)
 
-            return jpeg_data, (actual_width, actual_height)
+            self.seq += 1
+            return CapturedFrame(
+                monitor=self.monitor_index,
+                data=data,
+                width=width,
+                height=height,
+                image_format=image_format,
+                region=self.last_region,
+                seq=self.seq,
+                keyframe=keyframe,
+                tiles=tiles,
+                copy_rects=copy_rects,
+                cache_reset=cache_reset,
+                grab_time=grab_time,
+                encoded_time=time.monotonic()
+            )
 
         except Exception as e:
-            logger.error(f"Erro ao capturar tela: {e}")
+            logger.error(f"Erro ao capturar atualização: {e}")
             return None
 
-    @staticmethod
-    def _resize_frame(frame: np.ndarray, width: int, height: int) -> np.ndarray:
-        """Redimensiona frame mantendo aspect ratio"""
-        try:
-            img = Image.fromarray(frame, "RGB")
-            img = img.resize((width, height), Image.Resampling.LANCZOS)
-            return np.array(img)
-        except Exception as e:
-            logger.error(f"Erro ao redimensionar: {e}")
-            return frame
+    def _encode_tiles(self, frame: np.ndarray, rects: List[Tuple[int, int, int, int]]) -> List[EncodedTile]:
+        """
+        Codifica os tiles alterados de um delta, usando o cache de tiles
+
+        Tiles já enviados viram referência ("cache"); os demais são
+        codificados (em paralelo quando a área compensa) e ganham um slot.
+
+        Returns:
+            List[EncodedTile]: Na mesma ordem de rects
+        """
+        tiles: List[Optional[EncodedTile]] = [None] * len(rects)
+        pending: Dict[bytes, List[int]] = {}  # Chave -> tiles iguais ainda não enviados
+
+        for index, (x, y, w, h) in enumerate(rects):
+            key = tile_key(frame[y:y + h, x:x + w])
+            if key in pending:
+                pending[key].append(index)
+                continue
+            slot = self.tile_cache.lookup(key)
+            if slot is not None:
+                tiles[index] = EncodedTile(x, y, w, h, "cache", b"", slot)
+            else:
+                pending[key] = [index]
+
+        misses = [indexes[0] for indexes in pending.values()]
+        encoded = None
+        if self.encoder and self.encoder.should_parallelize(
+            sum(rects[i][2] * rects[i][3] for i in misses)
+        ):
+            encoded = self._encode_parallel(frame, [rects[i] for i in misses])
+
+        for position, (key, indexes) in enumerate(pending.items()):
+            x, y, w, h = rects[indexes[0]]
+            if encoded:
+                tile = encoded[position]
+            else:
+                data = self._compress_frame(frame[y:y + h, x:x + w])
+                tile = EncodedTile(x, y, w, h, self.last_format, data)
+
+            tile.cache_slot = self.tile_cache.store(key, len(tile.data))
+            tiles[indexes[0]] = tile
+
+            # Repetições no mesmo frame já podem referenciar o slot
+            for index in indexes[1:]:
+                rx, ry, rw, rh = rects[index]
+                tiles[index] = EncodedTile(rx, ry, rw, rh, "cache", b"", tile.cache_slot)
+
+        return tiles
+
+    def _encode_parallel(
+        self,
+        frame: np.ndarray,
+        rects: List[Tuple[int, int, int, int]]
+    ) -> List[EncodedTile]:
+        """
+        Codifica tiles no pool de processos
+
+        Returns:
+            List[EncodedTile]: Na mesma ordem de rects (vazia se o pool falhar)
+        """
+        results = self.encoder.encode(frame, rects, self.method, self.quality)
+        if results is None:
+            return []
+
+        tiles = []
+        for (x, y, w, h), (data, image_format, content_class, elapsed) in zip(rects, results):
+            self._record_encode(content_class, len(data), elapsed)
+            tiles.append(EncodedTile(x, y, w, h, image_format, data))
+        return tiles
+
+    def _grab_frame(self) -> Optional[np.ndarray]:
+        """
+        Captura e converte um frame para RGB (já redimensionado)
+
+        Returns:
+            np.ndarray: Frame RGB (buffer reutilizado; consumir antes da próxima chamada)
+            None: Fora do prazo de frame, tela inalterada ou janela não visível
+        """
+        # Prazo do FPS alvo (espaçado enquanto a tela está parada)
+        if not self.pacer.begin():
+            return None
+
+        # Área a capturar (monitor inteiro, ROI ou janela)
+        region = self._current_region()
+        if region is None:
+            self.pacer.mark_idle()
+            return None
+
+        if region != self.last_region:
+            self.last_region = region
+            self.request_keyframe()
+
+        # Captura apenas a região
+        screenshot = self.sct.grab({
+            "left": self.monitor["left"] + region["left"],
+            "top": self.monitor["top"] + region["top"],
+            "width": region["width"],
+            "height": region["height"]
+        })
+
+        # Tela idêntica ao último frame: não converte nem codifica
+        if self.skip_unchanged:
+            checksum = zlib.crc32(screenshot.raw)
+            if checksum == self._last_checksum:
+                self.pacer.mark_idle()
+                return None
+            self._last_checksum = checksum
+        self.pacer.mark_active()
+
+        # View BGRA sem cópia sobre o buffer do mss
+        bgra = bgra_view(screenshot.raw, screenshot.width, screenshot.height)
+
+        # Aplicar escala se necessário
+        if self.scale != 1.0:
+            new_width = max(1, int(region["width"] * self.scale))
+            new_height = max(1, int(region["height"] * self.scale))
+            # Redimensiona direto da view RGB (canais invertidos, sem cópia)
+            return self._resize_frame(bgra[..., 2::-1], new_width, new_height)
+
+        # BGRA -> RGB em uma única cópia para o buffer reutilizável
+        self._rgb_buffer = bgra_to_rgb(bgra, self._rgb_buffer)
+        return self._rgb_buffer
+
+    def _full_region(self) -> Dict[str, int]:
+        """Região correspondente ao monitor inteiro"""
+        return {"left": 0, "top": 0, "width": self.width, "height": self.height}
+
+    def _clamp_region(self, region: Dict[str, int]) -> Optional[Dict[str, int]]:
+        """Limita a região ao monitor; retorna None se não houver interseção"""
+        left = max(0, int(region["left"]))
+        top = max(0, int(region["top"]))
+        right = min(self.width, int(region["left"]) + int(region["width"]))
+        bottom = min(self.height, int(region["top"]) + int(region["height"]))
+
+        if right <= left or bottom <= top:
+            return None
+        return {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+    def _current_region(self) -> Optional[Dict[str, int]]:
+        """Resolve a região do próximo frame"""
+        if self.window_provider:
+            bounds = self.window_provider()
+            if not bounds:
+                return None
+            # Coordenadas da área virtual -> coordenadas do monitor
+            return self._clamp_region({
+                "left": bounds["left"] - self.monitor["left"],
+                "top": bounds["top"] - self.monitor["top"],
+                "width": bounds["width"],
+                "height": bounds["height"]
+            })
+
+        return self.region or self._full_region()
+
+    def set_region(self, region: Optional[Dict[str, int]]):
+        """
+        Define a região de interesse (pode ser alterada com o stream ativo)
+
+        Args:
+            region: {"left", "top", "width", "height"} em coordenadas do
+                monitor, ou None para o monitor inteiro
+        """
+        self.window_provider = None
+        self.region = self._clamp_region(region) if region else None
+        self.request_refresh()
+        logger.info(f"Monitor {self.monitor_index}: região {self.region or 'monitor inteiro'}")
+
+    def set_window(self, provider: Optional[Callable[[], Optional[Dict[str, int]]]]):
+        """
+        Acompanha uma janela: a região é recalculada a cada frame
+
+        Args:
+            provider: Função que retorna os limites da janela na área virtual
+                (ex: lambda: find_window_bounds("Bloco de Notas")), ou None
+        """
+        self.region = None
+        self.window_provider = provider
+        self.request_refresh()
+
+    def _resize_frame(self, frame: np.ndarray, width: int, height: int) -> np.ndarray:
+        """Redimensiona frame (filtro escolhido pelo FrameResizer)"""
+        return self.resizer.resize(frame, width, height)
 
     def _compress_frame(self, frame: np.ndarray) -> bytes:
         """
-        Comprime frame para JPEG
+        Comprime frame conforme o método configurado (ver encode_image)
 
         Args:
             frame (np.ndarray): Frame em formato RGB
 
         Returns:
-            bytes: Dados JPEG comprimidos
+            bytes: Dados comprimidos
         """
         try:
-            img = Image.fromarray(frame, "RGB")
-
-            # Salva em memória
-            buffer = io.BytesIO()
-            img.save(buffer, format="JPEG", quality=self.quality, optimize=True)
-
-            return buffer.getvalue()
+            start = time.perf_counter()
+            data, self.last_format, content_class = encode_image(frame, self.method, self.quality)
+            self._record_encode(content_class, len(data), time.perf_counter() - start)
+            return data
 
         except Exception as e:
             logger.error(f"Erro ao comprimir frame: {e}")
             return b""
 
+    def _record_encode(self, content_class: str, size: int, elapsed: float):
+        """Acumula estatísticas de uma imagem codificada (aqui ou em um worker)"""
+        stats = self.encoder_stats[content_class]
+        stats["frames"] += 1
+        stats["bytes"] += size
+        stats["encode_time"] += elapsed
+
+    def get_encoder_stats(self) -> Dict[str, Dict[str, float]]:
+        """Retorna bytes e tempo de CPU médios por classe de conteúdo"""
+        result = {}
+        for content_class, stats in self.encoder_stats.items():
+            frames = stats["frames"] or 1
+            result[content_class] = {
+                "frames": stats["frames"],
+                "bytes": stats["bytes"],
+                "avg_bytes": stats["bytes"] / frames,
+                "avg_encode_ms": stats["encode_time"] * 1000 / frames
+            }
+        result["tile_cache"] = self.tile_cache.get_stats()
+        result["pacer"] = self.pacer.get_stats()
+        return result
+
+    def set_target_fps(self, target_fps: int):
+        """Altera o FPS alvo deste monitor"""
+        self.target_fps = target_fps
+        self.pacer.set_fps(target_fps)
+
+    def request_refresh(self):
+        """Força o envio do próximo frame mesmo sem mudanças (ex: novo viewer)"""
+        self._last_checksum = None
+        self.pacer.wake()
+
+    def request_keyframe(self):
+        """Força que a próxima atualização seja um keyframe (ex: viewer perdeu deltas)"""
+        self._force_keyframe = True
+        self._last_checksum = None
+        self.pacer.wake()
+
     def get_monitor_info(self) -> dict:
         """Retorna informações do monitor"""
         return {
+            "index": self.monitor_index,
             "width": self.width,
             "height": self.height,
             "top": self.monitor.get("top", 0),
@@ -132,15 +653,319 @@ class ScreenCapture:
 
     def close(self):
         """Libera recursos"""
+        if self.sct and self._owns_sct:
+            self.sct.close()
+
+
+class MultiMonitorCapture:
+    """
+    Captura de múltiplos monitores com um stream independente por monitor
+
+    Cada monitor assinado tem seu próprio ScreenCapture (FPS, detecção de
+    mudança e estatísticas independentes). Monitores sem assinantes não
+    são capturados nem codificados.
+    """
+
+    def __init__(
+        self,
+        target_fps: int = 15,
+        quality: int = 80,
+        scale: float = 1.0,
+        method: str = COMPRESSION_METHOD,
+        publish: bool = SHM_RING_ENABLED
+    ):
+        """
+        Inicializa o gerenciador de monitores
+
+        Args:
+            target_fps (int): FPS padrão de cada stream
+            quality (int): Qualidade JPEG (0-100)
+            scale (float): Escala de redimensionamento
+            method (str): "adaptive", "png" ou "jpeg"
+            publish (bool): Publica os frames de cada monitor capturado num
+                anel em memória compartilhada (SHM_RING_NAME-<monitor>)
+        """
+        self.target_fps = target_fps
+        self.quality = quality
+        self.scale = scale
+        self.method = method
+        self.publish = publish
+        # Anéis sobrevivem às trocas de assinatura (leitores continuam conectados)
+        self.publishers: Dict[int, FrameRing] = {}
+        # Cursor fora da captura: vai pelo canal próprio (shared/cursor.py)
+        self.sct = mss.mss(with_cursor=False)
+        self.streams: Dict[int, ScreenCapture] = {}
+        # Um pool de codificação para todos os monitores (streams são capturados em sequência)
+        encoder = ParallelTileEncoder()
+        self.encoder = encoder if encoder.workers > 1 else None
+
+        logger.info(f"MultiMonitorCapture inicializado: {len(self.sct.monitors) - 1} monitor(es)")
+
+    def list_monitors(self) -> List[dict]:
+        """Retorna os monitores físicos (o índice 0 do mss é a área virtual inteira)"""
+        return [
+            {
+                "index": index,
+                "width": monitor["width"],
+                "height": monitor["height"],
+                "top": monitor.get("top", 0),
+                "left": monitor.get("left", 0)
+            }
+            for index, monitor in enumerate(self.sct.monitors)
+            if index > 0
+        ]
+
+    def subscribe(self, monitors: List[int], fps: int = None):
+        """
+        Define quais monitores devem ser capturados
+
+        Args:
+            monitors: Índices dos monitores (monitores fora da lista são liberados)
+            fps: FPS alvo (opcional, aplica a todos os monitores assinados)
+        """
+        valid = {index for index in monitors if 1 <= index < len(self.sct.monitors)}
+
+        for index in list(self.streams):
+            if index not in valid:
+                self.streams.pop(index).close()
+                logger.info(f"Monitor {index} sem assinantes: captura parada")
+
+        for index in sorted(valid):
+            stream = self.streams.get(index)
+            if stream is None:
+                self.streams[index] = ScreenCapture(
+                    target_fps=fps or self.target_fps,
+                    quality=self.quality,
+                    scale=self.scale,
+                    method=self.method,
+                    monitor_index=index,
+                    sct=self.sct,
+                    encoder=self.encoder,
+                    publisher=self._publisher(index)
+                )
+            else:
+                if fps:
+                    stream.set_target_fps(fps)
+                # Pode haver um viewer novo, sem base para deltas
+                stream.request_keyframe()
+
+    def _publisher(self, index: int) -> Optional[FrameRing]:
+        """Anel do monitor, criado na primeira captura (None se desativado)"""
+        if not self.publish:
+            return None
+        ring = self.publishers.get(index)
+        if ring is None:
+            monitor = self.sct.monitors[index]
+            scale = max(self.scale, 1.0)
+            slot_size = int(monitor["width"] * scale + 1) * int(monitor["height"] * scale + 1) * 3
+            try:
+                ring = FrameRing(f"{SHM_RING_NAME}-{index}", slot_size, SHM_RING_SLOTS)
+            except Exception as e:
+                logger.error(f"Erro ao criar anel do monitor {index}: {e}")
+                return None
+            self.publishers[index] = ring
+        return ring
+
+    def set_region(
+        self,
+        monitor: int,
+        region: Optional[Dict[str, int]] = None,
+        window: Optional[str] = None
+    ):
+        """
+        Define a região de interesse de um monitor assinado
+
+        Args:
+            monitor: Índice do monitor
+            region: Retângulo em coordenadas do monitor (None = inteiro)
+            window: Título de janela a acompanhar (tem prioridade sobre region)
+        """
+        stream = self.streams.get(monitor)
+        if not stream:
+            logger.warning(f"Região pedida para monitor não assinado: {monitor}")
+            return
+
+        if window:
+            stream.set_window(lambda: find_window_bounds(window))
+            logger.info(f"Monitor {monitor}: acompanhando janela '{window}'")
+        else:
+            stream.set_region(region)
+
+    def locate(self, x: int, y: int) -> Optional[Tuple[int, int, int]]:
+        """
+        Converte coordenadas da área virtual para um monitor assinado
+
+        Returns:
+            Tuple[monitor, x, y]: Coordenadas relativas ao monitor, ou None
+            se o ponto não está em nenhum monitor assinado
+        """
+        for index, stream in self.streams.items():
+            monitor = stream.monitor
+            local_x, local_y = x - monitor["left"], y - monitor["top"]
+            if 0 <= local_x < monitor["width"] and 0 <= local_y < monitor["height"]:
+                return index, local_x, local_y
+        return None
+
+    def request_keyframe(self, monitor: int):
+        """Força keyframe no próximo frame do monitor (pedido por um viewer)"""
+        stream = self.streams.get(monitor)
+        if stream:
+            stream.request_keyframe()
+
+    def wake(self):
+        """Entrada do usuário: todos os streams voltam ao FPS alvo na hora"""
+        for stream in self.streams.values():
+            stream.pacer.wake()
+
+    def time_until_next(self) -> Optional[float]:
+        """Segundos até o prazo mais próximo entre os streams (None = nenhum stream)"""
+        if not self.streams:
+            return None
+        now = time.monotonic()
+        return min(stream.pacer.time_until(now) for stream in self.streams.values())
+
+    def capture_frames(self) -> List[CapturedFrame]:
+        """
+        Captura os monitores assinados cujo prazo de frame venceu
+
+        Returns:
+            List[CapturedFrame]: Atualizações (keyframes ou deltas) codificadas
+        """
+        frames = []
+        for stream in self.streams.values():
+            update = stream.capture_update()
+            if update:
+                frames.append(update)
+        return frames
+
+    def get_encoder_stats(self) -> Dict[int, Dict[str, Dict[str, float]]]:
+        """Retorna estatísticas do codificador por monitor"""
+        return {index: stream.get_encoder_stats() for index, stream in self.streams.items()}
+
+    def close(self):
+        """Libera recursos"""
+        for stream in self.streams.values():
+            stream.close()
+        self.streams.clear()
+        for ring in self.publishers.values():
+            ring.close()
+        self.publishers.clear()
+        if self.encoder:
+            self.encoder.close()
         if self.sct:
             self.sct.close()
 
 
+class FrameResizer:
+    """
+    Redimensionamento de frames com buffers reutilizáveis
+
+    Reduções por fator inteiro (0.5, 0.25, ...) usam média de área (box)
+    vetorizada em NumPy direto sobre o buffer capturado; demais escalas
+    usam bilinear do Pillow. O array retornado é reutilizado na próxima
+    chamada com as mesmas dimensões, então deve ser consumido antes dela.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[tuple, np.ndarray] = {}
+
+    def _get_buffer(self, shape: tuple, dtype) -> np.ndarray:
+        """Retorna buffer pré-alocado para o shape/dtype pedido"""
+        key = (shape, np.dtype(dtype).str)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+    @staticmethod
+    def integer_factor(src_width: int, src_height: int, width: int, height: int) -> int:
+        """
+        Retorna o fator inteiro de redução, ou 0 se a escala não for inteira
+
+        O fator só vale se reproduz exatamente as duas dimensões pedidas
+        (src // fator, o truncamento de int(src * escala)); 0.4 ou uma
+        proporção diferente por eixo vão para o bilinear em vez de um box
+        que recortaria a borda do frame.
+        """
+        if width <= 0 or height <= 0:
+            return 0
+        factor = src_width // width
+        if factor >= 2 and src_width // factor == width and src_height // factor == height:
+            return factor
+        return 0
+
+    def resize(self, frame: np.ndarray, width: int, height: int) -> np.ndarray:
+        """
+        Redimensiona frame para (width, height)
+
+        Args:
+            frame: Frame HxWxC (uint8), pode ser uma view não contígua
+            width: Largura de saída
+            height: Altura de saída
+
+        Returns:
+            np.ndarray: Frame redimensionado
+        """
+        try:
+            src_height, src_width = frame.shape[:2]
+            factor = self.integer_factor(src_width, src_height, width, height)
+
+            if factor:
+                return self._box_downscale(frame, factor, width, height)
+
+            return self._bilinear(frame, width, height)
+
+        except Exception as e:
+            logger.error(f"Erro ao redimensionar: {e}")
+            return frame
+
+    def _box_downscale(self, frame: np.ndarray, factor: int, width: int, height: int) -> np.ndarray:
+        """Média de área k x k, sem cópias intermediárias do frame"""
+        channels = frame.shape[2]
+
+        # uint16 comporta somas de blocos até 15x15
+        area = factor * factor
+        acc_dtype = np.uint16 if area * 255 + area // 2 <= 0xFFFF else np.uint32
+
+        acc = self._get_buffer((height, width, channels), acc_dtype)
+        out = self._get_buffer((height, width, channels), np.uint8)
+
+        # Soma dos k x k deslocamentos: cada fatia [dy::k, dx::k] é uma view do
+        # tamanho da saída, e somas elemento a elemento são bem mais rápidas que
+        # np.sum com eixos sobre a view (bloco, offset) de um frame com stride
+        for dy in range(factor):
+            rows = frame[dy:height * factor:factor]
+            for dx in range(factor):
+                part = rows[:, dx:width * factor:factor]
+                if dy == 0 and dx == 0:
+                    np.copyto(acc, part)
+                else:
+                    np.add(acc, part, out=acc)
+
+        # Arredondamento: (soma + n/2) / n
+        acc += area // 2
+        np.floor_divide(acc, area, out=out, casting="unsafe")
+        return out
+
+    def _bilinear(self, frame: np.ndarray, width: int, height: int) -> np.ndarray:
+        """Escala arbitrária com filtro bilinear (mais barato que LANCZOS)"""
+        if not frame.flags.c_contiguous:
+            contiguous = self._get_buffer(frame.shape, np.uint8)
+            np.copyto(contiguous, frame)
+            frame = contiguous
+        img = Image.fromarray(frame, "RGB")
+        img = img.resize((width, height), Image.Resampling.BILINEAR)
+        return np.asarray(img)
+
+
 class FrameProcessor:
     """
     Processa frames para otimização
     """
 
+    _hash_weights: Dict[int, np.ndarray] = {}
+
     @staticmethod
     def detect_changes(
         frame1: np.ndarray,
@@ -176,6 +1001,275 @@ class FrameProcessor:
             logger.error(f"Erro ao detectar mudanças: {e}")
             return True, 1.0
 
+    @staticmethod
+    def changed_tiles(
+        prev: np.ndarray,
+        frame: np.ndarray,
+        tile_size: int = TILE_SIZE
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Lista os tiles que mudaram entre dois frames de mesmo shape
+
+        Args:
+            prev: Frame anterior
+            frame: Frame atual
+            tile_size: Lado do tile em pixels
+
+        Returns:
+            List[(x, y, width, height)]: Tiles alterados, em ordem de linha
+        """
+        height, width = frame.shape[:2]
+        changed = np.any(prev != frame, axis=2)
+
+        rows = -(-height // tile_size)
+        cols = -(-width // tile_size)
+        if height % tile_size or width % tile_size:
+            padded = np.zeros((rows * tile_size, cols * tile_size), dtype=bool)
+            padded[:height, :width] = changed
+            changed = padded
+
+        grid = changed.reshape(rows, tile_size, cols, tile_size).any(axis=(1, 3))
+        ys, xs = np.nonzero(grid)
+
+        return [
+            (
+                int(x) * tile_size,
+                int(y) * tile_size,
+                min(tile_size, width - int(x) * tile_size),
+                min(tile_size, height - int(y) * tile_size)
+            )
+            for y, x in zip(ys, xs)
+        ]
+
+    @staticmethod
+    def _row_hashes(frame: np.ndarray, strip_width: int) -> np.ndarray:
+        """
+        Hash de cada linha de cada faixa vertical do frame
+
+        As linhas são lidas como palavras de 64 bits e combinadas com pesos
+        aleatórios fixos (soma módulo 2^64), tudo vetorizado.
+
+        Args:
+            frame: Frame RGB contíguo
+            strip_width: Largura da faixa (múltiplo de 8 pixels)
+
+        Returns:
+            np.ndarray: (altura, n_faixas) uint64
+        """
+        height, width = frame.shape[:2]
+        strips = width // strip_width
+        if strips == 0:
+            return np.empty((height, 0), dtype=np.uint64)
+
+        rows = np.ascontiguousarray(frame).reshape(height, width * 3)
+        words = rows[:, :strips * strip_width * 3].view(np.uint64).reshape(height, strips, -1)
+
+        weights = FrameProcessor._hash_weights.get(words.shape[2])
+        if weights is None:
+            rng = np.random.default_rng(0x5C0)
+            weights = rng.integers(1, 2 ** 63, words.shape[2], dtype=np.uint64) | np.uint64(1)
+            FrameProcessor._hash_weights[words.shape[2]] = weights
+
+        return (words * weights).sum(axis=2, dtype=np.uint64)
+
+    @staticmethod
+    def _strip_translation(
+        prev_hashes: np.ndarray,
+        hashes: np.ndarray,
+        min_rows: int
+    ) -> Optional[Tuple[int, int, int]]:
+        """
+        Encontra o deslocamento vertical dominante de uma faixa
+
+        Returns:
+            Tuple[dy, y0, y1]: linhas [y0, y1) do frame atual vieram de
+            [y0 - dy, y1 - dy) do anterior; None se não houver deslocamento
+        """
+        height = hashes.shape[0]
+
+        # Só linhas únicas no frame anterior servem de âncora (ignora linhas em branco)
+        unique, first, counts = np.unique(prev_hashes, return_index=True, return_counts=True)
+        unique, first = unique[counts == 1], first[counts == 1]
+        if unique.size == 0:
+            return None
+
+        idx = np.searchsorted(unique, hashes)
+        idx[idx >= unique.size] = 0
+        matched = unique[idx] == hashes
+        shifts = np.nonzero(matched)[0] - first[idx[matched]]
+        shifts = shifts[shifts != 0]
+        if shifts.size < min_rows:
+            return None
+
+        votes = np.bincount(shifts + height)
+        dy = int(np.argmax(votes)) - height
+        if votes[dy + height] < min_rows:
+            return None
+
+        # Linhas compatíveis com o deslocamento (inclusive repetidas)
+        ys = np.arange(max(0, dy), min(height, height + dy))
+        mask = np.zeros(height, dtype=np.int8)
+        mask[ys] = hashes[ys] == prev_hashes[ys - dy]
+
+        # Maior sequência contínua de linhas compatíveis
+        edges = np.diff(np.concatenate(([0], mask, [0])))
+        starts = np.nonzero(edges == 1)[0]
+        ends = np.nonzero(edges == -1)[0]
+        longest = int(np.argmax(ends - starts))
+        y0, y1 = int(starts[longest]), int(ends[longest])
+
+        if y1 - y0 < min_rows:
+            return None
+        return dy, y0, y1
+
+    @staticmethod
+    def _vertical_moves(
+        prev: np.ndarray,
+        frame: np.ndarray,
+        strip_width: int,
+        min_rows: int
+    ) -> List[CopyRect]:
+        """Detecta deslocamentos verticais por faixa e agrupa faixas vizinhas"""
+        prev_hashes = FrameProcessor._row_hashes(prev, strip_width)
+        hashes = FrameProcessor._row_hashes(frame, strip_width)
+
+        per_strip = [
+            FrameProcessor._strip_translation(prev_hashes[:, i], hashes[:, i], min_rows)
+            for i in range(hashes.shape[1])
+        ]
+
+        moves = []
+        group = None  # [primeira_faixa, última_faixa, dy, y0, y1]
+        for i, found in enumerate(per_strip + [None]):
+            if group and found and found[0] == group[2]:
+                y0, y1 = max(group[3], found[1]), min(group[4], found[2])
+                if y1 - y0 >= min_rows:
+                    group[1], group[3], group[4] = i, y0, y1
+                    continue
+            if group:
+                first_strip, last_strip, dy, y0, y1 = group
+                moves.append(CopyRect(
+                    src_x=first_strip * strip_width,
+                    src_y=y0 - dy,
+                    dst_x=first_strip * strip_width,
+                    dst_y=y0,
+                    width=(last_strip - first_strip + 1) * strip_width,
+                    height=y1 - y0
+                ))
+            group = [i, i, found[0], found[1], found[2]] if found else None
+
+        return moves
+
+    @staticmethod
+    def detect_moves(
+        prev: np.ndarray,
+        frame: np.ndarray,
+        strip_width: int = SCROLL_STRIP_WIDTH,
+        min_rows: int = SCROLL_MIN_ROWS
+    ) -> List[CopyRect]:
+        """
+        Detecta regiões deslocadas (rolagem vertical/horizontal, janela arrastada)
+
+        Compara hashes de linha entre os frames, por faixas de strip_width
+        pixels; faixas vizinhas com o mesmo deslocamento viram um retângulo.
+        Movimento horizontal é buscado sobre os frames transpostos, apenas
+        se não houver movimento vertical.
+
+        Args:
+            prev: Frame anterior (RGB)
+            frame: Frame atual (RGB, mesmo shape)
+            strip_width: Largura das faixas (múltiplo de 8)
+            min_rows: Mínimo de linhas deslocadas para aceitar o movimento
+
+        Returns:
+            List[CopyRect]: Cópias a aplicar sobre o frame anterior
+        """
+        try:
+            moves = FrameProcessor._vertical_moves(prev, frame, strip_width, min_rows)
+            if moves:
+                return moves
+
+            prev_t = np.ascontiguousarray(prev.transpose(1, 0, 2))
+            frame_t = np.ascontiguousarray(frame.transpose(1, 0, 2))
+            return [
+                CopyRect(
+                    src_x=move.src_y,
+                    src_y=move.src_x,
+                    dst_x=move.dst_y,
+                    dst_y=move.dst_x,
+                    width=move.height,
+                    height=move.width
+                )
+                for move in FrameProcessor._vertical_moves(prev_t, frame_t, strip_width, min_rows)
+            ]
+
+        except Exception as e:
+            logger.error(f"Erro ao detectar deslocamentos: {e}")
+            return []
+
+    @staticmethod
+    def apply_copy_rects(buffer: np.ndarray, copy_rects: List[CopyRect]):
+        """
+        Aplica cópias de retângulos no próprio buffer, na ordem dada
+
+        Usado pelo host (para simular o viewer) e pelo viewer.
+        """
+        for rect in copy_rects:
+            source = buffer[
+                rect.src_y:rect.src_y + rect.height,
+                rect.src_x:rect.src_x + rect.width
+            ].copy()  # Origem e destino podem se sobrepor
+            buffer[
+                rect.dst_y:rect.dst_y + rect.height,
+                rect.dst_x:rect.dst_x + rect.width
+            ] = source
+
+    @staticmethod
+    def classify_content(frame: np.ndarray) -> str:
+        """
+        Classifica o conteúdo do frame para escolha do codificador
+
+        Usa uma amostra em grade: poucas cores distintas ou baixa entropia
+        de luminância indicam conteúdo sintético (texto, UI plana).
+
+        Args:
+            frame: Frame em RGB
+
+        Returns:
+            str: "synthetic" ou "photographic"
+        """
+        try:
+            # Tiles pequenos são analisados por inteiro
+            step = ADAPTIVE_SAMPLE_STEP if frame.shape[0] * frame.shape[1] >= 256 * 256 else 1
+            sample = frame[::step, ::step]
+
+            # Contagem de cores: empacota RGB em um inteiro de 24 bits
+            packed = (
+                (sample[..., 0].astype(np.uint32) << 16) |
+                (sample[..., 1].astype(np.uint32) << 8) |
+                sample[..., 2]
+            )
+            if np.unique(packed).size <= ADAPTIVE_MAX_COLORS:
+                return "synthetic"
+
+            # Entropia do histograma de luminância (aproximação inteira de Rec. 601)
+            luma = (
+                sample[..., 0].astype(np.uint16) * 77 +
+                sample[..., 1].astype(np.uint16) * 150 +
+                sample[..., 2].astype(np.uint16) * 29
+            ) >> 8
+            hist = np.bincount(luma.ravel(), minlength=256)
+            p = hist[hist > 0] / luma.size
+            entropy = float(-np.sum(p * np.log2(p)))
+
+            if entropy < ADAPTIVE_ENTROPY_THRESHOLD:
+                return "synthetic"
+            return "photographic"
+
+        except Exception as e:
+            logger.error(f"Erro ao classificar conteúdo: {e}")
+            return "photographic"
+
     @staticmethod
     def apply_compression_hints(frame: np.ndarray) -> np.ndarray:
         """
@@ -211,8 +1305,9 @@ if __name__ == "__main__":
         result = cap.capture_frame()
         if result:
             jpeg_data, (w, h) = result
-            print(f"Frame {i+1}: {len(jpeg_data)} bytes ({w}x{h})")
+            print(f"Frame {i+1}: {len(jpeg_data)} bytes {cap.last_format} ({w}x{h})")
         else:
             time.sleep(0.1)
 
+    print(f"Estatísticas do codificador: {cap.get_encoder_stats()}")
     cap.close()
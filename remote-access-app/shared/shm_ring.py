@@ -0,0 +1,432 @@
+"""
+Anel de frames em memória compartilhada
+Publica os frames RGB capturados para consumidores na mesma máquina
+(gravador, monitoramento) sem passar pela rede nem copiar no leitor: o
+leitor recebe uma view NumPy direto no segmento compartilhado
+"""
+
+import time
+import select
+import socket
+import struct
+import logging
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass
+from multiprocessing import shared_memory, resource_tracker
+from typing import List, Optional, Union
+
+import numpy as np
+
+from config.settings import SHM_RING_SLOTS, SHM_RING_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAFR"
+VERSION = 1
+
+# Cabeçalho do anel: magic, versão, slots, capacidade de cada slot, último seq publicado
+RING_HEADER = struct.Struct("<4sHHQQ")
+RING_HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 16
+
+# Cabeçalho de cada slot: carimbo, bytes, largura, altura, canais, monitor, instante
+# O carimbo vale seq*2+1 enquanto o slot é escrito e seq*2 quando está pronto
+SLOT_HEADER = struct.Struct("<QQIIIId")
+SLOT_HEADER_SIZE = 64
+
+STAMP = struct.Struct("<Q")
+
+# Socket de notificação sem suporte a AF_UNIX (Windows): leitores consultam periodicamente
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+# Segmentos criados por este processo (o tracker deles é o do publicador)
+_published = set()
+
+
+def notify_path(name: str) -> Path:
+    """Socket Unix por onde o publicador avisa os leitores de um anel"""
+    return Path(tempfile.gettempdir()) / f"{name}.sock"
+
+
+def _slot_offset(index: int, slot_size: int) -> int:
+    return RING_HEADER_SIZE + index * (SLOT_HEADER_SIZE + slot_size)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Abre um segmento existente sem registrá-lo no resource_tracker do leitor"""
+    shm = shared_memory.SharedMemory(name=name)
+    # Antes do Python 3.13 o tracker apagaria o segmento quando o leitor saísse
+    if name not in _published:
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+@dataclass
+class RingFrame:
+    """Frame lido do anel (data é uma view no segmento compartilhado)"""
+    seq: int
+    monitor: int
+    width: int
+    height: int
+    channels: int
+    timestamp: float  # time.monotonic() da captura
+    data: np.ndarray  # (altura, largura, canais), ou 1-D se publicado como bytes
+    slot: int
+
+
+class FrameRing:
+    """
+    Publicador do anel (um por monitor, no processo do host)
+
+    Slots de tamanho fixo em um segmento multiprocessing.shared_memory,
+    escritos em ordem circular: o publicador nunca espera por leitores
+    lentos, o slot mais antigo é sobrescrito. Cada leitor conectado ao
+    socket de notificação recebe um byte por frame publicado (como num
+    pipe); um eventfd não serviria a processos sem parentesco.
+    """
+
+    def __init__(self, name: str, slot_size: int, slots: int = SHM_RING_SLOTS, notify: bool = True):
+        """
+        Cria o segmento compartilhado
+
+        Args:
+            name (str): Nome do segmento (os leitores abrem pelo mesmo nome)
+            slot_size (int): Bytes máximos de um frame (ex: largura * altura * 3)
+            slots (int): Frames guardados antes de sobrescrever o mais antigo
+            notify (bool): Abre o socket de notificação dos leitores
+        """
+        self.name = name
+        self.slot_size = slot_size
+        self.slots = max(2, slots)
+        self.seq = 0
+        self.dropped_oversize = 0
+        size = _slot_offset(self.slots, slot_size)
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Sobra de um host que terminou sem limpar
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        _published.add(name)
+        self.buf = self.shm.buf
+        RING_HEADER.pack_into(self.buf, 0, MAGIC, VERSION, self.slots, slot_size, 0)
+        for index in range(self.slots):
+            STAMP.pack_into(self.buf, _slot_offset(index, slot_size), 0)
+
+        self.listener: Optional[socket.socket] = None
+        self.subscribers: List[socket.socket] = []
+        if notify and HAS_UNIX_SOCKETS:
+            self._open_listener()
+
+        logger.info(
+            f"Anel '{name}' criado: {self.slots} slots de {slot_size / 1024 / 1024:.1f} MB"
+        )
+
+    def _open_listener(self):
+        path = notify_path(self.name)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.listener.bind(str(path))
+            self.listener.listen()
+            self.listener.setblocking(False)
+        except OSError as e:
+            logger.warning(f"Anel '{self.name}' sem notificação (leitores vão consultar): {e}")
+            self.listener = None
+
+    def _accept_subscribers(self):
+        """Aceita leitores que conectaram desde o último frame"""
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            self.subscribers.append(conn)
+            logger.info(f"Anel '{self.name}': leitor conectado ({len(self.subscribers)} no total)")
+
+    def _notify(self):
+        self._accept_subscribers()
+        for conn in list(self.subscribers):
+            try:
+                conn.send(b"\x01")
+            except BlockingIOError:
+                pass  # Leitor já tem avisos pendentes; ele lê o seq mais recente do cabeçalho
+            except OSError:
+                self.subscribers.remove(conn)
+                conn.close()
+
+    def publish(self, frame: Union[np.ndarray, bytes, memoryview], monitor: int = 0,
+                timestamp: float = None) -> Optional[int]:
+        """
+        Copia um frame para o próximo slot
+
+        Args:
+            frame: Array uint8 (altura, largura, canais) ou bytes
+            monitor (int): Índice do monitor de origem
+            timestamp (float): Instante da captura (padrão: time.monotonic())
+
+        Returns:
+            int: Seq publicado
+            None: Frame maior que o slot (descartado)
+        """
+        if isinstance(frame, np.ndarray):
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            length = frame.nbytes
+        else:
+            frame = memoryview(frame).cast("B")
+            width, height, channels = len(frame), 1, 1
+            length = len(frame)
+
+        if length > self.slot_size:
+            self.dropped_oversize += 1
+            if self.dropped_oversize == 1:
+                logger.warning(f"Anel '{self.name}': frame de {length} bytes não cabe no slot ({self.slot_size})")
+            return None
+
+        seq = self.seq + 1
+        offset = _slot_offset((seq - 1) % self.slots, self.slot_size)
+        data_offset = offset + SLOT_HEADER_SIZE
+
+        # Carimbo ímpar junto com os metadados; o par só depois dos pixels
+        SLOT_HEADER.pack_into(
+            self.buf, offset, seq * 2 + 1, length, width, height, channels, monitor,
+            timestamp if timestamp is not None else time.monotonic()
+        )
+        if isinstance(frame, np.ndarray):
+            # copyto aceita views não contíguas (ex: frame redimensionado)
+            target = np.frombuffer(self.buf, np.uint8, count=length, offset=data_offset)
+            np.copyto(target.reshape(frame.shape), frame)
+            del target
+        else:
+            self.buf[data_offset:data_offset + length] = frame
+        STAMP.pack_into(self.buf, offset, seq * 2)
+        STAMP.pack_into(self.buf, WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+
+        if self.listener:
+            self._notify()
+        return seq
+
+    def close(self):
+        """Fecha os leitores, o socket e remove o segmento"""
+        for conn in self.subscribers:
+            conn.close()
+        self.subscribers.clear()
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+            try:
+                notify_path(self.name).unlink()
+            except FileNotFoundError:
+                pass
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        _published.discard(self.name)
+
+
+class RingReader:
+    """
+    Leitor de um anel (em qualquer processo da máquina)
+
+    Os frames devolvidos apontam para o slot, sem cópia: o publicador pode
+    sobrescrevê-lo a qualquer momento, então depois de consumir um frame
+    o leitor confere still_valid() (e descarta o resultado se falhar) ou
+    copia o que quiser guardar.
+    """
+
+    def __init__(self, name: str, notify: bool = True):
+        """
+        Abre um anel existente
+
+        Args:
+            name (str): Nome do segmento (ver FrameRing)
+            notify (bool): Conecta ao socket de notificação (sem ele, wait() consulta)
+        """
+        self.name = name
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        magic, version, self.slots, self.slot_size, _ = RING_HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"segmento '{name}' não é um anel de frames v{VERSION}")
+
+        self.next_seq = 0  # 0 = começa no frame mais recente
+        self.frames = 0
+        self.dropped = 0
+
+        self.notifier: Optional[socket.socket] = None
+        if notify and HAS_UNIX_SOCKETS:
+            try:
+                self.notifier = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.notifier.connect(str(notify_path(name)))
+                self.notifier.setblocking(False)
+            except OSError as e:
+                logger.warning(f"Anel '{name}' sem notificação, consultando: {e}")
+                self.notifier.close()
+                self.notifier = None
+
+    def fileno(self) -> int:
+        """Descritor que fica legível a cada frame publicado (para select/loop.add_reader)"""
+        return self.notifier.fileno() if self.notifier else -1
+
+    @property
+    def head(self) -> int:
+        """Seq do último frame publicado"""
+        return STAMP.unpack_from(self.buf, WRITE_SEQ_OFFSET)[0]
+
+    def _read_slot(self, seq: int) -> Optional[RingFrame]:
+        """Frame seq, se o slot ainda o contém (None se foi ou está sendo sobrescrito)"""
+        index = (seq - 1) % self.slots
+        offset = _slot_offset(index, self.slot_size)
+        stamp, length, width, height, channels, monitor, timestamp = SLOT_HEADER.unpack_from(self.buf, offset)
+        if stamp != seq * 2:
+            return None
+
+        data = np.frombuffer(self.buf, np.uint8, count=length, offset=offset + SLOT_HEADER_SIZE)
+        if length == width * height * channels and height > 1:
+            data = data.reshape((height, width, channels))
+        frame = RingFrame(seq, monitor, width, height, channels, timestamp, data, index)
+
+        # Cabeçalho lido no meio de uma escrita
+        if not self.still_valid(frame):
+            return None
+        return frame
+
+    def still_valid(self, frame: RingFrame) -> bool:
+        """True se o slot do frame não foi sobrescrito desde a leitura"""
+        return STAMP.unpack_from(self.buf, _slot_offset(frame.slot, self.slot_size))[0] == frame.seq * 2
+
+    def read_next(self) -> Optional[RingFrame]:
+        """
+        Próximo frame em ordem (gravação); frames sobrescritos são pulados
+
+        Returns:
+            RingFrame: Frame seguinte ao último lido
+            None: Nenhum frame novo
+        """
+        while True:
+            head = self.head
+            if head == 0:
+                return None
+            if self.next_seq == 0:
+                self.next_seq = head
+            if self.next_seq > head:
+                return None
+
+            oldest = max(1, head - self.slots + 1)
+            if self.next_seq < oldest:
+                self.dropped += oldest - self.next_seq
+                self.next_seq = oldest
+
+            frame = self._read_slot(self.next_seq)
+            self.next_seq += 1
+            if frame is not None:
+                self.frames += 1
+                return frame
+            self.dropped += 1
+
+    def read_latest(self) -> Optional[RingFrame]:
+        """
+        Frame mais recente (monitoramento), descartando os intermediários
+
+        Returns:
+            RingFrame: Último frame publicado, se ainda não lido
+            None: Nenhum frame novo
+        """
+        head = self.head
+        if head and self.next_seq and head > self.next_seq:
+            self.dropped += head - self.next_seq
+            self.next_seq = head
+        return self.read_next()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Espera um frame novo
+
+        Args:
+            timeout (float): Segundos (None = sem limite)
+
+        Returns:
+            bool: True se há frame novo para ler
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not (self.head and self.head >= max(self.next_seq, 1)):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if self.notifier:
+                ready, _, _ = select.select([self.notifier], [], [], remaining)
+                if ready:
+                    self.drain_notifications()
+            else:
+                time.sleep(SHM_RING_POLL_INTERVAL if remaining is None else min(remaining, SHM_RING_POLL_INTERVAL))
+        return True
+
+    def drain_notifications(self):
+        """Consome os avisos pendentes do socket (o estado real está no cabeçalho)"""
+        if not self.notifier:
+            return
+        try:
+            while self.notifier.recv(4096):
+                pass
+            # EOF: o publicador fechou; os próximos wait() passam a consultar
+            self.notifier.close()
+            self.notifier = None
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def get_stats(self) -> dict:
+        """Frames lidos e perdidos por sobrescrita"""
+        return {"head": self.head, "frames": self.frames, "dropped": self.dropped}
+
+    def close(self):
+        """Solta o segmento (views de frames ainda em uso impedem o fechamento)"""
+        if self.notifier:
+            self.notifier.close()
+            self.notifier = None
+        self.buf = None
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning(f"Anel '{self.name}': frames ainda referenciados, segmento fica aberto até serem liberados")
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    ring = FrameRing("remote-access-demo", slot_size=320 * 240 * 3, slots=4)
+    reader = RingReader("remote-access-demo")
+    reader.next_seq = 1  # Lê desde o primeiro frame
+
+    for value in range(6):
+        ring.publish(np.full((240, 320, 3), value * 40, dtype=np.uint8), monitor=1)
+
+    while reader.wait(timeout=0.1):
+        frame = reader.read_next()
+        if frame is None:
+            break
+        mean = float(frame.data.mean())
+        print(f"Frame {frame.seq}: {frame.width}x{frame.height} média {mean:.0f} válido={reader.still_valid(frame)}")
+        del frame
+
+    print(f"Estatísticas do leitor: {reader.get_stats()}")
+    reader.close()
+    ring.close()
@@ -0,0 +1,161 @@
+"""
+Compressão do stream de mensagens
+Mantém um contexto de compressão persistente por conexão, aproveitando a
+redundância entre mensagens consecutivas (JSON de controle e input)
+"""
+
+import zlib
+import logging
+from typing import Dict, List, Optional
+
+from config.settings import (
+    STREAM_COMPRESSION_ENABLED, STREAM_COMPRESSION_METHODS,
+    STREAM_COMPRESSION_LEVEL, STREAM_COMPRESSION_MIN_SIZE,
+    STREAM_COMPRESSIBLE_TYPES
+)
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional, zlib sempre disponível
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+def available_methods() -> List[str]:
+    """Retorna métodos de compressão suportados localmente, em ordem de preferência"""
+    if not STREAM_COMPRESSION_ENABLED:
+        return []
+
+    methods = []
+    for method in STREAM_COMPRESSION_METHODS:
+        if method == "zstd" and zstandard is None:
+            continue
+        if method in ("zstd", "zlib"):
+            methods.append(method)
+    return methods
+
+
+def negotiate_method(offered: Optional[List[str]]) -> Optional[str]:
+    """
+    Escolhe o método de compressão a partir da lista oferecida pelo cliente
+
+    Args:
+        offered: Métodos oferecidos na requisição de autenticação
+
+    Returns:
+        str: Método escolhido, ou None se não houver método em comum
+    """
+    if not offered:
+        return None
+
+    for method in available_methods():
+        if method in offered:
+            return method
+    return None
+
+
+class StreamCompressor:
+    """
+    Contexto de compressão de uma conexão
+
+    Cada lado mantém um compressor (envio) e um descompressor (recepção).
+    Os contextos são persistentes: cada mensagem é finalizada com sync flush,
+    então pode ser descomprimida imediatamente sem perder o dicionário.
+    """
+
+    def __init__(
+        self,
+        method: str = "zlib",
+        level: int = STREAM_COMPRESSION_LEVEL,
+        compressible_types: List[str] = None
+    ):
+        """
+        Inicializa o contexto de compressão
+
+        Args:
+            method (str): "zlib" ou "zstd"
+            level (int): Nível de compressão
+            compressible_types (List[str]): Tipos de mensagem a comprimir
+        """
+        self.method = method
+        self.level = level
+        self.compressible_types = set(
+            compressible_types if compressible_types is not None
+            else STREAM_COMPRESSIBLE_TYPES
+        )
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+        if method == "zstd":
+            if zstandard is None:
+                raise ValueError("zstandard não está instalado")
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        elif method == "zlib":
+            # Deflate bruto (wbits negativo): sem header/checksum por mensagem
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            self._decompressor = zlib.decompressobj(-15)
+        else:
+            raise ValueError(f"Método de compressão desconhecido: {method}")
+
+    def should_compress(self, msg_type: str, size: int) -> bool:
+        """Verifica se uma mensagem deve passar pelo contexto de compressão"""
+        return (
+            msg_type in self.compressible_types and
+            size >= STREAM_COMPRESSION_MIN_SIZE
+        )
+
+    def compress(self, payload: bytes) -> bytes:
+        """Comprime um payload mantendo o contexto para as próximas mensagens"""
+        if self.method == "zstd":
+            return (
+                self._compressor.compress(payload) +
+                self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            )
+        return self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def decompress(self, payload: bytes) -> bytes:
+        """Descomprime um payload recebido (na mesma ordem em que foi enviado)"""
+        return self._decompressor.decompress(payload)
+
+    def record(self, direction: str, msg_type: str, raw_size: int, wire_size: int):
+        """
+        Registra bytes de uma mensagem
+
+        Args:
+            direction: "sent" ou "received"
+            msg_type: Tipo da mensagem
+            raw_size: Tamanho do JSON sem compressão
+            wire_size: Tamanho efetivo na rede (incluindo header)
+        """
+        key = f"{direction}:{msg_type}"
+        entry = self.stats.setdefault(key, {"count": 0, "raw_bytes": 0, "wire_bytes": 0})
+        entry["count"] += 1
+        entry["raw_bytes"] += raw_size
+        entry["wire_bytes"] += wire_size
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Retorna bytes por tipo de mensagem e taxa de compressão"""
+        result = {}
+        for key, entry in self.stats.items():
+            ratio = entry["wire_bytes"] / entry["raw_bytes"] if entry["raw_bytes"] else 1.0
+            result[key] = dict(entry, ratio=round(ratio, 3))
+        return result
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    import json
+    logging.basicConfig(level=logging.INFO)
+
+    sender = StreamCompressor("zlib")
+    receiver = StreamCompressor("zlib")
+
+    for i in range(5):
+        payload = json.dumps({
+            "type": "mouse_evt",
+            "data": {"x": 100 + i, "y": 200, "button": "move", "action": None}
+        }).encode()
+        wire = sender.compress(payload)
+        assert receiver.decompress(wire) == payload
+        print(f"Mensagem {i+1}: {len(payload)} -> {len(wire)} bytes")
@@ -0,0 +1,175 @@
+"""
+Cache de tiles endereçado por conteúdo
+O host guarda o hash dos tiles já enviados e o viewer guarda os tiles em
+slots numerados; tiles repetidos (barras de ferramentas, troca de abas,
+diálogos) viajam como referência ao slot em vez de pixels recodificados
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config.settings import TILE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def tile_key(pixels: np.ndarray) -> bytes:
+    """
+    Calcula a chave de conteúdo de um tile
+
+    Args:
+        pixels: Pixels RGB do tile (pode ser uma view não contígua do frame)
+
+    Returns:
+        bytes: Hash de 128 bits (dimensões + pixels)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(pixels.shape, dtype=np.uint32).tobytes())
+    digest.update(np.ascontiguousarray(pixels).data)
+    return digest.digest()
+
+
+class TileCache:
+    """
+    Lado do host: LRU de chaves de conteúdo -> slot
+
+    O host decide em qual slot cada tile novo é guardado (reaproveitando o
+    slot do tile menos usado quando cheio) e informa o slot na mensagem;
+    o viewer apenas sobrescreve o slot indicado. Assim o despejo é ditado
+    pelo host e os dois caches nunca divergem enquanto o stream não perde
+    frames (perdas levam a um keyframe com reset do cache).
+    """
+
+    def __init__(self, capacity: int = TILE_CACHE_SIZE):
+        """
+        Inicializa o cache
+
+        Args:
+            capacity (int): Número de slots (0 desativa o cache)
+        """
+        self.capacity = capacity
+        self.entries: "OrderedDict[bytes, Tuple[int, int]]" = OrderedDict()  # chave -> (slot, bytes)
+        self.stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0, "resets": 0}
+
+    def lookup(self, key: bytes) -> Optional[int]:
+        """
+        Procura um tile já enviado
+
+        Args:
+            key: Chave retornada por tile_key()
+
+        Returns:
+            int: Slot do tile no cache do viewer
+            None: Tile ainda não enviado (deve ser codificado e guardado com store())
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        slot, size = entry
+        self.stats["hits"] += 1
+        self.stats["bytes_saved"] += size
+        return slot
+
+    def store(self, key: bytes, size: int) -> Optional[int]:
+        """
+        Reserva um slot para um tile recém-codificado
+
+        Args:
+            key: Chave do tile
+            size: Tamanho do tile codificado (para bytes economizados)
+
+        Returns:
+            int: Slot onde o viewer deve guardar o tile
+            None: Cache desativado
+        """
+        if self.capacity <= 0:
+            return None
+
+        if len(self.entries) < self.capacity:
+            slot = len(self.entries)
+        else:
+            # Cheio: reaproveita o slot do menos usado recentemente
+            _, (slot, _) = self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+        self.entries[key] = (slot, size)
+        return slot
+
+    def reset(self):
+        """Esvazia o cache (o viewer faz o mesmo ao receber keyframe com cache_reset)"""
+        if self.entries:
+            self.stats["resets"] += 1
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Retorna acertos, taxa de acerto e bytes economizados"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            entries=len(self.entries),
+            hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+        )
+
+
+class TileCacheMirror:
+    """
+    Lado do viewer: slots com os tiles codificados recebidos
+
+    Guarda o tile como chegou ({"compression", "image"}), então resolver
+    uma referência não exige recodificação.
+    """
+
+    def __init__(self):
+        self.slots: Dict[int, Dict] = {}
+
+    def store(self, slot: int, tile: Dict):
+        """Guarda (ou substitui) o tile de um slot"""
+        self.slots[slot] = {"compression": tile["compression"], "image": tile["image"]}
+
+    def resolve(self, tile: Dict) -> Optional[Dict]:
+        """
+        Substitui uma referência ao cache pelo tile guardado
+
+        Args:
+            tile: Tile da mensagem com compression == "cache"
+
+        Returns:
+            Dict: Tile completo (posição da referência + imagem do slot)
+            None: Slot desconhecido (cache divergente; pedir keyframe)
+        """
+        cached = self.slots.get(tile.get("slot"))
+        if cached is None:
+            return None
+        return dict(tile, **cached)
+
+    def reset(self):
+        """Esvazia todos os slots"""
+        self.slots.clear()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    host_cache = TileCache(capacity=2)
+    viewer_cache = TileCacheMirror()
+
+    tiles = [np.full((64, 64, 3), value, dtype=np.uint8) for value in (10, 20, 10, 30, 20)]
+    for i, pixels in enumerate(tiles):
+        key = tile_key(pixels)
+        slot = host_cache.lookup(key)
+        if slot is None:
+            slot = host_cache.store(key, 500)
+            viewer_cache.store(slot, {"compression": "png", "image": f"tile-{i}"})
+            print(f"Tile {i}: enviado no slot {slot}")
+        else:
+            print(f"Tile {i}: referência ao slot {slot} -> {viewer_cache.resolve({'slot': slot})}")
+
+    print(f"Estatísticas: {host_cache.get_stats()}")
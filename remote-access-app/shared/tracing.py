@@ -0,0 +1,217 @@
+"""
+Rastreamento de latência de frames
+Cada frame carrega carimbos monotônicos por estágio (em microssegundos, na
+base de tempo do broker); o viewer converte em latências por estágio e
+exporta histogramas para descobrir se o gargalo é captura, codificação,
+rede ou broker
+"""
+
+import json
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config.settings import (
+    TRACE_SAMPLE_WINDOW, TRACE_HISTOGRAM_BUCKETS_MS, CLOCK_SYNC_SAMPLES
+)
+
+logger = logging.getLogger(__name__)
+
+# Estágios na ordem em que acontecem (chaves do campo "ts" de screen_cap)
+TRACE_STAGES = ["grab", "enc", "sent", "brx", "bfw", "vrx", "dec"]
+
+# Intervalos medidos: nome -> (estágio inicial, estágio final)
+TRACE_INTERVALS = {
+    "capture_to_encode": ("grab", "enc"),
+    "encode_to_send": ("enc", "sent"),
+    "network_up": ("sent", "brx"),
+    "broker": ("brx", "bfw"),
+    "network_down": ("bfw", "vrx"),
+    "decode": ("vrx", "dec"),
+    "total": ("grab", "dec")
+}
+
+
+def now_us() -> int:
+    """Relógio monotônico local em microssegundos"""
+    return time.monotonic_ns() // 1000
+
+
+def to_us(seconds: float) -> int:
+    """Converte um instante de time.monotonic() para microssegundos"""
+    return int(seconds * 1_000_000)
+
+
+class ClockSync:
+    """
+    Estima o offset do relógio monotônico local para o do broker
+
+    Cada pong devolve o instante local do ping e o instante do broker ao
+    respondê-lo. Assumindo ida e volta simétricas, offset = servidor -
+    (envio + recepção) / 2; entre as últimas amostras vale a de menor RTT,
+    que é a menos afetada por filas.
+    """
+
+    def __init__(self, samples: int = CLOCK_SYNC_SAMPLES):
+        self.samples: Deque[Tuple[int, int]] = deque(maxlen=samples)  # (rtt, offset)
+        self.offset = 0
+        self.rtt: Optional[int] = None
+
+    @property
+    def synced(self) -> bool:
+        """True após a primeira amostra"""
+        return self.rtt is not None
+
+    def update(self, sent_us: int, server_us: int, received_us: int):
+        """
+        Registra uma amostra de ping/pong
+
+        Args:
+            sent_us: Instante local do envio do ping
+            server_us: Instante do broker ao responder
+            received_us: Instante local da recepção do pong
+        """
+        rtt = received_us - sent_us
+        if rtt < 0:
+            return
+        self.samples.append((rtt, server_us - (sent_us + received_us) // 2))
+        self.rtt, self.offset = min(self.samples)
+
+    def to_reference(self, local_us: int) -> int:
+        """Converte um instante local para a base de tempo do broker"""
+        return local_us + self.offset
+
+
+class FrameTracer:
+    """
+    Acumula latências por estágio e exporta histogramas/percentis
+    """
+
+    def __init__(
+        self,
+        window: int = TRACE_SAMPLE_WINDOW,
+        buckets_ms: List[float] = None
+    ):
+        """
+        Inicializa o rastreador
+
+        Args:
+            window (int): Amostras mantidas por intervalo para os percentis
+            buckets_ms (List[float]): Limites superiores dos buckets do histograma
+        """
+        self.buckets_ms = list(buckets_ms or TRACE_HISTOGRAM_BUCKETS_MS)
+        self.frames = 0
+        self.samples: Dict[str, Deque[float]] = {
+            name: deque(maxlen=window) for name in TRACE_INTERVALS
+        }
+        self.histograms: Dict[str, List[int]] = {
+            name: [0] * (len(self.buckets_ms) + 1) for name in TRACE_INTERVALS
+        }
+
+    def record(self, stamps: Dict[str, int]):
+        """
+        Registra os carimbos de um frame
+
+        Args:
+            stamps: Estágio -> instante em µs (mesma base de tempo); estágios
+                ausentes só descartam os intervalos que dependem deles
+        """
+        self.frames += 1
+        for name, (start, end) in TRACE_INTERVALS.items():
+            if start not in stamps or end not in stamps:
+                continue
+
+            elapsed_ms = (stamps[end] - stamps[start]) / 1000
+            self.samples[name].append(elapsed_ms)
+
+            bucket = len(self.buckets_ms)
+            for index, limit in enumerate(self.buckets_ms):
+                if elapsed_ms <= limit:
+                    bucket = index
+                    break
+            self.histograms[name][bucket] += 1
+
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> float:
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Retorna estatísticas por intervalo
+
+        Returns:
+            Dict: intervalo -> {"count", "mean_ms", "p50_ms", "p95_ms",
+            "p99_ms", "max_ms", "histogram": {"<=Nms": contagem, ...}}
+        """
+        labels = [f"<={limit}ms" for limit in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        result = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            values = sorted(samples)
+            result[name] = {
+                "count": sum(self.histograms[name]),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(self._percentile(values, 0.50), 3),
+                "p95_ms": round(self._percentile(values, 0.95), 3),
+                "p99_ms": round(self._percentile(values, 0.99), 3),
+                "max_ms": round(values[-1], 3),
+                "histogram": dict(zip(labels, self.histograms[name]))
+            }
+        return result
+
+    def export(self, path: Path, clock: Optional[ClockSync] = None) -> bool:
+        """
+        Grava o resumo em JSON
+
+        Args:
+            path: Arquivo de saída
+            clock: Sincronização usada (offset/RTT incluídos no arquivo)
+
+        Returns:
+            bool: True se gravou
+        """
+        try:
+            report = {
+                "frames": self.frames,
+                "intervals": self.summary()
+            }
+            if clock:
+                report["clock"] = {"offset_us": clock.offset, "rtt_us": clock.rtt}
+
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return True
+
+        except Exception as e:
+            logger.error(f"Erro ao exportar rastreamento: {e}")
+            return False
+
+    def format_table(self) -> str:
+        """Resumo legível (uma linha por intervalo)"""
+        lines = [f"{'intervalo':<18} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8}"]
+        for name, stats in self.summary().items():
+            lines.append(
+                f"{name:<18} {stats['count']:>6} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}"
+            )
+        return "\n".join(lines)
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    import random
+    logging.basicConfig(level=logging.INFO)
+
+    tracer = FrameTracer()
+    for _ in range(200):
+        t = 0
+        stamps = {}
+        for stage, cost in zip(TRACE_STAGES, (0, 12, 2, 8, 1, 8, 4)):
+            t += int(random.expovariate(1 / max(cost, 0.1)) * 1000)
+            stamps[stage] = t
+        tracer.record(stamps)
+
+    print(tracer.format_table())
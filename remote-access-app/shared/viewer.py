@@ -0,0 +1,305 @@
+"""
+Motor de exibição do viewer
+Mantém um framebuffer NumPy persistente por monitor, decodifica keyframes
+e tiles em um pool de threads e aplica copy-rects e tiles no próprio buffer;
+o callback de renderização só é chamado com o frame completo
+"""
+
+import io
+import time
+import base64
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from config.settings import VIEWER_DECODE_WORKERS, VIEWER_MAX_PENDING, VIEWER_STATS_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Formato declarado na mensagem -> decodificador do PIL (evita a detecção por conteúdo)
+PIL_FORMATS = {"jpeg": ["JPEG"], "png": ["PNG"]}
+
+
+def decode_into(target: np.ndarray, image: str, compression: str):
+    """
+    Decodifica uma imagem em base64 direto numa área do framebuffer
+
+    Roda nos threads do pool; áreas de tiles diferentes não se sobrepõem,
+    então os workers escrevem no mesmo buffer sem trava.
+
+    Args:
+        target: View (h, w, 3) do framebuffer onde a imagem é escrita
+        image: Dados da imagem em base64 (campo "image" da mensagem)
+        compression: "jpeg" ou "png"
+    """
+    formats = PIL_FORMATS.get(compression)
+    if formats is None:
+        raise ValueError(f"compressão não suportada: {compression}")
+
+    with Image.open(io.BytesIO(base64.b64decode(image)), formats=formats) as img:
+        if img.size != (target.shape[1], target.shape[0]):
+            raise ValueError(
+                f"imagem {img.size[0]}x{img.size[1]} não cabe na área "
+                f"{target.shape[1]}x{target.shape[0]}"
+            )
+        if img.mode != "RGB":
+            img = img.convert("RGB")  # PNG com paleta
+        target[...] = np.asarray(img)
+
+
+def apply_copy_rects(buffer: np.ndarray, copy_rects: List[Dict[str, int]]):
+    """Aplica os copy-rects de uma mensagem no próprio buffer, na ordem dada"""
+    for rect in copy_rects:
+        w, h = rect["w"], rect["h"]
+        source = buffer[rect["src_y"]:rect["src_y"] + h, rect["src_x"]:rect["src_x"] + w].copy()
+        buffer[rect["dst_y"]:rect["dst_y"] + h, rect["dst_x"]:rect["dst_x"] + w] = source
+
+
+def _decode_tiles(buffer: np.ndarray, tiles: List[Dict]):
+    """Worker: decodifica um lote de tiles no framebuffer"""
+    for tile in tiles:
+        x, y = tile["x"], tile["y"]
+        decode_into(buffer[y:y + tile["h"], x:x + tile["w"]], tile["image"], tile["compression"])
+
+
+class ViewerEngine:
+    """
+    Decodificação e composição dos frames recebidos
+
+    Frames de um mesmo monitor são aplicados em ordem (cada um espera o
+    anterior); monitores diferentes decodificam em paralelo. Sem callback de
+    renderização (modo headless) o motor só decodifica e mede FPS e latência.
+    """
+
+    def __init__(
+        self,
+        workers: int = VIEWER_DECODE_WORKERS,
+        on_frame: Optional[Callable] = None,
+        on_error: Optional[Callable] = None,
+        max_pending: int = VIEWER_MAX_PENDING,
+        window: int = VIEWER_STATS_WINDOW
+    ):
+        """
+        Inicializa o motor
+
+        Args:
+            workers (int): Threads de decodificação
+            on_frame: Renderização, chamada com (monitor, framebuffer, dados da
+                mensagem) quando o frame está completo (None = headless)
+            on_error: Chamado com (monitor, motivo) quando um frame não pôde
+                ser aplicado; o framebuffer fica inválido até o próximo keyframe
+            max_pending (int): Frames por monitor em decodificação antes de
+                submit() esperar (contrapressão para a leitura da rede)
+            window (int): Frames usados no FPS e nos percentis
+        """
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="viewer-decode")
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.max_pending = max(1, max_pending)
+
+        self.framebuffers: Dict[int, np.ndarray] = {}
+        self.pending: Dict[int, Deque[asyncio.Task]] = {}
+        self.frames = 0
+        self.errors = 0
+        self.reallocations = 0
+        self.completed_at: Deque[float] = deque(maxlen=window)
+        self.decode_ms: Deque[float] = deque(maxlen=window)
+        self.latency_ms: Deque[float] = deque(maxlen=window)
+
+    @property
+    def headless(self) -> bool:
+        """True quando não há renderização (só decodificação e métricas)"""
+        return self.on_frame is None
+
+    def _framebuffer(self, monitor: int, width: int, height: int) -> np.ndarray:
+        """Framebuffer do monitor, realocado só quando a resolução muda"""
+        buffer = self.framebuffers.get(monitor)
+        if buffer is None or buffer.shape[:2] != (height, width):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self.framebuffers[monitor] = buffer
+            self.reallocations += 1
+            logger.info(f"Framebuffer do monitor {monitor}: {width}x{height}")
+        return buffer
+
+    async def submit(self, data: Dict, received: float = None) -> asyncio.Task:
+        """
+        Enfileira um frame (campos "data" de screen_cap, tiles já resolvidos)
+
+        Retorna assim que o frame entra na fila do monitor; só espera quando
+        o monitor já tem max_pending frames em decodificação.
+
+        Args:
+            data: Dados da mensagem screen_cap
+            received: Instante de recepção (time.perf_counter()) para a latência
+
+        Returns:
+            asyncio.Task: Aplicação do frame (concluída após a renderização)
+        """
+        monitor = data.get("monitor", 1)
+        pending = self.pending.setdefault(monitor, deque())
+        while pending and pending[0].done():
+            pending.popleft()
+        if len(pending) >= self.max_pending:
+            await asyncio.wait([pending[0]])
+            pending.popleft()
+
+        previous = pending[-1] if pending else None
+        task = asyncio.ensure_future(self._apply_after(previous, monitor, data, received or time.perf_counter()))
+        pending.append(task)
+        return task
+
+    async def _apply_after(self, previous: Optional[asyncio.Task], monitor: int, data: Dict, received: float):
+        """Aplica o frame depois do anterior do mesmo monitor"""
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        start = time.perf_counter()
+        try:
+            buffer = await self._apply(monitor, data)
+        except Exception as e:
+            self.errors += 1
+            # Só o primeiro erro avisa; deltas seguintes falham até o próximo keyframe
+            synced = self.framebuffers.pop(monitor, None) is not None or data.get("keyframe", True)
+            logger.error(f"Erro ao decodificar frame {data.get('seq')} do monitor {monitor}: {e}")
+            if self.on_error and synced:
+                self.on_error(monitor, str(e))
+            return
+
+        done = time.perf_counter()
+        self.frames += 1
+        self.completed_at.append(done)
+        self.decode_ms.append((done - start) * 1000)
+        self.latency_ms.append((done - received) * 1000)
+
+        if self.on_frame:
+            try:
+                self.on_frame(monitor, buffer, data)
+            except Exception as e:
+                logger.error(f"Erro ao renderizar monitor {monitor}: {e}")
+
+    async def _apply(self, monitor: int, data: Dict) -> np.ndarray:
+        """
+        Compõe um frame no framebuffer
+
+        Keyframes são decodificados direto no buffer inteiro (ou, se vieram
+        codificados em paralelo, faixa a faixa como tiles); deltas aplicam os
+        copy-rects e depois os tiles, divididos em um lote por worker.
+        """
+        loop = asyncio.get_running_loop()
+
+        if data.get("keyframe", True):
+            buffer = self._framebuffer(monitor, data["width"], data["height"])
+            if data.get("image"):
+                await loop.run_in_executor(self.executor, decode_into, buffer, data["image"], data["compression"])
+                return buffer
+        else:
+            buffer = self.framebuffers.get(monitor)
+            if buffer is None:
+                raise ValueError("delta sem keyframe aplicado")
+
+        if data.get("copy_rects"):
+            await loop.run_in_executor(self.executor, apply_copy_rects, buffer, data["copy_rects"])
+
+        tiles = data.get("tiles") or []
+        if tiles:
+            batches = [tiles[i::self.workers] for i in range(min(self.workers, len(tiles)))]
+            await asyncio.gather(*(
+                loop.run_in_executor(self.executor, _decode_tiles, buffer, batch)
+                for batch in batches
+            ))
+        return buffer
+
+    def reset(self, monitor: int = None):
+        """Descarta o framebuffer de um monitor (ou de todos)"""
+        if monitor is None:
+            self.framebuffers.clear()
+        else:
+            self.framebuffers.pop(monitor, None)
+
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> float:
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna as métricas de decodificação
+
+        Returns:
+            Dict: {"frames", "errors", "reallocations", "fps", "decode_ms",
+            "latency_ms"} (tempos com mean/p50/p95/max na janela recente)
+        """
+        stats = {
+            "frames": self.frames,
+            "errors": self.errors,
+            "reallocations": self.reallocations,
+            "fps": 0.0
+        }
+        if len(self.completed_at) > 1:
+            elapsed = self.completed_at[-1] - self.completed_at[0]
+            if elapsed > 0:
+                stats["fps"] = round((len(self.completed_at) - 1) / elapsed, 1)
+
+        for name, samples in (("decode_ms", self.decode_ms), ("latency_ms", self.latency_ms)):
+            if not samples:
+                continue
+            values = sorted(samples)
+            stats[name] = {
+                "mean": round(sum(values) / len(values), 3),
+                "p50": round(self._percentile(values, 0.50), 3),
+                "p95": round(self._percentile(values, 0.95), 3),
+                "max": round(values[-1], 3)
+            }
+        return stats
+
+    async def drain(self):
+        """Espera todos os frames enfileirados serem aplicados"""
+        tasks = [task for pending in self.pending.values() for task in pending]
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def close(self):
+        """Cancela frames pendentes e encerra o pool"""
+        for pending in self.pending.values():
+            for task in pending:
+                task.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    def encode(pixels: np.ndarray, image_format: str) -> str:
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, "RGB").save(buffer, format=image_format)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    async def demo():
+        engine = ViewerEngine(on_frame=lambda monitor, fb, data: print(
+            f"Frame {data['seq']} completo: monitor {monitor} {fb.shape[1]}x{fb.shape[0]} média {fb.mean():.1f}"
+        ))
+        frame = np.zeros((256, 256, 3), dtype=np.uint8)
+        await engine.submit({
+            "monitor": 1, "seq": 0, "keyframe": True, "width": 256, "height": 256,
+            "image": encode(frame, "PNG"), "compression": "png"
+        })
+        for seq in range(1, 4):
+            tile = np.full((64, 64, 3), seq * 60, dtype=np.uint8)
+            await engine.submit({
+                "monitor": 1, "seq": seq, "keyframe": False, "image": None,
+                "copy_rects": [{"src_x": 0, "src_y": 0, "dst_x": 0, "dst_y": 64, "w": 256, "h": 64}],
+                "tiles": [{"x": 64 * seq, "y": 0, "w": 64, "h": 64,
+                           "compression": "jpeg", "image": encode(tile, "JPEG")}]
+            })
+        await engine.drain()
+        print(f"Estatísticas: {engine.get_stats()}")
+        engine.close()
+
+    asyncio.run(demo())
@@ -0,0 +1,242 @@
+"""
+Verificação da federação com vários brokers na mesma máquina
+Sobe três brokers em localhost (malha completa, cadastros separados) e
+confere os links, um relay entre brokers com as permissões do broker do
+host, e as recusas de peer_hello: segredo errado, prova repetida de uma
+conexão anterior e broker com a federação desativada.
+
+Uso: python tools/check_federation.py (código de saída 1 se algo falhar)
+"""
+
+import sys
+import asyncio
+import logging
+import secrets
+import tempfile
+from pathlib import Path
+
+# Adiciona diretório pai ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.server import RemoteAccessBroker, UserManager, SessionManager
+from server.peering import sign_hello, verify_hello
+from shared.protocol import ProtocolHandler, Message
+from shared.encryption import CryptoManager
+
+SECRET = secrets.token_hex(16)
+# Abaixo da faixa de portas efêmeras: conexões de saída não as ocupam antes do bind
+PORTS = {"A": 15601, "B": 15602, "C": 15603}
+ISOLATED_PORT = 15604
+TIMEOUT = 3.0
+
+failures = []
+
+
+def check(name: str, ok: bool):
+    """Registra e mostra o resultado de uma verificação"""
+    print(f"  {'ok   ' if ok else 'FALHOU'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+class RawConnection:
+    """Conexão crua com um broker (cliente ou broker falso), sem compressão"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = b""
+        self.session_id = None
+
+    @classmethod
+    async def open(cls, port: int) -> "RawConnection":
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def send(self, msg: Message):
+        self.writer.write(ProtocolHandler.serialize_message(msg))
+        await self.writer.drain()
+
+    async def recv(self, timeout: float = TIMEOUT) -> Message:
+        while True:
+            msg, self.buffer = ProtocolHandler.deserialize_message(self.buffer)
+            if msg is not None:
+                return msg
+            data = await asyncio.wait_for(self.reader.read(65536), timeout)
+            if not data:
+                raise ConnectionError("conexão fechada")
+            self.buffer += data
+
+    async def recv_type(self, msg_type: str, timeout: float = TIMEOUT) -> Message:
+        """Próxima mensagem do tipo pedido (descarta as outras)"""
+        while True:
+            msg = await self.recv(timeout)
+            if msg.msg_type == msg_type:
+                return msg
+
+    async def login(self, username: str, password: str, device_name: str, role: str) -> bool:
+        await self.send(ProtocolHandler.create_auth_request(
+            username, CryptoManager.hash_password(password), device_name, role=role
+        ))
+        response = await self.recv()
+        self.session_id = response.session_id
+        return bool(response.data.get("success"))
+
+    def close(self):
+        self.writer.close()
+
+
+async def fake_broker_hello(port: int, broker_id: str, secret: str, proof: str = None):
+    """
+    Handshake de um broker falso
+
+    Returns:
+        tuple: (resposta final, prova enviada); resposta None = link aceito
+    """
+    conn = await RawConnection.open(port)
+    try:
+        nonce = secrets.token_hex(16)
+        await conn.send(ProtocolHandler.create_peer_hello(broker_id, nonce))
+        reply = await conn.recv()
+        if reply.msg_type != "peer_hello":
+            return reply, None
+        proof = proof or sign_hello("connect", broker_id, reply.data["nonce"], secret)
+        await conn.send(ProtocolHandler.create_peer_hello(broker_id, signature=proof))
+        try:
+            return await conn.recv(0.5), proof
+        except asyncio.TimeoutError:
+            return None, proof
+    finally:
+        conn.close()
+
+
+async def start_brokers(directory: Path):
+    """Três brokers em malha e um isolado, cada um com cadastro próprio"""
+    brokers = {}
+    for name, port in PORTS.items():
+        peers = [("127.0.0.1", other) for other_name, other in PORTS.items() if other_name != name]
+        brokers[name] = RemoteAccessBroker("127.0.0.1", port, peers=peers, broker_id=name, peer_secret=SECRET)
+    brokers["isolado"] = RemoteAccessBroker("127.0.0.1", ISOLATED_PORT, peers=[], broker_id="isolado", peer_secret=SECRET)
+
+    for name, broker in brokers.items():
+        broker.user_manager = UserManager(directory / f"{name}-users.db")
+        broker.session_manager = SessionManager(directory / f"{name}-sessions.json")
+
+    # ana: só visualiza no broker do host (A), mesmo com control em B
+    await brokers["A"].user_manager.add_user("ana", "ana123", ["view"])
+    await brokers["B"].user_manager.add_user("ana", "ana123", ["view", "control"])
+    # bia: sem "view" em A, o host dela não pode ser assistido de outro broker
+    await brokers["A"].user_manager.add_user("bia", "bia123", ["control"])
+    await brokers["B"].user_manager.add_user("bia", "bia123", ["view", "control"])
+
+    tasks = [asyncio.create_task(broker.start()) for broker in brokers.values()]
+    return brokers, tasks
+
+
+async def wait_links(brokers: dict, timeout: float = 10.0) -> bool:
+    """Espera a malha completa (cada broker com link para os outros dois)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        if all(len(brokers[name].peer_links) == len(PORTS) - 1 for name in PORTS):
+            return True
+        await asyncio.sleep(0.1)
+    return False
+
+
+async def check_relay(brokers: dict):
+    """Viewer em B assiste host em A; A aplica as permissões do seu cadastro"""
+    host = await RawConnection.open(PORTS["A"])
+    viewer = await RawConnection.open(PORTS["B"])
+    try:
+        check("login do host em A", await host.login("ana", "ana123", "PC-ANA", "host"))
+        await host.send(ProtocolHandler.create_monitor_info(host.session_id, [{"index": 1}]))
+        check("login do viewer em B", await viewer.login("ana", "ana123", "VIEWER-ANA", "viewer"))
+
+        await viewer.send(ProtocolHandler.create_attach(viewer.session_id, "PC-ANA"))
+        attached = await viewer.recv_type("notification")
+        check("viewer em B assiste host em A", attached.data.get("event") == "attached")
+
+        # O relay pode estar num link de entrada ou de saída (a malha tem os dois)
+        relays = [conn for conn in brokers["A"].client_sessions.values() if conn.peer and conn.role == "viewer"]
+        check("relay em A com as permissões de A", [relay.permissions for relay in relays] == [{"view"}])
+
+        await host.send(ProtocolHandler.create_screen_capture(host.session_id, b"frame", seq=0, keyframe=True))
+        frame = await viewer.recv_type("screen_cap")
+        check("frame atravessa o link", frame.data.get("seq") == 0)
+
+        await viewer.send(ProtocolHandler.create_mouse_event(viewer.session_id, 5, 6))
+        try:
+            await host.recv_type("mouse_evt", 1.0)
+            check("input sem control em A não chega ao host", False)
+        except asyncio.TimeoutError:
+            check("input sem control em A não chega ao host", True)
+    finally:
+        host.close()
+        viewer.close()
+
+    host = await RawConnection.open(PORTS["A"])
+    viewer = await RawConnection.open(PORTS["B"])
+    try:
+        await host.login("bia", "bia123", "PC-BIA", "host")
+        await viewer.login("bia", "bia123", "VIEWER-BIA", "viewer")
+        await viewer.send(ProtocolHandler.create_attach(viewer.session_id, "PC-BIA"))
+        refused = await viewer.recv()
+        check("relay recusado sem view no broker do host", refused.msg_type == "error")
+    finally:
+        host.close()
+        viewer.close()
+
+
+async def check_hello_refusals():
+    """peer_hello com segredo errado, prova repetida e federação desativada"""
+    reply, proof = await fake_broker_hello(PORTS["A"], "falso", SECRET)
+    check("broker com o segredo é aceito", reply is None)
+
+    reply, _ = await fake_broker_hello(PORTS["A"], "falso", SECRET, proof=proof)
+    check("prova capturada não serve numa conexão nova", reply is not None and reply.msg_type == "error")
+
+    reply, _ = await fake_broker_hello(PORTS["A"], "falso", "outro-segredo")
+    check("segredo errado é recusado", reply is not None and reply.msg_type == "error")
+
+    conn = await RawConnection.open(PORTS["A"])
+    try:
+        nonce = secrets.token_hex(16)
+        await conn.send(ProtocolHandler.create_peer_hello("falso", nonce))
+        reply = await conn.recv()
+        check("resposta do broker prova o segredo", verify_hello(reply, "accept", nonce, SECRET))
+        check("e não vale como prova de abertura", not verify_hello(reply, "connect", nonce, SECRET))
+    finally:
+        conn.close()
+
+    reply, _ = await fake_broker_hello(ISOLATED_PORT, "falso", SECRET)
+    check("broker sem PEER_BROKERS recusa hello", reply is not None and reply.msg_type == "error")
+
+
+async def run():
+    with tempfile.TemporaryDirectory(prefix="check-federation-") as directory:
+        brokers, tasks = await start_brokers(Path(directory))
+        try:
+            print("Federação em localhost:")
+            await asyncio.sleep(0.2)
+            for name, task in zip(brokers, tasks):
+                check(f"broker {name} escutando", not task.done())
+            check("malha completa entre A, B e C", await wait_links(brokers))
+            await check_relay(brokers)
+            await check_hello_refusals()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    logging.getLogger().setLevel(logging.CRITICAL)
+    asyncio.run(run())
+    if failures:
+        print(f"{len(failures)} verificação(ões) falharam")
+        sys.exit(1)
+    print("Tudo certo")
+
+
+if __name__ == "__main__":
+    main()